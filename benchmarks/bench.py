@@ -0,0 +1,136 @@
+"""
+Mesure les chemins chauds du jeu sans fenêtre, et compare deux séries de mesures.
+
+    python benchmarks/bench.py run                       # mesure tout, écrit .cache/benchmarks/<date>.json
+    python benchmarks/bench.py run -k draw -o draw.json  # seulement les cas dont le nom contient "draw"
+    python benchmarks/bench.py run -k allocations        # vérifie que la mise à jour du monde n'alloue rien
+    python benchmarks/bench.py run -k draw --render low_res  # dessin avec l'autre mode de rendu des cartes
+    python benchmarks/bench.py run -k update --stream     # cartes découpées en blocs chargés autour du joueur
+    python benchmarks/bench.py run -k generated          # seulement le donjon généré de 1000 x 1000 tuiles
+    python benchmarks/bench.py compare avant.json apres.json --threshold 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Pilotes SDL factices : pas de fenêtre ni de son
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BASE_DIR, ".cache", "benchmarks")
+
+# Les modules du jeu sont importés comme depuis src/
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+import harness
+
+
+def run_command(arguments):
+    """
+    Construit le jeu une seule fois, mesure les cas choisis et écrit les résultats.
+
+    :param arguments: (argparse.Namespace) Les options de la commande run.
+    :return: (int) Le code de sortie : 1 si un cas alloue plus que sa limite (voir harness.measure).
+    """
+    import pygame
+    pygame.init()
+
+    import cases  # enregistre les cas de mesure
+    from game import Game
+
+    selected = [case for case in harness.CASES if not arguments.filter or arguments.filter in case.name]
+    if not selected:
+        print(f"Aucun cas ne correspond à {arguments.filter!r}")
+        return 1
+    if arguments.repeat:
+        for case in selected:
+            case.repeat = arguments.repeat
+
+    game = Game(render_mode=arguments.render, stream=arguments.stream)
+    cases.add_generated_map(game)
+    game.map_manager.maps.wait_prefetch()
+
+    output = arguments.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+
+    report = harness.run(selected, game, output)
+    print(f"Résultats écrits dans {output}")
+    if report["failures"]:
+        print(f"{len(report['failures'])} cas au-delà de leur limite d'allocations : {', '.join(report['failures'])}")
+        return 1
+    return 0
+
+
+def compare_command(arguments):
+    """
+    Compare deux fichiers de résultats et signale les régressions.
+
+    :param arguments: (argparse.Namespace) Les options de la commande compare.
+    :return: (int) 1 s'il y a au moins une régression, 0 sinon.
+    """
+    with open(arguments.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(arguments.current, encoding="utf-8") as file:
+        current = json.load(file)
+
+    rows = harness.compare(baseline, current, arguments.threshold, arguments.metric)
+    regressions = 0
+    print(f"{'cas':<34}{'avant':>11}{'après':>11}{'variation':>11}")
+    for name, before, after, change, slower, more_allocations in rows:
+        flags = []
+        if slower:
+            flags.append("RÉGRESSION")
+        if more_allocations:
+            flags.append("ALLOCATIONS")
+        regressions += bool(flags)
+        print(f"{name:<34}{harness.format_time(before):>11}{harness.format_time(after):>11}"
+              f"{change:>+10.1f}%  {' '.join(flags)}")
+
+    print(f"{regressions} régression(s) au-delà de {arguments.threshold:g} % ({arguments.metric})")
+    return 1 if regressions else 0
+
+
+def parse_arguments(argv=None):
+    """
+    Lit les options de la ligne de commande.
+
+    :param argv: (list) Les arguments à lire, sys.argv par défaut.
+    :return: (argparse.Namespace) Les options lues.
+
+    >>> parse_arguments(["compare", "a.json", "b.json"]).threshold
+    10.0
+    """
+    parser = argparse.ArgumentParser(description="Mesures des chemins chauds de Dungeon et Donjon")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="mesure les cas et écrit les résultats en JSON")
+    run_parser.add_argument("-k", "--filter", help="ne mesure que les cas dont le nom contient ce texte")
+    run_parser.add_argument("-o", "--output", metavar="FICHIER", help="fichier JSON des résultats")
+    run_parser.add_argument("--repeat", type=int, help="nombre de mesures par cas (remplace celui de chaque cas)")
+    run_parser.add_argument("--render", choices=["prescaled", "low_res"], default="prescaled",
+                            help="mode de rendu des cartes du jeu mesuré (voir src/rendering.py)")
+    run_parser.add_argument("--stream", action="store_const", const=True, default=None,
+                            help="découpe toutes les cartes en blocs (voir src/streaming.py)")
+    run_parser.set_defaults(function=run_command)
+
+    compare_parser = commands.add_parser("compare", help="compare deux fichiers de résultats")
+    compare_parser.add_argument("baseline", help="résultats de référence")
+    compare_parser.add_argument("current", help="nouveaux résultats")
+    compare_parser.add_argument("--threshold", type=float, default=10.0,
+                                help="seuil de régression en pour cent (10 par défaut)")
+    compare_parser.add_argument("--metric", choices=["mean", "p50", "p95", "p99"], default="p50",
+                                help="statistique comparée (p50 par défaut)")
+    compare_parser.set_defaults(function=compare_command)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    sys.exit(arguments.function(arguments))
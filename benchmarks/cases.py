@@ -0,0 +1,400 @@
+import contextlib
+import io
+import os
+import random
+
+import pygame
+import pytmx
+
+from animation import AnimateSprite, frame_cache
+from collision_grid import CollisionGrid
+from combat import Combat
+from combat_engine import Fighter
+from combat_sim import simulate
+from dungeon import generate_dungeon
+from player import NPC, NPC_STATS, PLAYER_STATS
+from savegame import encode
+from streaming import ChunkStreamer, MapChunkSource
+from harness import case
+
+# Définir le répertoire de base du projet
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MAP_NAMES = ["world", "dungeon", "dungeon_2"]
+
+# Donjon généré (voir src/dungeon.py), enregistré dans le jeu mesuré par add_generated_map : le pire cas des mesures par carte
+GENERATED_MAP = "generated"
+DUNGEON_OPTIONS = dict(seed=1, width=1000, height=1000, walls=2000, npcs=500, portals=8)
+ALL_MAPS = MAP_NAMES + [GENERATED_MAP]
+
+# Donjon généré plus large que 256 tuiles, mais trop petit pour être découpé en blocs (voir STREAM_MIN_TILES),
+# sans NPC : pour update_allocations, loin de son bord gauche
+WIDE_MAP = "wide"
+WIDE_OPTIONS = dict(seed=1, width=300, height=200, walls=200, npcs=0, portals=0)
+WIDE_MIN_COLUMN = 260  # colonne à partir de laquelle le joueur y est placé
+
+# point d'apparition du joueur sur chaque carte
+SPAWN_POINTS = {"world": "player", "dungeon": "spawn_dungeon", "dungeon_2": "spawn_dungeon_2", GENERATED_MAP: "player",
+                WIDE_MAP: "player"}
+
+NPC_COUNTS = [1, 10, 100, 1000]
+CROWD_COUNTS = [1000, 10000]
+
+LONG_TEXT = ("Il y a bien longtemps, dans un donjon oublié, vivait un magicien qui comptait les pierres des murs "
+             "une par une, du matin au soir, sans jamais se tromper. ") * 3
+
+# NPCs ajoutés à "world" pour les mesures avec foule
+crowd = []
+
+
+def scene(game, name, npcs=0, figurants=0):
+    """
+    Met le jeu dans un état connu avant une mesure : carte actuelle, joueur à son point d'apparition
+    et nombre de NPCs et de figurants supplémentaires sur "world" (ils suivent le chemin du champignon).
+
+    :param game: (Game) Le jeu mesuré.
+    :param name: (str) Le nom de la carte à afficher.
+    :param npcs: (int) Le nombre de NPCs supplémentaires sur "world".
+    :param figurants: (int) Le nombre de figurants de la foule de "world".
+    :return: (Map) La carte actuelle.
+
+    >>> scene(game, "world", npcs=100)  # Ceci placera le joueur sur "world" avec 100 champignons en plus
+    """
+    map_manager = game.map_manager
+    world = map_manager.maps.get("world")
+    registered = map_manager.map_definitions["world"][1]  # une carte découpée y reprend ses NPCs (voir --stream)
+
+    while len(crowd) > npcs:
+        npc = crowd.pop()
+        npc.kill()
+        world.npcs.remove(npc)
+        if registered is not world.npcs:
+            registered.remove(npc)
+    while len(crowd) < npcs:
+        npc = NPC("mushroom", nb_points=4, dialog=[])
+        npc.load_points(world.objects)
+        npc.current_point = len(crowd) % npc.nb_points
+        npc.teleport_spawn()
+        crowd.append(npc)
+        world.npcs.append(npc)
+        world.group.add(npc)
+        if registered is not world.npcs:
+            registered.append(npc)
+
+    if len(world.crowd) != figurants:
+        world.crowd.clear()
+        if figurants:
+            world.crowd.spawn("mushroom", world.npcs[0].points, count=figurants)
+
+    map_manager.current_map = name
+    map_manager.teleport_player(SPAWN_POINTS[name])
+    map_manager.draw()
+    return map_manager.get_map()
+
+
+def add_generated_map(game):
+    """
+    Enregistre les donjons générés dans le jeu mesuré, comme des cartes du jeu (chargées à leur première utilisation).
+
+    :param game: (Game) Le jeu mesuré.
+    :return: None
+
+    >>> add_generated_map(game)  # Ceci ajoutera la carte "generated" de 1000 x 1000 tuiles et la carte "wide"
+    """
+    generate_dungeon(GENERATED_MAP, **DUNGEON_OPTIONS).register(game.map_manager)
+    generate_dungeon(WIDE_MAP, **WIDE_OPTIONS).register(game.map_manager)
+
+
+def walker(game, period=60):
+    """
+    Crée une préparation qui fait aller et venir le joueur d'un pixel par appel, pour que la caméra défile.
+
+    :param game: (Game) Le jeu mesuré.
+    :param period: (int) Le nombre de pas avant de changer de sens.
+    :return: (function) La préparation.
+    """
+    steps = [0]
+
+    def step():
+        direction = 1 if (steps[0] // period) % 2 == 0 else -1
+        game.player.position[0] += direction
+        game.player.update()
+        steps[0] += 1
+
+    return step
+
+
+for map_name in ALL_MAPS:
+    @case(f"load_map[{map_name}]", repeat=20, warmup=2)
+    def load_map(game, name=map_name):
+        """Chargement complet d'une carte par le gestionnaire (carte compilée, rendu, murs, index)."""
+        loaded = []
+
+        def unload():
+            while loaded:
+                game.map_manager._unload_map(loaded.pop())
+
+        def load():
+            loaded.append(game.map_manager._load_map_data(name))
+
+        return load, unload
+
+
+for map_name in MAP_NAMES:
+    @case(f"load_tmx[{map_name}]", repeat=10, warmup=1)
+    def load_tmx(game, name=map_name):
+        """Lecture du fichier tmx seul, utilisée quand la carte compilée n'est pas disponible."""
+        path = os.path.join(BASE_DIR, "map", f"{name}.tmx")
+        return lambda: pytmx.util_pygame.load_pygame(path)
+
+
+for npc_count in NPC_COUNTS:
+    @case(f"update[npcs={npc_count}]", repeat=200)
+    def update(game, count=npc_count):
+        """Une mise à jour du monde (groupe, collisions, déplacement des NPCs) avec count NPCs en plus."""
+        scene(game, "world", npcs=count)
+        return lambda: game.map_manager.update(game.dt)
+
+
+for crowd_count in CROWD_COUNTS:
+    @case(f"update[figurants={crowd_count}]", repeat=200)
+    def update_crowd(game, count=crowd_count):
+        """La même mise à jour du monde avec count figurants simulés dans les tableaux de la foule."""
+        scene(game, "world", figurants=count)
+        return lambda: game.map_manager.update(game.dt)
+
+
+@case(f"update[{GENERATED_MAP}]", repeat=200)
+def update_generated(game):
+    """Une mise à jour du donjon généré : ses NPCs suivent les routes du Pathfinder d'un point à l'autre."""
+    scene(game, GENERATED_MAP)
+    return lambda: game.map_manager.update(game.dt), walker(game, period=8)
+
+
+# Pas le donjon généré : ses NPCs suivent des routes du Pathfinder, dont le calcul et le suivi créent des listes
+for map_name in MAP_NAMES:
+    @case(f"update_allocations[{map_name}]", repeat=500, warmup=60, max_alloc=0)
+    def update_allocations(game, name=map_name):
+        """Test de régression : une fois le jeu lancé, une mise à jour de la carte, joueur en mouvement, n'alloue rien."""
+        scene(game, name)
+        return lambda: game.map_manager.update(game.dt), walker(game, period=8)
+
+
+@case(f"update_allocations[{WIDE_MAP}]", repeat=500, warmup=60, max_alloc=0)
+def update_allocations_wide(game):
+    """Comme update_allocations, au-delà de la 256e colonne d'une carte qui n'est pas découpée en blocs."""
+    map = scene(game, WIDE_MAP)
+    # première tuile de sol entourée de sol (5 x 5 tuiles) à partir de WIDE_MIN_COLUMN : le joueur y va et vient.
+    # La grille est construite avec les murs de toute la carte, la grille de la Map n'en couvre qu'une partie avec --stream
+    tmx_data = map.tmx_data
+    walls = [pygame.Rect(wall.x, wall.y, wall.width, wall.height) for wall in tmx_data.objects if wall.type == "collision"]
+    blocked = CollisionGrid.from_rects(walls, tmx_data.width, tmx_data.height,
+                                       tmx_data.tilewidth, tmx_data.tileheight).blocked
+    row, column = next((row, column) for row in range(2, tmx_data.height - 2)
+                       for column in range(WIDE_MIN_COLUMN, tmx_data.width - 2)
+                       if not blocked[row - 2:row + 3, column - 2:column + 3].any())
+    player = game.player
+    player.position = [float(column * tmx_data.tilewidth), float(row * tmx_data.tileheight)]
+    player.update()
+    player.save_location()
+    if map.stream is not None and map.stream.ensure(*player.position):
+        game.map_manager._follow_stream(map)  # carte découpée : les blocs autour du joueur, comme teleport_player
+    return lambda: game.map_manager.update(game.dt), walker(game, period=8)
+
+
+@case("update_allocations[npcs=100]", repeat=500, warmup=60, max_alloc=0)
+def update_allocations_npcs(game):
+    """Comme update_allocations, avec assez de NPCs pour que les collisions passent par la grille (BATCH_COLLISION_THRESHOLD)."""
+    scene(game, "world", npcs=100)
+    return lambda: game.map_manager.update(game.dt), walker(game, period=8)
+
+
+for map_name in ALL_MAPS:
+    @case(f"check_collisions[{map_name}]", repeat=500)
+    def check_collisions(game, name=map_name):
+        """Collisions du joueur et des NPCs avec les murs et les portails de la carte."""
+        scene(game, name)
+        return game.map_manager.check_collisions, walker(game, period=8)
+
+
+for map_name in ALL_MAPS:
+    @case(f"draw[{map_name}]", repeat=300)
+    def draw(game, name=map_name):
+        """Dessin de la carte au zoom 3 (mode de rendu choisi par --render), le joueur en mouvement."""
+        scene(game, name)
+        return game.map_manager.draw, walker(game)
+
+
+@case("dialog_render[long]", repeat=300)
+def dialog_render(game):
+    """Une image de la boîte de dialogue qui écrit un long texte lettre par lettre."""
+    scene(game, "world")
+    dialog_box = game.dialog_box
+    npc = game.map_manager.get_map().npcs[0]
+
+    def restart():
+        if not dialog_box.reading:
+            dialog_box.execute([[LONG_TEXT]], [npc])
+
+    # une lettre par appel
+    return lambda: dialog_box.render(game.screen, 1 / dialog_box.characters_per_second), restart
+
+
+@case("combat_run", repeat=300)
+def combat_run(game):
+    """Un combat complet (le NPC perd) ; les messages du combat ne sont pas affichés."""
+    npc = NPC("bandit", nb_points=1, dialog=[])
+    combat = Combat(game.player, npc, game.screen, game)
+    output = io.StringIO()
+
+    def reset():
+        game.player.hp = 100
+        npc.hp = 50
+        npc.killed = False
+        combat.turn = 0
+        output.seek(0)
+        output.truncate()
+
+    def fight():
+        with contextlib.redirect_stdout(output):
+            combat.run()
+
+    return fight, reset
+
+
+@case("reset_game", repeat=200)
+def reset_game(game):
+    """Retour au début de la partie après une mort : le NPC vaincu revient, le joueur est remis à son point de départ."""
+    scene(game, "world")
+    npc = game.map_manager.get_map().npcs[0]
+
+    def die():
+        npc.kill()
+        game.player.hp = 0
+        game.map_manager.current_map = "dungeon"
+        game.map_manager.teleport_player("spawn_dungeon")
+
+    return game.reset_game, die
+
+
+@case("autosave[snapshot]", repeat=500)
+def autosave_snapshot(game):
+    """Part de la sauvegarde automatique faite par le thread principal : garder l'état de la partie."""
+    scene(game, "world", npcs=100)
+    return game.map_manager.snapshot
+
+
+@case("autosave[encode]", repeat=200)
+def autosave_encode(game):
+    """Codage et compression d'une sauvegarde, faits par le thread de sauvegarde."""
+    scene(game, "world", npcs=100)
+    snapshot = game.map_manager.snapshot()
+    return lambda: encode(snapshot)
+
+
+def path_requests(pathfinder, count, seed=0):
+    """
+    Tire des couples (départ, arrivée) de tuiles accessibles, toujours les mêmes pour une même graine.
+
+    :param pathfinder: (Pathfinder) La recherche de chemins de la carte.
+    :param count: (int) Le nombre de couples.
+    :param seed: (int) La graine du hasard.
+    :return: (list) Les couples de tuiles (colonne, ligne).
+    """
+    rows, columns = pathfinder.walkable.nonzero()
+    tiles = list(zip(columns.tolist(), rows.tolist()))
+    rng = random.Random(seed)
+    return [(rng.choice(tiles), rng.choice(tiles)) for _ in range(count)]
+
+
+@case("pathfinding[astar,agents=500]", repeat=5, warmup=1)
+def pathfinding_astar(game):
+    """Recherche A* de 500 chemins entre tuiles au hasard de "world", caches vidés avant chaque mesure."""
+    pathfinder = scene(game, "world").pathfinder
+    requests = path_requests(pathfinder, 500)
+
+    def search():
+        for start, goal in requests:
+            pathfinder.find_path(start, goal)
+
+    return search, pathfinder.invalidate
+
+
+@case("pathfinding[cached,agents=500]", repeat=200)
+def pathfinding_cached(game):
+    """Les mêmes 500 chemins, déjà dans le cache."""
+    pathfinder = scene(game, "world").pathfinder
+    requests = path_requests(pathfinder, 500)
+
+    def search():
+        for start, goal in requests:
+            pathfinder.find_path(start, goal)
+
+    return search
+
+
+@case("pathfinding[flow_field]", repeat=100)
+def pathfinding_flow_field(game):
+    """Calcul du champ de directions vers le joueur sur toute la carte "world"."""
+    world = scene(game, "world")
+    return game.map_manager.player_flow_field, world.pathfinder.invalidate
+
+
+@case("chase[agents=500]", repeat=200)
+def chase(game):
+    """Un tick de 500 NPCs qui suivent le même champ de directions vers le chemin du champignon."""
+    world = scene(game, "world", npcs=500)
+    pathfinder = world.pathfinder
+    point = world.objects["mushroom_path1"]
+    goal = pathfinder.tile_at(point.x + point.width / 2, point.y + point.height / 2)
+
+    def tick():
+        field = pathfinder.flow_field(goal)
+        for npc in crowd:
+            npc.chase(field, game.dt)
+            npc.update()
+
+    return tick
+
+
+@case("stream_window[world]", repeat=50, warmup=2)
+def stream_window(game):
+    """Murs, grille et chemins des 5 x 5 blocs autour du joueur, reconstruits par le thread d'une carte découpée
+    à chaque changement de bloc (ici "world" découpée, blocs déjà lus)."""
+    world = scene(game, "world")
+    stream = ChunkStreamer(MapChunkSource(world.tmx_data))
+    point = world.objects["player"]
+    stream.ensure(point.x, point.y)
+    known = stream._known(stream.center)
+    return lambda: stream._build_window(stream.center, known)
+
+
+@case("generate_dungeon[1000x1000]", repeat=10, warmup=1)
+def generate(game):
+    """Génération du donjon mesuré : salles, couloirs, murs, chemins des NPCs et calques de tuiles."""
+    return lambda: generate_dungeon("mesure", **DUNGEON_OPTIONS)
+
+
+@case("combat_sim[fights=100000]", repeat=10, warmup=1)
+def combat_sim(game):
+    """Simulation de 100 000 combats contre le chevalier, avec des attaques qui peuvent rater et varier."""
+    player = Fighter.from_stats("player", dict(PLAYER_STATS, hit_chance=0.8, damage_spread=3))
+    knight = Fighter.from_stats("knight", dict(NPC_STATS["knight"], hit_chance=0.8, damage_spread=3))
+    return lambda: simulate(player, knight, fights=100000, seed=0)
+
+
+@case("animate_sprite[warm]", repeat=500)
+def animate_sprite_warm(game):
+    """Construction d'un sprite animé dont les images sont déjà dans le cache."""
+    return lambda: AnimateSprite("bandit")
+
+
+@case("animate_sprite[cold]", repeat=50)
+def animate_sprite_cold(game):
+    """Construction d'un sprite animé après avoir vidé le cache (lecture et découpe de la planche)."""
+    return lambda: AnimateSprite("bandit"), frame_cache.clear
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
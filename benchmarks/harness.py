@@ -0,0 +1,331 @@
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+# Liste des cas de mesure enregistrés avec @case, dans l'ordre d'enregistrement
+CASES = []
+
+
+@dataclass
+class Case:
+    """
+    Classe Case qui décrit un chemin chaud à mesurer.
+
+    La fabrique reçoit le contexte de mesure (le jeu construit une seule fois) et renvoie la fonction à chronométrer,
+    ou un couple (fonction, préparation) : la préparation est appelée avant chaque mesure, hors du chronomètre.
+
+    :param name: (str) Le nom du cas, par exemple "update[npcs=100]".
+    :param factory: (function) La fabrique de la fonction à mesurer.
+    :param repeat: (int) Le nombre de mesures.
+    :param warmup: (int) Le nombre d'appels non mesurés faits avant les mesures.
+    :param max_alloc: (int) Les octets qu'un appel peut allouer au plus (pic de chaque appel), None pour ne pas vérifier.
+    :return: None
+
+    >>> draw = Case("draw", lambda context: context.map_manager.draw, repeat=300)  # Ceci décrira la mesure du dessin de la carte
+    """
+    name: str
+    factory: object
+    repeat: int = 100
+    warmup: int = 5
+    max_alloc: int = None
+
+
+def case(name, repeat=100, warmup=5, max_alloc=None):
+    """
+    Enregistre une fabrique de fonction à mesurer (décorateur).
+
+    :param name: (str) Le nom du cas.
+    :param repeat: (int) Le nombre de mesures.
+    :param warmup: (int) Le nombre d'appels non mesurés faits avant les mesures.
+    :param max_alloc: (int) Les octets qu'un appel peut allouer au plus, None pour ne pas vérifier (voir measure).
+    :return: (function) Le décorateur.
+
+    >>> @case("draw", repeat=300)
+    ... def draw(game):
+    ...     return game.map_manager.draw  # Ceci enregistrera la mesure du dessin de la carte
+    """
+    def register(factory):
+        CASES.append(Case(name, factory, repeat, warmup, max_alloc))
+        return factory
+    return register
+
+
+def percentile(values, fraction):
+    """
+    Calcule un centile par interpolation linéaire.
+
+    :param values: (list) Les valeurs, déjà triées.
+    :param fraction: (float) Le centile voulu, entre 0 et 1.
+    :return: (float) La valeur du centile.
+    :CU: len(values) > 0 and 0 <= fraction <= 1
+
+    >>> percentile([1, 2, 3, 4], 0.5)
+    2.5
+    >>> percentile([1, 2, 3, 4], 0.25)
+    1.75
+    """
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(values):
+    """
+    Résume une série de mesures.
+
+    :param values: (list) Les mesures.
+    :return: (dict) La moyenne, la médiane (p50), les centiles 95 et 99, le minimum et le maximum.
+
+    >>> summarize([1, 2, 3, 4])["p50"]
+    2.5
+    """
+    values = sorted(values)
+    return {
+        "mean": statistics.fmean(values),
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "min": values[0],
+        "max": values[-1],
+    }
+
+
+def prepare(case, context):
+    """
+    Construit la fonction à mesurer d'un cas et sa préparation.
+
+    :param case: (Case) Le cas à mesurer.
+    :param context: Le contexte de mesure passé à la fabrique.
+    :return: (tuple) La fonction à mesurer et la préparation (ou None).
+    """
+    built = case.factory(context)
+    if isinstance(built, tuple):
+        return built
+    return built, None
+
+
+def fill_float_free_list():
+    """
+    Remplit la liste des flottants libres de CPython (100 flottants), où un calcul prend ses flottants sans allouer.
+
+    Selon ce qui s'est passé avant, cette liste peut être vide au début d'un appel : le premier flottant calculé serait
+    alors compté comme une allocation, qui ne dépend pas de l'appel mesuré. Avec une liste pleine, seuls comptent
+    les flottants gardés en plus par l'appel.
+
+    :return: None
+    """
+    floats = [index + 0.5 for index in range(100)]
+    del floats
+
+
+def allocation_overhead():
+    """
+    Mesure ce que la mesure des allocations compte elle-même (le tuple renvoyé par get_traced_memory...),
+    à retrancher de chaque mesure : une fonction qui n'alloue rien doit compter 0 octet.
+
+    :return: (int) Le pic compté pour une fonction vide, en octets.
+    """
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(20):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return min(peaks)
+
+
+def measure(case, context):
+    """
+    Mesure un cas : d'abord les durées, puis les allocations dans une seconde passe
+    (tracemalloc ralentit les appels, il ne doit pas fausser les durées).
+
+    Avec case.max_alloc, chaque mesure compte pour les allocations, et le cas échoue dès qu'un seul appel dépasse
+    la limite : une allocation faite un tick sur cent est une régression comme une autre.
+
+    :param case: (Case) Le cas à mesurer.
+    :param context: Le contexte de mesure passé à la fabrique.
+    :return: (dict) Les statistiques des durées (en microsecondes) et des allocations (en octets).
+    """
+    function, setup = prepare(case, context)
+
+    for _ in range(case.warmup):
+        if setup:
+            setup()
+        function()
+
+    durations = []
+    for _ in range(case.repeat):
+        if setup:
+            setup()
+        start = time.perf_counter_ns()
+        function()
+        durations.append((time.perf_counter_ns() - start) / 1000)
+
+    # Allocations : pic et mémoire restante après chaque appel. La mémoire de départ est lue avant de remettre
+    # le pic à zéro, pour que le tuple renvoyé par get_traced_memory ne compte pas dans le pic
+    overhead = allocation_overhead()
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    try:
+        # Un appel de plus, le premier, n'est pas compté : les entiers de la mesure (before...) y sont créés, ensuite
+        # ils sont seulement remplacés
+        for iteration in range(1 + (case.repeat if case.max_alloc is not None else min(case.repeat, 50))):
+            if setup:
+                setup()
+            fill_float_free_list()
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            function()
+            current, peak = tracemalloc.get_traced_memory()
+            if iteration:
+                peaks.append(max(peak - before - overhead, 0))
+                retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+
+    stats = {
+        "repeat": case.repeat,
+        "time_us": summarize(durations),
+        "alloc_peak_bytes": summarize(peaks),
+        "alloc_retained_bytes": summarize(retained),
+    }
+    if case.max_alloc is not None:
+        stats["max_alloc_bytes"] = case.max_alloc
+        stats["alloc_ok"] = stats["alloc_peak_bytes"]["max"] <= case.max_alloc
+    return stats
+
+
+def environment():
+    """
+    Décrit la machine et les versions utilisées, pour savoir si deux résultats sont comparables.
+
+    :return: (dict) La description de l'environnement.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    import pygame
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def run(cases, context, output=None, log=print):
+    """
+    Mesure plusieurs cas et écrit les résultats au format JSON.
+
+    :param cases: (list) Les cas à mesurer.
+    :param context: Le contexte de mesure passé aux fabriques.
+    :param output: (str) Le fichier JSON à écrire, None pour ne rien écrire.
+    :param log: (function) La fonction d'affichage de la progression.
+    :return: (dict) Les résultats : {"environment": ..., "results": {nom: statistiques}, "failures": [noms]}.
+    """
+    results = dict()
+    failures = []
+    log(f"{'cas':<34}{'moyenne':>11}{'p50':>11}{'p95':>11}{'p99':>11}{'alloc pic':>12}")
+    for case in cases:
+        stats = measure(case, context)
+        results[case.name] = stats
+        time_us = stats["time_us"]
+        line = (f"{case.name:<34}{format_time(time_us['mean']):>11}{format_time(time_us['p50']):>11}"
+                f"{format_time(time_us['p95']):>11}{format_time(time_us['p99']):>11}"
+                f"{format_bytes(stats['alloc_peak_bytes']['mean']):>12}")
+        if stats.get("alloc_ok") is False:
+            failures.append(case.name)
+            line += f"  ÉCHEC : {format_bytes(stats['alloc_peak_bytes']['max'])} alloués (limite {format_bytes(case.max_alloc)})"
+        log(line)
+
+    report = {"environment": environment(), "results": results, "failures": failures}
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+def compare(baseline, current, threshold=10.0, metric="p50"):
+    """
+    Compare deux résultats et repère les régressions : un cas plus lent (ou qui alloue plus)
+    que la référence de plus de threshold pour cent.
+
+    :param baseline: (dict) Les résultats de référence (lus depuis le JSON).
+    :param current: (dict) Les nouveaux résultats.
+    :param threshold: (float) Le seuil de régression, en pour cent.
+    :param metric: (str) La statistique comparée : "mean", "p50", "p95" ou "p99".
+    :return: (list) Une ligne par cas commun : (nom, avant, après, variation en %, régression ?, allocations en hausse ?).
+
+    >>> before = {"results": {"draw": {"time_us": {"p50": 100.0}, "alloc_peak_bytes": {"mean": 0}}}}
+    >>> after = {"results": {"draw": {"time_us": {"p50": 125.0}, "alloc_peak_bytes": {"mean": 0}}}}
+    >>> compare(before, after)
+    [('draw', 100.0, 125.0, 25.0, True, False)]
+    """
+    rows = []
+    for name, stats in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        reference = baseline["results"][name]
+        before = reference["time_us"][metric]
+        after = stats["time_us"][metric]
+        change = (after - before) / before * 100 if before else 0.0
+
+        # Les petites variations d'allocation (moins d'1 Ko) ne sont pas significatives
+        alloc_before = reference["alloc_peak_bytes"]["mean"]
+        alloc_after = stats["alloc_peak_bytes"]["mean"]
+        alloc_regression = alloc_after - alloc_before > max(1024, alloc_before * threshold / 100)
+
+        rows.append((name, before, after, change, change > threshold, alloc_regression))
+    return rows
+
+
+def format_time(microseconds):
+    """
+    Écrit une durée avec une unité lisible.
+
+    :param microseconds: (float) La durée en microsecondes.
+    :return: (str) La durée écrite.
+
+    >>> format_time(1530.0)
+    '1.53 ms'
+    """
+    if microseconds >= 1000:
+        return f"{microseconds / 1000:.2f} ms"
+    return f"{microseconds:.1f} µs"
+
+
+def format_bytes(count):
+    """
+    Écrit une taille mémoire avec une unité lisible.
+
+    :param count: (float) La taille en octets.
+    :return: (str) La taille écrite.
+
+    >>> format_bytes(2048)
+    '2.0 Ko'
+    """
+    if count >= 1024 * 1024:
+        return f"{count / (1024 * 1024):.1f} Mo"
+    if count >= 1024:
+        return f"{count / 1024:.1f} Ko"
+    return f"{count:.0f} o"
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,187 @@
+import pygame
+
+# Niveaux d'activité d'un NPC, selon sa distance à la caméra
+ACTIVE = "active"    # dans la vue ou juste autour : déplacé à chaque tick
+REDUCED = "reduced"  # un peu plus loin : déplacé tous les REDUCED_PERIOD ticks, d'autant plus loin
+DORMANT = "dormant"  # loin de la vue : déplacé tous les DORMANT_PERIOD ticks
+TIERS = (ACTIVE, REDUCED, DORMANT)
+
+ACTIVE_MARGIN = 48     # pixels ajoutés autour de la vue (3 tuiles) : un NPC y est déjà à jour quand il apparaît
+REDUCED_MARGIN = 320   # pixels ajoutés autour de la vue (20 tuiles) pour le niveau REDUCED
+REDUCED_PERIOD = 4
+DORMANT_PERIOD = 16
+
+# Un grand retard est rattrapé en pas de CATCH_UP_STEP secondes au plus (15 pixels à la vitesse des NPCs).
+# Près d'un point du chemin, les pas redeviennent des ticks : le NPC tourne au même pixel qu'à chaque tick,
+# sinon il prendrait le virage plus loin et pourrait frôler un autre mur
+CATCH_UP_STEP = 0.25
+MAX_CATCH_UP = 30.0  # secondes rattrapées au plus en revenant sur une carte
+NOWHERE = pygame.Rect(-1, -1, 0, 0)  # rectangle du joueur pour les figurants d'une carte où il n'est pas
+
+
+class ActivityScheduler:
+    """
+    Classe ActivityScheduler qui décide à quelle fréquence déplacer chaque NPC de la carte actuelle, selon sa
+    distance à la caméra, et fait rattraper leur retard aux NPCs d'une carte quand le joueur y revient.
+
+    Un NPC loin de la vue n'est pas figé : le temps qu'il n'a pas simulé est gardé (NPC.lag) et rattrapé d'un coup,
+    en quelques pas plus longs, à son tour suivant. Les NPCs d'un même niveau sont répartis sur les ticks, pour que
+    chaque tick en déplace à peu près autant.
+
+    Appelé à chaque tick, update ne crée aucun objet : les rectangles des niveaux sont gardés et modifiés sur place.
+
+    :param active_margin: (int) Les pixels ajoutés autour de la vue pour le niveau ACTIVE.
+    :param reduced_margin: (int) Les pixels ajoutés autour de la vue pour le niveau REDUCED.
+    :param reduced_period: (int) Le nombre de ticks entre deux déplacements d'un NPC du niveau REDUCED.
+    :param dormant_period: (int) Le nombre de ticks entre deux déplacements d'un NPC du niveau DORMANT.
+    :return: None
+
+    >>> scheduler = ActivityScheduler()
+    >>> scheduler.update(map.npcs, map.group.world_view, 1 / 60, map.pathfinder, map.wall_index)  # Ceci déplacera les NPCs selon leur niveau
+    >>> scheduler.counts  # Ceci donnera le nombre de NPCs de chaque niveau au dernier tick
+    """
+
+    def __init__(self, active_margin=ACTIVE_MARGIN, reduced_margin=REDUCED_MARGIN,
+                 reduced_period=REDUCED_PERIOD, dormant_period=DORMANT_PERIOD):
+        """
+        Initialise un ordonnanceur sans retard en attente.
+
+        :param active_margin: (int) Les pixels ajoutés autour de la vue pour le niveau ACTIVE.
+        :param reduced_margin: (int) Les pixels ajoutés autour de la vue pour le niveau REDUCED.
+        :param reduced_period: (int) Le nombre de ticks entre deux déplacements du niveau REDUCED.
+        :param dormant_period: (int) Le nombre de ticks entre deux déplacements du niveau DORMANT.
+        :return: None
+        """
+        self.active_margin = active_margin
+        self.reduced_margin = reduced_margin
+        self.periods = {REDUCED: reduced_period, DORMANT: dormant_period}
+        self.cycle = reduced_period * dormant_period
+        self.ticks = 0
+        self.counts = dict.fromkeys(TIERS, 0)  # NPCs de chaque niveau au dernier tick
+        self.moved = 0  # NPCs déplacés au dernier tick
+        self.caught_up = 0  # NPCs remis à jour au dernier retour sur une carte
+
+        # rectangles réutilisés à chaque tick : la vue agrandie de chaque niveau, la zone autour d'un point du chemin
+        self.active_view = pygame.Rect(0, 0, 0, 0)
+        self.reduced_view = pygame.Rect(0, 0, 0, 0)
+        self.near = pygame.Rect(0, 0, 0, 0)
+        self.active_growth = 2 * active_margin
+        self.reduced_growth = 2 * reduced_margin
+
+    def update(self, npcs, view, dt, pathfinder=None, walls=None):
+        """
+        Fait avancer d'un tick les NPCs d'une carte : ceux du niveau ACTIVE à chaque tick, les autres à leur tour,
+        avec tout le temps écoulé depuis leur dernier déplacement.
+
+        :param npcs: (list) Les NPCs de la carte actuelle.
+        :param view: (pygame.Rect) La partie de la carte vue par la caméra.
+        :param dt: (float) La durée du tick en secondes.
+        :param pathfinder: (Pathfinder) La recherche de chemins de la carte.
+        :param walls: (SpatialHash) Les murs de la carte, testés après chaque pas.
+        :return: None
+        """
+        active_view = self.active_view
+        active_view.update(view)
+        active_view.inflate_ip(self.active_growth, self.active_growth)
+        reduced_view = self.reduced_view
+        reduced_view.update(view)
+        reduced_view.inflate_ip(self.reduced_growth, self.reduced_growth)
+        counts = self.counts
+        counts[ACTIVE] = counts[REDUCED] = counts[DORMANT] = 0
+        moved = 0
+        ticks = self.ticks
+
+        number = 0
+        while number < len(npcs):  # boucle while : enumerate créerait des objets à chaque tick
+            npc = npcs[number]
+            number += 1
+            if npc.killed:
+                continue
+            if npc.rect.colliderect(active_view):
+                tier = ACTIVE
+            elif npc.rect.colliderect(reduced_view):
+                tier = REDUCED
+            else:
+                tier = DORMANT
+            counts[tier] += 1
+
+            # Le numéro du NPC décale son tour : les NPCs d'un niveau sont répartis sur les ticks
+            if tier != ACTIVE and (ticks + number) % self.periods[tier]:
+                npc.lag += dt
+                continue
+            seconds = npc.lag + dt
+            npc.lag = 0.0
+            self.step(npc, seconds, dt, pathfinder, walls)
+            moved += 1
+
+        # compté modulo le produit des périodes, qui n'en change pas les tours : reste un petit entier, que Python ne crée pas
+        self.ticks = (ticks + 1) % self.cycle
+        self.moved = moved
+
+    def step(self, npc, seconds, dt, pathfinder=None, walls=None):
+        """
+        Fait avancer un NPC de plusieurs secondes, en pas de CATCH_UP_STEP secondes au plus, et d'un tick près
+        du point suivant de son chemin. Les murs sont testés après chaque pas : un NPC qui en touche un revient
+        au début de ce pas et s'y arrête, le reste du temps est perdu, comme un NPC bloqué à chaque tick.
+
+        :param npc: (NPC) Le NPC.
+        :param seconds: (float) Le temps à simuler.
+        :param dt: (float) La durée d'un tick en secondes.
+        :param pathfinder: (Pathfinder) La recherche de chemins de sa carte.
+        :param walls: (SpatialHash) Les murs de sa carte, None pour ne pas les tester.
+        :return: None
+        """
+        while seconds > dt / 2:  # les sommes de dt ne tombent pas juste : un reste d'un demi-tick est négligé
+            duration = seconds if seconds < CATCH_UP_STEP else CATCH_UP_STEP  # min() créerait un itérateur
+            if duration > dt:
+                reach = int(npc.speed * duration) + 1
+                near = self.near
+                near.update(npc.points[(npc.current_point + 1) % npc.nb_points])
+                near.inflate_ip(2 * reach, 2 * reach)
+                if npc.rect.colliderect(near):
+                    duration = dt
+            npc.save_location()
+            npc.move(duration, pathfinder)
+            npc.update()  # le point atteint se lit sur le rectangle du sprite
+            if walls is not None and npc.collides(walls):
+                npc.move_back()  # sans ce test, les pas suivants traverseraient le mur
+                break
+            seconds -= duration
+
+    def catch_up(self, map, seconds, dt):
+        """
+        Fait rattraper à une carte le temps passé sans elle (le joueur était sur une autre carte) : ses NPCs
+        et ses figurants avancent d'un coup, MAX_CATCH_UP secondes au plus.
+
+        :param map: (Map) La carte où revient le joueur.
+        :param seconds: (float) Le temps passé depuis que le joueur l'a quittée.
+        :param dt: (float) La durée d'un tick en secondes.
+        :return: None
+
+        >>> scheduler.catch_up(map_manager.get_map(), 12.5, 1 / 60)  # Ceci fera avancer les NPCs de 12,5 secondes
+        """
+        seconds = min(seconds, MAX_CATCH_UP)
+        caught_up = 0
+        for npc in map.npcs:
+            if npc.killed or not npc.points:
+                continue
+            lag, npc.lag = npc.lag, 0.0
+            self.step(npc, min(lag + seconds, MAX_CATCH_UP), dt, map.pathfinder, map.wall_index)
+            npc.save_previous_position()
+            caught_up += 1
+
+        crowd = map.crowd
+        if crowd.count:
+            remaining = seconds
+            while remaining > 0:
+                duration = min(remaining, CATCH_UP_STEP)
+                crowd.update(duration, NOWHERE)
+                remaining -= duration
+            crowd.save_previous_positions()
+            caught_up += len(crowd)
+        self.caught_up = caught_up
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,6 +1,167 @@
 import pygame
 import os
+from startup import startup_report
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SPRITES_DIR = os.path.join(SCRIPT_DIR, '..', 'sprites')
+
+FRAME_WIDTH = 23
+FRAME_HEIGHT = 32
+ANIMATION_ROWS = {'down': 0, 'left': 32, 'right': 64, 'up': 97}  # animation -> position y de sa ligne dans la planche
+FRAMES_PER_ANIMATION = 3
+ANIMATION_STEP = 14  # pixels parcourus entre deux images de l'animation
+
+
+class FrameCache:
+    """
+    Classe FrameCache qui garde en mémoire les planches de sprites et leurs images découpées,
+    partagées par toutes les entités qui utilisent la même planche.
+
+    Les images sont converties au format de l'écran (convert_alpha) dès qu'une fenêtre existe,
+    pour que leur affichage soit rapide.
+
+    :return: None
+
+    >>> frame_cache = FrameCache()
+    >>> frame_cache.hits, frame_cache.misses
+    (0, 0)
+    """
+
+    def __init__(self):
+        """
+        Initialise un cache vide.
+
+        :return: None
+        """
+        self.sheets = dict()      # nom -> planche de sprites chargée
+        self.frames = dict()      # (nom, x, y, largeur, hauteur, convertie) -> image découpée
+        self.animations = dict()  # (nom, convertie) -> {animation: [images]}
+        self.scaled = dict()      # (image, facteur) -> image agrandie (rendu des cartes agrandies, voir rendering.py)
+        self.hits = 0
+        self.misses = 0
+
+    def get_sheet(self, name):
+        """
+        Récupère une planche de sprites, chargée une seule fois.
+
+        :param name: (str) Le nom de la planche (fichier sprites/{name}.png).
+        :return: (pygame.Surface) La planche de sprites.
+        :CU: type(name) == str
+        """
+        sheet = self.sheets.get(name)
+        if sheet is None:
+            sheet = self.sheets[name] = pygame.image.load(os.path.join(SPRITES_DIR, f'{name}.png'))
+        return sheet
+
+    def get_frame(self, name, x, y, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+        """
+        Récupère une image découpée dans une planche, découpée et convertie une seule fois.
+
+        :param name: (str) Le nom de la planche.
+        :param x: (int) La position x de l'image dans la planche.
+        :param y: (int) La position y de l'image dans la planche.
+        :param width: (int) La largeur de l'image.
+        :param height: (int) La hauteur de l'image.
+        :return: (pygame.Surface) L'image, partagée : il ne faut pas la modifier.
+        :CU: type(name) == str
+
+        >>> image = frame_cache.get_frame("player", 0, 0)  # Ceci récupérera la première image du joueur
+        """
+        converted = pygame.display.get_surface() is not None
+        key = (name, x, y, width, height, converted)
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.hits += 1
+            return frame
+
+        self.misses += 1
+        frame = pygame.Surface([width, height], pygame.SRCALPHA)  # Taille en largeur et hauteur
+        frame.blit(self.get_sheet(name), (0, 0), (x, y, width, height))  # Extraire un morceau de sprite
+        if converted:
+            frame = frame.convert_alpha()  # format de l'écran : affichage rapide
+        frame.set_alpha(255)  # Opacité maximale, réglée une fois pour toutes
+        self.frames[key] = frame
+        return frame
+
+    def get_animations(self, name):
+        """
+        Récupère toutes les animations d'une planche (bas, gauche, droite, haut).
+
+        :param name: (str) Le nom de la planche.
+        :return: (dict) animation -> liste des images, partagée par toutes les entités.
+        :CU: type(name) == str
+
+        >>> images = frame_cache.get_animations("bandit")  # Ceci découpera les animations du bandit (une seule fois)
+        """
+        converted = pygame.display.get_surface() is not None
+        animations = self.animations.get((name, converted))
+        if animations is not None:
+            self.hits += 1
+            return animations
+
+        self.misses += 1
+        animations = {
+            animation: [self.get_frame(name, i * FRAME_WIDTH, y) for i in range(FRAMES_PER_ANIMATION)]
+            for animation, y in ANIMATION_ROWS.items()
+        }
+        self.animations[(name, converted)] = animations
+        return animations
+
+    def get_scaled(self, image, factor):
+        """
+        Récupère une image agrandie d'un facteur entier, agrandie une seule fois.
+
+        :param image: (pygame.Surface) Une image du cache (ou toute image qui ne sera plus modifiée).
+        :param factor: (int) Le facteur d'agrandissement.
+        :return: (pygame.Surface) L'image agrandie, partagée : il ne faut pas la modifier.
+        :CU: factor >= 1
+
+        >>> frame_cache.get_scaled(frame_cache.get_frame("player", 0, 0), 3).get_size()
+        (69, 96)
+        """
+        key = (image, factor)
+        scaled = self.scaled.get(key)
+        if scaled is None:
+            scaled = self.scaled[key] = pygame.transform.scale_by(image, factor)  # au plus proche : pixels nets
+        return scaled
+
+    def prescale(self, factor):
+        """
+        Agrandit à l'avance toutes les images déjà découpées, pour qu'aucune ne soit agrandie pendant le jeu.
+
+        :param factor: (int) Le facteur d'agrandissement.
+        :return: None
+
+        >>> frame_cache.prescale(3)  # Ceci agrandira trois fois les images de tous les sprites chargés
+        """
+        for frame in list(self.frames.values()):
+            self.get_scaled(frame, factor)
+
+    def prewarm(self, names=None):
+        """
+        Charge et découpe à l'avance les planches de sprites.
+
+        :param names: (list) Les noms des planches, toutes celles du dossier sprites/ par défaut.
+        :return: None
+
+        >>> frame_cache.prewarm()  # Ceci chargera toutes les planches du dossier sprites/
+        """
+        if names is None:
+            names = sorted(os.path.splitext(file)[0] for file in os.listdir(SPRITES_DIR) if file.endswith('.png'))
+        for name in names:
+            self.get_animations(name)
+
+    def clear(self):
+        """
+        Vide le cache et remet les compteurs à zéro.
+
+        :return: None
+        """
+        self.__init__()
+
+
+# Cache partagé par tous les sprites animés du jeu
+frame_cache = FrameCache()
+
 
 class AnimateSprite(pygame.sprite.Sprite):
     """
@@ -12,6 +173,10 @@ class AnimateSprite(pygame.sprite.Sprite):
 
     >>> animate_sprite = AnimateSprite("player")  # Ceci créera un nouveau sprite animé avec le nom "player"
     """
+
+    # Attributs lus à chaque image (dessin, animation) : cases fixes plutôt que __dict__
+    __slots__ = ("sprite_name", "sprite_sheet", "images", "animation_index", "clock", "speed", "image", "rect")
+
     def __init__(self, name):
         """
         Initialise le sprite animé.
@@ -23,39 +188,50 @@ class AnimateSprite(pygame.sprite.Sprite):
         >>> animate_sprite = AnimateSprite("player")  # Ceci initialisera le sprite animé avec le nom "player"
         """
         super().__init__() # Pour l'héritage
-        self.sprite_sheet = pygame.image.load(os.path.join(SCRIPT_DIR, f'../sprites/{name}.png'))
+        self.sprite_name = name
+        with startup_report.phase(f"sprite({name})"):
+            self.sprite_sheet = frame_cache.get_sheet(name)
+            self.images = frame_cache.get_animations(name)  # images partagées avec les autres sprites
         self.animation_index = 0
-        self.clock = 0
-        self.images = {
-            'down': self.get_images(0),
-            'left': self.get_images(32),
-            'right': self.get_images(64),
-            'up': self.get_images(97)
-        }
-        self.speed = 2
+        self.clock = 0  # pixels parcourus depuis le dernier changement d'image
+        self.speed = 120  # pixels par seconde
 
-    def change_animation(self, name):
+    def change_animation(self, name, dt):
         """
-        Change l'animation du sprite.
+        Change l'animation du sprite et la fait avancer : l'image change tous les ANIMATION_STEP pixels parcourus,
+        soit speed / ANIMATION_STEP images par seconde, quelle que soit la fréquence des ticks.
 
         :param name: (str) Le nom de l'animation à utiliser.
+        :param dt: (float) La durée du tick en secondes.
         :return: None
         :CU: type(name) == str
 
-        >>> animate_sprite.change_animation("right")  # Ceci changera l'animation du sprite à "right"
+        >>> animate_sprite.change_animation("right", 1 / 60)  # Ceci changera l'animation du sprite à "right"
         """
-        self.image = self.images[name][self.animation_index]
-        self.image.set_alpha(255) # Opacité maximale
-        self.clock += self.speed * 8
+        self.image = self.images[name][self.animation_index] # opacité déjà réglée par le cache
+        self.clock += self.speed * dt
 
-        if self.clock >= 100:
+        if self.clock >= ANIMATION_STEP:
 
             self.animation_index += 1 # passer à l'image suivante
 
             if self.animation_index >= len(self.images[name]):
                 self.animation_index = 0
 
-            self.clock = 0
+            self.clock -= ANIMATION_STEP
+
+    def reset_animation(self):
+        """
+        Remet le sprite sur la première image de l'animation "down", comme à sa création.
+
+        :return: None
+
+        >>> animate_sprite.reset_animation()  # Ceci remettra le sprite face à l'écran
+        """
+        self.animation_index = 0
+        self.clock = 0
+        self.image = self.images["down"][0]
+
     def get_images(self, y):
         """
         Récupère les images pour l'animation du sprite.
@@ -68,8 +244,8 @@ class AnimateSprite(pygame.sprite.Sprite):
         """
         images = []
 
-        for i in range(0, 3):
-            x = i*23
+        for i in range(0, FRAMES_PER_ANIMATION):
+            x = i*FRAME_WIDTH
             image = self.get_image(x, y)
             images.append(image)
 
@@ -81,16 +257,12 @@ class AnimateSprite(pygame.sprite.Sprite):
 
         :param x: (int) La position x de l'image à récupérer.
         :param y: (int) La position y de l'image à récupérer.
-        :return: (pygame.Surface) L'image récupérée.
+        :return: (pygame.Surface) L'image récupérée, partagée avec les autres sprites de la même planche.
         :CU: type(x) == int and type(y) == int
 
         >>> image = animate_sprite.get_image(0, 0)  # Ceci récupérera l'image pour l'animation du sprite à la position (0, 0)
         """
-        image = pygame.Surface([23, 32], pygame.SRCALPHA)  # Taille en largeur et hauteur
-        image.blit(self.sprite_sheet, (0, 0), (x, y, 23, 32))  # Extraire un morceau de sprite
-                                                               # (0,0) -> distance par défaut
-                                                               # (x, y, 22, 33) coordonnées + hauteur et largeur de l'image
-        return image  # renvoie l'image qui a été découpée
+        return frame_cache.get_frame(self.sprite_name, x, y)  # renvoie l'image découpée (une seule fois pour tous les sprites)
 
 if __name__ == "__main__":
     import doctest
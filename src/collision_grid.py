@@ -0,0 +1,372 @@
+import numpy as np
+
+# Constantes passées aux fonctions NumPy de batch_blocked : un tableau à 0 dimension n'est pas converti à chaque
+# appel, contrairement à un nombre Python
+HALF = np.array(0.5)
+ONE = np.array(1)
+ZERO = np.array(0)
+ZERO_COUNT = np.array(0, dtype=np.int32)
+
+
+class CollisionGrid:
+    """
+    Classe CollisionGrid qui garde, pour chaque tuile d'une carte, si un mur la touche.
+
+    La grille est calculée une seule fois à partir des rectangles de collision. Une table des sommes
+    cumulées permet de savoir en O(1) si un rectangle touche une tuile bloquée, et de tester les pieds
+    de toutes les entités en un seul appel NumPy.
+
+    La grille est prudente : une tuile est bloquée dès qu'un mur la touche, même en partie. Une tuile libre
+    garantit donc l'absence de collision ; une tuile bloquée doit être confirmée avec les rectangles exacts.
+    Une grille construite avec ses murs les range aussi par tuile, pour les confirmer d'un coup (rects_hit).
+
+    Une grille peut ne couvrir qu'une partie de la carte (les blocs chargés d'une carte découpée, voir streaming.py) :
+    origin est alors la tuile de la carte rangée en blocked[0, 0], et les tuiles hors de la grille sont libres.
+
+    :param blocked: (numpy.ndarray) Le tableau booléen (lignes, colonnes) des tuiles bloquées.
+    :param tile_width: (int) La largeur d'une tuile en pixels.
+    :param tile_height: (int) La hauteur d'une tuile en pixels.
+    :param origin: (tuple) La tuile (colonne, ligne) de la carte qui correspond au coin de la grille.
+    :param walls: (list) Les rectangles des murs (x, y, largeur, hauteur) en pixels, pour rects_hit.
+    :return: None
+
+    >>> grid = CollisionGrid.from_rects([(32, 32, 16, 16)], 10, 10, 16, 16)
+    >>> grid.point_blocked(40, 40), grid.point_blocked(10, 10)
+    (True, False)
+    >>> grid.rect_blocked((20, 20, 14, 14)), grid.rect_blocked((0, 0, 16, 16))
+    (True, False)
+    >>> grid.rects_blocked([(20, 20, 14, 14), (0, 0, 16, 16)]).tolist()
+    [True, False]
+    >>> thin = CollisionGrid.from_rects([(32, 32, 4, 16)], 10, 10, 16, 16)
+    >>> thin.rects_blocked([(40, 40, 4, 4), (34, 40, 4, 4)]).tolist(), thin.rects_hit([(40, 40, 4, 4), (34, 40, 4, 4)]).tolist()
+    ([True, True], [False, True])
+    >>> part = CollisionGrid.from_rects([(32, 32, 16, 16)], 2, 2, 16, 16, origin=(2, 2))
+    >>> part.point_blocked(40, 40), part.rect_blocked((20, 20, 14, 14)), part.point_blocked(0, 0)
+    (True, True, False)
+    """
+
+    def __init__(self, blocked, tile_width, tile_height, origin=(0, 0), walls=()):
+        """
+        Initialise la grille, sa table des sommes cumulées et la table des murs de chaque tuile.
+
+        :param blocked: (numpy.ndarray) Le tableau booléen (lignes, colonnes) des tuiles bloquées.
+        :param tile_width: (int) La largeur d'une tuile en pixels.
+        :param tile_height: (int) La hauteur d'une tuile en pixels.
+        :param origin: (tuple) La tuile (colonne, ligne) de la carte qui correspond à blocked[0, 0].
+        :param walls: (list) Les rectangles des murs en pixels, aucun pour une grille sans rects_hit.
+        :return: None
+        """
+        self.blocked = blocked
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.rows, self.columns = blocked.shape
+        self.origin = tuple(origin)
+        self.origin_column, self.origin_row = self.origin
+
+        # sums[r, c] = nombre de tuiles bloquées dans blocked[:r, :c]
+        self.sums = np.zeros((self.rows + 1, self.columns + 1), dtype=np.int32)
+        self.sums[1:, 1:] = blocked.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+
+        # Pour batch_blocked : la table à plat et les dimensions en tableaux à 0 dimension
+        self.flat_sums = self.sums.reshape(-1)
+        self.stride = np.array(self.columns + 1)
+        self.bounds = (np.array(self.columns), np.array(self.rows))
+        self.tile_sizes = (np.array(tile_width), np.array(tile_height))
+        self.offsets = (np.array(self.origin_column * tile_width), np.array(self.origin_row * tile_height))
+
+        # Pour rects_hit : les bords (gauche, haut, droite, bas) des murs qui touchent chaque tuile
+        self.tile_walls = self._wall_table(walls)
+
+    @classmethod
+    def from_rects(cls, rects, columns, rows, tile_width, tile_height, origin=(0, 0)):
+        """
+        Construit la grille en marquant toutes les tuiles touchées par les rectangles de collision.
+
+        :param rects: (list) Les rectangles de collision (x, y, largeur, hauteur).
+        :param columns: (int) La largeur de la grille en tuiles (celle de la carte par défaut).
+        :param rows: (int) La hauteur de la grille en tuiles.
+        :param tile_width: (int) La largeur d'une tuile en pixels.
+        :param tile_height: (int) La hauteur d'une tuile en pixels.
+        :param origin: (tuple) La tuile (colonne, ligne) de la carte qui correspond au coin de la grille.
+        :return: (CollisionGrid) La grille construite.
+
+        >>> grid = CollisionGrid.from_rects(map.walls, 100, 100, 16, 16)  # Ceci construira la grille des murs d'une carte
+        """
+        blocked = np.zeros((rows, columns), dtype=bool)
+        origin_column, origin_row = origin
+        for x, y, width, height in rects:
+            if width <= 0 or height <= 0:
+                continue
+            left = max(x // tile_width - origin_column, 0)
+            right = min((x + width - 1) // tile_width + 1 - origin_column, columns)
+            top = max(y // tile_height - origin_row, 0)
+            bottom = min((y + height - 1) // tile_height + 1 - origin_row, rows)
+            if left < right and top < bottom:
+                blocked[top:bottom, left:right] = True
+        return cls(blocked, tile_width, tile_height, origin, rects)
+
+    def point_blocked(self, x, y):
+        """
+        Indique si le point est sur une tuile bloquée.
+
+        :param x: (int) La position x en pixels.
+        :param y: (int) La position y en pixels.
+        :return: (bool) True si la tuile est bloquée, False hors de la grille.
+        """
+        column = int(x) // self.tile_width - self.origin_column
+        row = int(y) // self.tile_height - self.origin_row
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            return bool(self.blocked[row, column])
+        return False
+
+    def rect_blocked(self, rect):
+        """
+        Indique si le rectangle touche au moins une tuile bloquée, en O(1).
+
+        :param rect: (pygame.Rect) Le rectangle (x, y, largeur, hauteur) en pixels.
+        :return: (bool) True si une tuile touchée est bloquée.
+        """
+        x, y, width, height = rect
+        if width <= 0 or height <= 0:
+            return False
+        x -= self.origin_column * self.tile_width
+        y -= self.origin_row * self.tile_height
+        left, right = max(x // self.tile_width, 0), min((x + width - 1) // self.tile_width + 1, self.columns)
+        top, bottom = max(y // self.tile_height, 0), min((y + height - 1) // self.tile_height + 1, self.rows)
+        if left >= right or top >= bottom:
+            return False
+        sums = self.sums
+        return bool(sums[bottom, right] - sums[top, right] - sums[bottom, left] + sums[top, left] > 0)
+
+    def rects_blocked(self, rects):
+        """
+        Teste plusieurs rectangles en une seule fois (par exemple les pieds de toutes les entités).
+
+        :param rects: (numpy.ndarray) Un tableau (n, 4) de rectangles (x, y, largeur, hauteur) en pixels.
+        :return: (numpy.ndarray) Un tableau booléen de n valeurs, True si le rectangle touche une tuile bloquée.
+        """
+        rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        left, right, top, bottom = self._tile_ranges(rects)
+        sums = self.sums
+        count = sums[bottom, right] - sums[top, right] - sums[bottom, left] + sums[top, left]
+        return (count > 0) & (rects[:, 2] > 0) & (rects[:, 3] > 0) & (right > left) & (bottom > top)
+
+    def rects_hit(self, rects):
+        """
+        Teste plusieurs rectangles contre les rectangles exacts des murs donnés à la construction, en une seule fois :
+        le test précis qui confirme rects_blocked. Seules les tuiles de la grille comptent, comme pour rects_blocked.
+
+        :param rects: (numpy.ndarray) Un tableau (n, 4) de rectangles (x, y, largeur, hauteur) en pixels.
+        :return: (numpy.ndarray) Un tableau booléen de n valeurs, True si le rectangle touche un mur
+                 (comme pygame.Rect.colliderect).
+        """
+        rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        hit = np.zeros(len(rects), dtype=bool)
+        if not len(rects) or not self.rows or not self.columns:
+            return hit
+        left, right, top, bottom = self._tile_ranges(rects)
+        edges = np.empty((4, len(rects)), dtype=np.int32)  # bords (gauche, haut, droite, bas), comme la table des murs
+        edges[:2] = rects[:, :2].T
+        edges[2:] = edges[:2] + rects[:, 2:].T
+
+        # Une tuile à la fois : chaque rectangle pas encore touché est testé contre les murs de sa première tuile,
+        # puis ceux qui en touchent une de plus contre les murs de la suivante...
+        for row_offset in range(int((bottom - top).max())):
+            for column_offset in range(int((right - left).max())):
+                todo = np.flatnonzero((top + row_offset < bottom) & (left + column_offset < right) & ~hit)
+                walls = self.tile_walls.take((top[todo] + row_offset) * self.columns + left[todo] + column_offset, axis=2)
+                box = edges.take(todo, axis=1)[:, None, :]
+                touch = ((walls[0] < box[2]) & (box[0] < walls[2]) & (walls[1] < box[3]) & (box[1] < walls[3])).any(axis=0)
+                hit[todo[touch]] = True
+        return hit & (rects[:, 2] > 0) & (rects[:, 3] > 0)
+
+    def _tile_ranges(self, rects):
+        """
+        Calcule les tuiles [left, right[ et [top, bottom[ de la grille touchées par des rectangles.
+
+        :param rects: (numpy.ndarray) Un tableau (n, 4) d'entiers : les rectangles (x, y, largeur, hauteur) en pixels.
+        :return: (tuple) Les tableaux left, right, top et bottom, limités à la grille.
+        """
+        x, y, width, height = rects.T
+        if self.origin_column or self.origin_row:
+            x = x - self.origin_column * self.tile_width
+            y = y - self.origin_row * self.tile_height
+        left = np.clip(x // self.tile_width, 0, self.columns)
+        right = np.clip((x + width - 1) // self.tile_width + 1, 0, self.columns)
+        top = np.clip(y // self.tile_height, 0, self.rows)
+        bottom = np.clip((y + height - 1) // self.tile_height + 1, 0, self.rows)
+        return left, right, top, bottom
+
+    def _wall_table(self, walls):
+        """
+        Range les murs par tuile, pour rects_hit.
+
+        :param walls: (list) Les rectangles des murs (x, y, largeur, hauteur) en pixels.
+        :return: (numpy.ndarray) Un tableau (4, places, tuiles), la tuile (ligne, colonne) rangée en
+                 ligne * colonnes + colonne : les bords (gauche, haut, droite, bas) des murs qui touchent chaque tuile.
+                 Une place vide a des bords inversés, qui ne touchent rien. Chaque bord est contigu pour les tuiles,
+                 ce qui rend la lecture et la comparaison de beaucoup de tuiles à la fois plus rapides.
+        """
+        tiles = dict()  # (ligne, colonne) -> bords des murs
+        for x, y, width, height in walls:
+            if width <= 0 or height <= 0:
+                continue
+            left = max(x // self.tile_width - self.origin_column, 0)
+            right = min((x + width - 1) // self.tile_width + 1 - self.origin_column, self.columns)
+            top = max(y // self.tile_height - self.origin_row, 0)
+            bottom = min((y + height - 1) // self.tile_height + 1 - self.origin_row, self.rows)
+            if left >= right or top >= bottom:
+                continue
+            for row in range(top, bottom):
+                for column in range(left, right):
+                    tiles.setdefault((row, column), []).append((x, y, x + width, y + height))
+
+        limit = np.iinfo(np.int32)
+        table = np.empty((self.rows * self.columns, max(map(len, tiles.values()), default=1), 4), dtype=np.int32)
+        table[...] = (limit.max, limit.max, limit.min, limit.min)
+        for (row, column), edges in tiles.items():
+            table[row * self.columns + column, :len(edges)] = edges
+        return np.ascontiguousarray(table.transpose(2, 1, 0))
+
+    def batch_blocked(self, batch):
+        """
+        Teste les rectangles d'un lot comme rects_blocked, mais dans les tableaux du lot : rien n'est alloué.
+
+        :param batch: (RectBatch) Le lot de rectangles à tester.
+        :return: (numpy.ndarray) Le tableau booléen du lot, True si le rectangle touche une tuile bloquée.
+        """
+        columns, rows = self.bounds
+        tile_width, tile_height = self.tile_sizes
+        offset_x, offset_y = self.offsets
+        _tile_range(batch.x, batch.width, offset_x, tile_width, columns, batch.left, batch.right, batch.work)
+        _tile_range(batch.y, batch.height, offset_y, tile_height, rows, batch.top, batch.bottom, batch.work)
+
+        # count = sums[bottom, right] - sums[top, right] - sums[bottom, left] + sums[top, left], écrit sans boucle :
+        # une boucle for créerait un itérateur à chaque appel
+        count, part = batch.count, batch.part
+        self._gather(batch.bottom, batch.right, batch.index, count)
+        self._gather(batch.top, batch.right, batch.index, part)
+        np.subtract(count, part, out=count)
+        self._gather(batch.bottom, batch.left, batch.index, part)
+        np.subtract(count, part, out=count)
+        self._gather(batch.top, batch.left, batch.index, part)
+        np.add(count, part, out=count)
+
+        blocked, mask = batch.blocked, batch.mask
+        np.greater(count, ZERO_COUNT, out=blocked)
+        np.greater(batch.right, batch.left, out=mask)
+        np.logical_and(blocked, mask, out=blocked)
+        np.greater(batch.bottom, batch.top, out=mask)
+        np.logical_and(blocked, mask, out=blocked)
+        np.greater(batch.width, ZERO, out=mask)
+        np.logical_and(blocked, mask, out=blocked)
+        np.greater(batch.height, ZERO, out=mask)
+        np.logical_and(blocked, mask, out=blocked)
+        return blocked
+
+    def _gather(self, rows, columns, index, out):
+        """
+        Lit sums[rows, columns] dans out, sans allouer (index reçoit les positions dans la table à plat).
+
+        :param rows: (numpy.ndarray) Les lignes de la table des sommes.
+        :param columns: (numpy.ndarray) Les colonnes de la table des sommes.
+        :param index: (numpy.ndarray) Un tableau de travail entier.
+        :param out: (numpy.ndarray) Reçoit les valeurs lues.
+        :return: None
+        """
+        np.multiply(rows, self.stride, out=index)
+        np.add(index, columns, out=index)
+        self.flat_sums.take(index, out=out, mode="clip")  # la méthode en mode clip : np.take ou le mode par défaut allouent
+
+
+def _tile_range(position, size, offset, tile, limit, start, end, work):
+    """
+    Calcule sur un axe, dans start et end, les tuiles [start, end[ de la grille couvertes par des segments.
+
+    :param position: (numpy.ndarray) Les positions en pixels, arrondies comme pygame.Rect.
+    :param size: (numpy.ndarray) Les longueurs en pixels.
+    :param offset: (numpy.ndarray) La position en pixels du bord de la grille.
+    :param tile: (numpy.ndarray) La taille d'une tuile en pixels.
+    :param limit: (numpy.ndarray) Le nombre de tuiles de la grille sur cet axe.
+    :param start: (numpy.ndarray) Reçoit la première tuile de chaque segment.
+    :param end: (numpy.ndarray) Reçoit la tuile qui suit la dernière tuile de chaque segment.
+    :param work: (numpy.ndarray) Un tableau de travail en virgule flottante.
+    :return: None
+    """
+    # au plus proche, 0.5 loin de zéro, comme rect.x = position
+    np.copysign(HALF, position, out=work)
+    np.add(position, work, out=work)
+    np.trunc(work, out=work)
+    np.copyto(start, work, casting="unsafe")
+    np.subtract(start, offset, out=start)
+
+    np.add(start, size, out=end)
+    np.subtract(end, ONE, out=end)
+    np.floor_divide(end, tile, out=end)
+    np.add(end, ONE, out=end)
+    np.floor_divide(start, tile, out=start)
+    np.maximum(start, ZERO, out=start)
+    np.minimum(start, limit, out=start)
+    np.maximum(end, ZERO, out=end)
+    np.minimum(end, limit, out=end)
+
+
+class RectBatch:
+    """
+    Classe RectBatch qui garde les tableaux d'un lot de rectangles testés d'un coup avec CollisionGrid.batch_blocked.
+
+    Les tableaux sont créés une fois pour toutes : un lot réutilisé à chaque tick ne crée aucun objet. Les positions
+    sont des flottants, arrondis comme pygame.Rect au moment du test (lire rect.x créerait un entier par rectangle).
+    Un rectangle de largeur nulle n'est jamais bloqué : il garde la place d'une entité absente.
+
+    :param size: (int) Le nombre de rectangles du lot.
+    :return: None
+
+    >>> grid = CollisionGrid.from_rects([(32, 32, 16, 16)], 10, 10, 16, 16)
+    >>> batch = RectBatch(3)
+    >>> batch.set(0, 19.6, 20.0, 14, 14)
+    >>> batch.set(1, 0.0, 0.0, 16, 16)
+    >>> batch.set(2, 40.0, 40.0, 0, 0)
+    >>> grid.batch_blocked(batch).tolist()
+    [True, False, False]
+    """
+
+    def __init__(self, size):
+        """
+        Crée les tableaux du lot, tous les rectangles vides.
+
+        :param size: (int) Le nombre de rectangles du lot.
+        :return: None
+        """
+        self.size = size
+        self.x = np.zeros(size)
+        self.y = np.zeros(size)
+        self.width = np.zeros(size, dtype=np.int64)
+        self.height = np.zeros(size, dtype=np.int64)
+        self.left, self.right, self.top, self.bottom, self.index = (np.zeros(size, dtype=np.int64) for _ in range(5))
+        self.count = np.zeros(size, dtype=np.int32)
+        self.part = np.zeros(size, dtype=np.int32)
+        self.work = np.zeros(size)
+        self.blocked = np.zeros(size, dtype=bool)
+        self.mask = np.zeros(size, dtype=bool)
+
+    def set(self, index, x, y, width, height):
+        """
+        Place un rectangle du lot.
+
+        :param index: (int) La place du rectangle dans le lot.
+        :param x: (float) La position x en pixels, avant arrondi.
+        :param y: (float) La position y en pixels, avant arrondi.
+        :param width: (int) La largeur en pixels, 0 pour un rectangle jamais bloqué.
+        :param height: (int) La hauteur en pixels.
+        :return: None
+        """
+        self.x[index] = x
+        self.y[index] = y
+        self.width[index] = width
+        self.height[index] = height
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
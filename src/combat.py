@@ -1,22 +1,27 @@
-import pygame
-import os
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+import random
+
+import combat_engine
+from combat_engine import CombatState, Fighter
 
 
 class Combat:
     """
     Classe Combat qui gère les combats entre le joueur et un NPC.
 
+    Les règles (qui attaque, combien de dégâts, qui a gagné) sont celles de combat_engine ; cette classe
+    les applique aux points de vie du joueur et du NPC et affiche les messages du combat.
+
     :param player: (Player) Le joueur du jeu.
     :param npc: (NPC) Le NPC avec lequel le joueur combat.
     :param screen: (pygame.Surface) L'écran sur lequel dessiner le combat.
     :param game: (Game) Le jeu auquel appartient le combat.
+    :param rng: (random.Random) La source de hasard des attaques.
     :return: None
     :CU: isinstance(player, Player) and isinstance(npc, NPC) and isinstance(screen, pygame.Surface) and isinstance(game, Game)
 
     >>> combat = Combat(player, npc, screen, game)  # Ceci créera un nouveau combat entre le joueur et le NPC donnés
     """
-    def __init__(self, player, npc, screen, game):
+    def __init__(self, player, npc, screen, game, rng=random):
         """
         Initialise le combat entre le joueur et le NPC.
 
@@ -24,6 +29,7 @@ class Combat:
         :param npc: (NPC) Le NPC avec lequel le joueur combat.
         :param screen: (pygame.Surface) L'écran sur lequel dessiner le combat.
         :param game: (Game) Le jeu auquel appartient le combat.
+        :param rng: (random.Random) La source de hasard des attaques.
         :return: None
         :CU: isinstance(player, Player) and isinstance(npc, NPC) and isinstance(screen, pygame.Surface) and isinstance(game, Game)
 
@@ -33,83 +39,76 @@ class Combat:
         self.npc = npc
         self.screen = screen
         self.game = game
+        self.rng = rng
         self.turn = 0  # 0 pour le tour du joueur, 1 pour le tour du PNJ
 
+    def state(self):
+        """
+        Donne l'état du combat pour le moteur de combat, à partir des points de vie actuels.
 
-    def player_attack(self):
+        :return: (CombatState) L'état du combat.
         """
-        Fait attaquer le joueur le NPC.
+        return CombatState(self.player.hp, self.npc.hp, self.turn)
+
+    def play_turn(self):
+        """
+        Joue un tour du combat : le joueur ou le NPC attaque, puis c'est au tour de l'autre.
 
         :return: None
 
-        >>> combat.player_attack()  # Ceci fera attaquer le joueur le NPC
+        >>> combat.play_turn()  # Ceci fera jouer un tour au joueur ou au NPC
         """
-
-        damage = self.player.attack_strength
-        self.npc.hp -= damage
-        print(f"Vous avez infligé {damage} points de dégâts au {self.npc.name} !")
-        if self.npc.hp <= 0:
+        attacker = self.turn
+        state, damage = combat_engine.play_turn(self.state(), Fighter.from_entity(self.player),
+                                                Fighter.from_entity(self.npc), self.rng)
+        self.player.hp, self.npc.hp, self.turn = state.player_hp, state.npc_hp, state.turn
+
+        if attacker == 0:
+            print(f"Vous avez infligé {damage} points de dégâts au {self.npc.name} !")
+            if self.npc.hp <= 0:
                 print(f"Vous avez vaincu le {self.npc.name} !")
+        else:
+            print(f"Le {self.npc.name} vous a infligé {damage} points de dégâts !")
+            if self.player.hp <= 0:
+                print(f"Vous avez été vaincu par le {self.npc.name} !")
 
-    def npc_attack(self):
+    def is_over(self):
         """
-        Fait attaquer le NPC le joueur.
+        Indique si le combat est terminé (le joueur ou le NPC n'a plus de points de vie).
 
-        :return: None
+        :return: (bool) True si le combat est terminé.
+        """
+        return combat_engine.is_over(self.state())
+
+    def finish(self):
+        """
+        Termine le combat : le NPC vaincu est retiré de la carte.
+
+        :return: (bool) True si le joueur a gagné, False s'il a été vaincu.
 
-        >>> combat.npc_attack()  # Ceci fera attaquer le NPC le joueur
+        >>> player_won = combat.finish()  # Ceci retirera le NPC vaincu de la carte
         """
-        damage = self.npc.attack_strength
-        self.player.hp -= damage
-        print(f"Le {self.npc.name} vous a infligé {damage} points de dégâts !")
-        if self.player.hp <= 0:
-            print(f"Vous avez été vaincu par le {self.npc.name} !")
+        if not combat_engine.player_won(self.state()):
+            return False
+
+        print(f"{self.npc.name} a perdu")
+        # Supprimer le PNJ de la carte
+        self.npc.kill()
+        return True
 
     def run(self):
         """
-        Exécute le combat en alternant les tours entre le joueur et le NPC.
+        Exécute tout le combat d'un coup en alternant les tours entre le joueur et le NPC.
 
-        :return: None
+        L'écran de fin de partie n'est pas géré ici : c'est la scène de combat du jeu qui s'en charge.
+
+        :return: (bool) True si le joueur a gagné, False s'il a été vaincu.
 
-        >>> combat.run()  # Ceci exécutera le combat
+        >>> player_won = combat.run()  # Ceci exécutera le combat
         """
-        while self.player.hp > 0 and self.npc.hp > 0:
-            if self.turn == 0:
-                self.player_attack()
-                self.turn = 1
-            else:
-                self.npc_attack()
-                self.turn = 0
-
-        if self.player.hp <= 0:
-            # Créer un écran noir
-            black_screen = pygame.Surface(self.screen.get_size())
-            black_screen.fill((0, 0, 0))  # Remplir l'écran de noir
-
-            # Créer le message "Vous êtes mort"
-            font_path = os.path.join(BASE_DIR, 'dialogs', 'dialog_font.ttf')
-            font = pygame.font.Font(font_path, 36)  # Choisir la police et la taille du texte
-            text = font.render("Vous êtes mort", True, (255, 255, 255))  # Créer le texte
-
-            # Positionner le texte au centre de l'écran
-            text_rect = text.get_rect(center=(self.screen.get_width() / 2, self.screen.get_height() / 2))
-
-            # Dessiner l'écran noir et le texte
-            self.screen.blit(black_screen, (0, 0))
-            self.screen.blit(text, text_rect)
-
-            # Mettre à jour l'affichage
-            pygame.display.flip()
-
-            # Attendre 3 secondes avant de réinitialiser la partie
-            pygame.time.wait(3000)
-
-            # Réinitialiser la partie
-            self.game.reset_game()
-        elif self.npc.hp <= 0:
-            print(f"{self.npc.name} a perdu")
-            # Supprimer le PNJ de la carte
-            self.npc.kill()
+        while not self.is_over():
+            self.play_turn()
+        return self.finish()
 
 if __name__ == "__main__":
     import doctest
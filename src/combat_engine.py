@@ -0,0 +1,181 @@
+import random
+from dataclasses import dataclass, replace
+
+MAX_TURNS = 1000  # au-delà, le combat est arrêté sans vainqueur (deux combattants qui ne se touchent jamais...)
+
+
+@dataclass(frozen=True)
+class Fighter:
+    """
+    Classe Fighter qui décrit un combattant par ses seules caractéristiques de combat, sans sprite ni carte.
+
+    Une attaque touche avec la probabilité hit_chance et inflige attack_strength dégâts, plus ou moins
+    damage_spread (tirage uniforme). Avec les valeurs par défaut, une attaque touche toujours et inflige
+    toujours attack_strength dégâts, comme dans le jeu aujourd'hui.
+
+    :param name: (str) Le nom du combattant.
+    :param hp: (int) Les points de vie au début du combat.
+    :param attack_strength: (int) Les dégâts d'une attaque.
+    :param hit_chance: (float) La probabilité qu'une attaque touche, entre 0 et 1.
+    :param damage_spread: (int) L'écart maximal des dégâts autour de attack_strength.
+    :return: None
+    :CU: hp > 0 and attack_strength >= 0 and 0 <= hit_chance <= 1 and 0 <= damage_spread
+
+    >>> Fighter("mushroom", hp=50, attack_strength=7).hp
+    50
+    """
+    name: str
+    hp: int
+    attack_strength: int
+    hit_chance: float = 1.0
+    damage_spread: int = 0
+
+    @classmethod
+    def from_entity(cls, entity):
+        """
+        Crée le combattant d'une entité du jeu (joueur ou NPC), avec ses points de vie actuels.
+
+        :param entity: (Entity) Le joueur ou le NPC.
+        :return: (Fighter) Le combattant.
+
+        >>> fighter = Fighter.from_entity(npc)  # Ceci décrira le NPC pour le moteur de combat
+        """
+        return cls(entity.name, entity.hp, entity.attack_strength,
+                   getattr(entity, "hit_chance", 1.0), getattr(entity, "damage_spread", 0))
+
+    @classmethod
+    def from_stats(cls, name, stats):
+        """
+        Crée un combattant à partir d'une table de caractéristiques (PLAYER_STATS, NPC_STATS...).
+
+        :param name: (str) Le nom du combattant.
+        :param stats: (dict) Les caractéristiques : "hp", "attack_strength" et, en option, "hit_chance" et "damage_spread".
+        :return: (Fighter) Le combattant.
+
+        >>> Fighter.from_stats("player", {"hp": 100, "attack_strength": 10}).attack_strength
+        10
+        """
+        return cls(name, **stats)
+
+
+@dataclass(frozen=True)
+class CombatState:
+    """
+    Classe CombatState qui décrit où en est un combat. Un état n'est jamais modifié : chaque tour en crée un nouveau.
+
+    :param player_hp: (int) Les points de vie du joueur.
+    :param npc_hp: (int) Les points de vie du NPC.
+    :param turn: (int) 0 si c'est au joueur d'attaquer, 1 si c'est au NPC.
+    :param turns: (int) Le nombre de tours déjà joués.
+    :return: None
+
+    >>> CombatState(100, 50).turn
+    0
+    """
+    player_hp: int
+    npc_hp: int
+    turn: int = 0
+    turns: int = 0
+
+
+def start(player, npc):
+    """
+    Donne l'état du début d'un combat : le joueur attaque en premier.
+
+    :param player: (Fighter) Le joueur.
+    :param npc: (Fighter) Le NPC.
+    :return: (CombatState) L'état de départ.
+
+    >>> start(Fighter("player", 100, 10), Fighter("bandit", 50, 7))
+    CombatState(player_hp=100, npc_hp=50, turn=0, turns=0)
+    """
+    return CombatState(player.hp, npc.hp)
+
+
+def roll_damage(attacker, rng=random):
+    """
+    Tire les dégâts d'une attaque.
+
+    :param attacker: (Fighter) Le combattant qui attaque.
+    :param rng: (random.Random) La source de hasard, utilisée seulement si l'attaque peut rater ou varier.
+    :return: (int) Les dégâts infligés, 0 si l'attaque rate.
+
+    >>> roll_damage(Fighter("player", 100, 10))
+    10
+    """
+    if attacker.hit_chance < 1 and rng.random() >= attacker.hit_chance:
+        return 0
+    damage = attacker.attack_strength
+    if attacker.damage_spread:
+        damage += rng.randint(-attacker.damage_spread, attacker.damage_spread)
+    return max(damage, 0)
+
+
+def play_turn(state, player, npc, rng=random):
+    """
+    Joue un tour : le combattant dont c'est le tour attaque l'autre.
+
+    :param state: (CombatState) L'état avant le tour.
+    :param player: (Fighter) Le joueur.
+    :param npc: (Fighter) Le NPC.
+    :param rng: (random.Random) La source de hasard.
+    :return: (tuple) Le nouvel état et les dégâts infligés pendant le tour.
+
+    >>> play_turn(CombatState(100, 50), Fighter("player", 100, 10), Fighter("bandit", 50, 7))
+    (CombatState(player_hp=100, npc_hp=40, turn=1, turns=1), 10)
+    """
+    if state.turn == 0:
+        damage = roll_damage(player, rng)
+        return replace(state, npc_hp=state.npc_hp - damage, turn=1, turns=state.turns + 1), damage
+    damage = roll_damage(npc, rng)
+    return replace(state, player_hp=state.player_hp - damage, turn=0, turns=state.turns + 1), damage
+
+
+def is_over(state):
+    """
+    Indique si le combat est terminé (le joueur ou le NPC n'a plus de points de vie).
+
+    :param state: (CombatState) L'état du combat.
+    :return: (bool) True si le combat est terminé.
+
+    >>> is_over(CombatState(100, 0))
+    True
+    """
+    return state.player_hp <= 0 or state.npc_hp <= 0
+
+
+def player_won(state):
+    """
+    Indique si le joueur a gagné le combat.
+
+    :param state: (CombatState) L'état du combat.
+    :return: (bool) True si le NPC n'a plus de points de vie et le joueur en a encore.
+
+    >>> player_won(CombatState(30, -5))
+    True
+    """
+    return state.npc_hp <= 0 < state.player_hp
+
+
+def fight(player, npc, rng=random, max_turns=MAX_TURNS):
+    """
+    Joue un combat entier et donne son état final.
+
+    :param player: (Fighter) Le joueur.
+    :param npc: (Fighter) Le NPC.
+    :param rng: (random.Random) La source de hasard.
+    :param max_turns: (int) Le nombre maximal de tours joués.
+    :return: (CombatState) L'état à la fin du combat.
+
+    >>> fight(Fighter("player", 100, 10), Fighter("bandit", 50, 7))
+    CombatState(player_hp=72, npc_hp=0, turn=1, turns=9)
+    """
+    state = start(player, npc)
+    while not is_over(state) and state.turns < max_turns:
+        state, damage = play_turn(state, player, npc, rng)
+    return state
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
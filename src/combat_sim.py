@@ -0,0 +1,183 @@
+import time
+
+import numpy as np
+
+from combat_engine import MAX_TURNS, Fighter
+from player import NPC_STATS, PLAYER_STATS
+
+
+class CombatStats:
+    """
+    Classe CombatStats qui regroupe les résultats d'un grand nombre de combats simulés, un élément par combat.
+
+    :param won: (numpy.ndarray) True si le joueur a gagné le combat.
+    :param finished: (numpy.ndarray) False si le combat a été arrêté au bout de max_turns tours.
+    :param turns: (numpy.ndarray) Le nombre de tours joués.
+    :param damage_taken: (numpy.ndarray) Les dégâts reçus par le joueur.
+    :param damage_dealt: (numpy.ndarray) Les dégâts infligés par le joueur.
+    :param seconds: (float) La durée de la simulation.
+    :return: None
+
+    >>> stats = simulate(player, npc, fights=100000)
+    >>> stats.win_rate
+    1.0
+    """
+
+    def __init__(self, won, finished, turns, damage_taken, damage_dealt, seconds=0.0):
+        """
+        Regroupe les résultats des combats.
+
+        :param won: (numpy.ndarray) True si le joueur a gagné le combat.
+        :param finished: (numpy.ndarray) False si le combat a été arrêté au bout de max_turns tours.
+        :param turns: (numpy.ndarray) Le nombre de tours joués.
+        :param damage_taken: (numpy.ndarray) Les dégâts reçus par le joueur.
+        :param damage_dealt: (numpy.ndarray) Les dégâts infligés par le joueur.
+        :param seconds: (float) La durée de la simulation.
+        :return: None
+        """
+        self.won = won
+        self.finished = finished
+        self.turns = turns
+        self.damage_taken = damage_taken
+        self.damage_dealt = damage_dealt
+        self.seconds = seconds
+
+    @property
+    def fights(self):
+        """
+        Donne le nombre de combats simulés.
+
+        :return: (int) Le nombre de combats.
+        """
+        return len(self.won)
+
+    @property
+    def win_rate(self):
+        """
+        Donne la part des combats gagnés par le joueur.
+
+        :return: (float) La part des combats gagnés, entre 0 et 1.
+        """
+        return float(self.won.mean())
+
+    def distribution(self, values):
+        """
+        Compte les combats pour chaque valeur entière (tours, dégâts...).
+
+        :param values: (numpy.ndarray) Une valeur entière positive par combat.
+        :return: (dict) valeur -> part des combats qui ont cette valeur, seulement pour les valeurs présentes.
+
+        >>> stats.distribution(stats.turns)
+        {9: 1.0}
+        """
+        counts = np.bincount(values)
+        present = np.flatnonzero(counts)
+        return {int(value): float(counts[value]) / len(values) for value in present}
+
+    def summary(self):
+        """
+        Résume les combats : part gagnée, tours et dégâts reçus (moyenne, médiane, centile 95).
+
+        :return: (dict) Le résumé.
+        """
+        summary = {"fights": self.fights, "win_rate": self.win_rate,
+                   "unfinished": float(1 - self.finished.mean())}
+        for name, values in (("turns", self.turns), ("damage_taken", self.damage_taken),
+                             ("damage_dealt", self.damage_dealt)):
+            p50, p95 = np.percentile(values, [50, 95])
+            summary[name] = {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95),
+                             "max": int(values.max())}
+        return summary
+
+
+def roll_damages(attacker, count, rng):
+    """
+    Tire les dégâts de count attaques d'un même combattant, avec les mêmes règles que combat_engine.roll_damage.
+
+    :param attacker: (Fighter) Le combattant qui attaque.
+    :param count: (int) Le nombre d'attaques.
+    :param rng: (numpy.random.Generator) La source de hasard.
+    :return: (numpy.ndarray) Les dégâts de chaque attaque.
+
+    >>> roll_damages(Fighter("player", 100, 10), 3, np.random.default_rng(0))
+    array([10, 10, 10], dtype=int32)
+    """
+    damage = np.full(count, attacker.attack_strength, dtype=np.int32)
+    if attacker.damage_spread:
+        damage += rng.integers(-attacker.damage_spread, attacker.damage_spread + 1, count, dtype=np.int32)
+        np.maximum(damage, 0, out=damage)
+    if attacker.hit_chance < 1:
+        damage[rng.random(count) >= attacker.hit_chance] = 0
+    return damage
+
+
+def simulate(player, npc, fights=100000, seed=None, max_turns=MAX_TURNS):
+    """
+    Simule un grand nombre de combats entre le joueur et un NPC, tous en même temps dans des tableaux NumPy.
+
+    Tous les combats commencent ensemble et le joueur attaque toujours en premier : à chaque tour, c'est le
+    même combattant qui attaque dans tous les combats pas encore terminés.
+
+    :param player: (Fighter) Le joueur.
+    :param npc: (Fighter) Le NPC.
+    :param fights: (int) Le nombre de combats.
+    :param seed: (int) La graine du hasard, None pour une graine différente à chaque appel.
+    :param max_turns: (int) Le nombre maximal de tours d'un combat.
+    :return: (CombatStats) Les résultats des combats.
+    :CU: fights > 0
+
+    >>> simulate(Fighter("player", 100, 10), Fighter("bandit", 50, 7), fights=1000).win_rate
+    1.0
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+
+    player_hp = np.full(fights, player.hp, dtype=np.int32)
+    npc_hp = np.full(fights, npc.hp, dtype=np.int32)
+    turns = np.zeros(fights, dtype=np.int32)
+    active = np.arange(fights)  # combats pas encore terminés
+
+    for turn in range(max_turns):
+        if len(active) == 0:
+            break
+        if turn % 2 == 0:
+            npc_hp[active] -= roll_damages(player, len(active), rng)
+        else:
+            player_hp[active] -= roll_damages(npc, len(active), rng)
+        turns[active] += 1
+        active = active[(player_hp[active] > 0) & (npc_hp[active] > 0)]
+
+    finished = np.ones(fights, dtype=bool)
+    finished[active] = False
+    won = (npc_hp <= 0) & (player_hp > 0)
+    return CombatStats(won, finished, turns, player.hp - player_hp, npc.hp - npc_hp,
+                       time.perf_counter() - start)
+
+
+def balance_report(fights=100000, seed=None, npc_names=None):
+    """
+    Simule les combats du joueur contre chaque NPC de NPC_STATS et renvoie un tableau lisible des résultats.
+
+    :param fights: (int) Le nombre de combats par NPC.
+    :param seed: (int) La graine du hasard.
+    :param npc_names: (list) Les NPCs à simuler, tous ceux de NPC_STATS par défaut.
+    :return: (str) Le tableau.
+
+    >>> print(balance_report(100000))  # Ceci affichera la part de victoires, les tours et les dégâts reçus par NPC
+    """
+    player = Fighter.from_stats("player", PLAYER_STATS)
+    lines = [f"{'NPC':<10} {'victoires':>9} {'tours':>6} {'tours p95':>9} "
+             f"{'dégâts reçus':>12} {'reçus p95':>9} {'durée':>8}"]
+    for name in npc_names or NPC_STATS:
+        npc = Fighter.from_stats(name, NPC_STATS[name])
+        result = simulate(player, npc, fights, seed)
+        stats = result.summary()
+        lines.append(f"{name:<10} {stats['win_rate']:>9.1%} {stats['turns']['mean']:>6.1f} "
+                     f"{stats['turns']['p95']:>9.0f} {stats['damage_taken']['mean']:>12.1f} "
+                     f"{stats['damage_taken']['p95']:>9.0f} {result.seconds * 1000:>6.0f} ms")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,367 @@
+import numpy as np
+import pygame
+
+from animation import ANIMATION_ROWS, ANIMATION_STEP, FRAME_HEIGHT, FRAME_WIDTH, FRAMES_PER_ANIMATION, frame_cache
+from player import DEFAULT_NPC_STATS, NPC_SPEED, NPC_STATS
+
+ANIMATIONS = list(ANIMATION_ROWS)  # numéro de direction -> nom de l'animation : bas, gauche, droite, haut
+STEPS = np.array([(0, 1), (-1, 0), (1, 0), (0, -1)], dtype=np.float64)  # déplacement unitaire de chaque direction
+STANDING = -1  # direction d'un figurant qui ne bouge pas
+
+# Pieds d'un figurant, placés comme ceux d'Entity : moitié de la largeur du sprite, 8 pixels, en bas au milieu
+FEET_WIDTH = int(FRAME_WIDTH * 0.5)
+FEET_HEIGHT = 8
+FEET_X = FRAME_WIDTH // 2 - FEET_WIDTH // 2
+FEET_Y = FRAME_HEIGHT - FEET_HEIGHT
+
+ALIGNED = 3  # pixels d'écart tolérés entre deux points alignés du chemin, comme NPC.move
+VIEW_MARGIN = 32  # pixels ajoutés autour de la vue : les figurants qui y entrent pendant le tick sont déjà prêts
+
+
+def _pixels(position):
+    """
+    Arrondit des positions au pixel comme pygame.Rect quand un sprite y est placé (Entity.update) : au pixel le plus
+    proche, une moitié étant arrondie en s'éloignant de zéro.
+
+    :param position: (numpy.ndarray) Les positions en pixels (flottants).
+    :return: (numpy.ndarray) Les positions arrondies (entiers).
+
+    >>> _pixels(np.array([2.4, 2.5, 3.5, 2.6, -2.5])).tolist()
+    [2, 3, 4, 3, -3]
+    """
+    return np.trunc(position + np.copysign(0.5, position)).astype(np.int64)
+
+
+class CrowdSprite(pygame.sprite.Sprite):
+    """
+    Classe CrowdSprite qui affiche un figurant visible de la foule dans le groupe de la carte.
+
+    Les sprites sont réutilisés d'un tick à l'autre : ils ne gardent que l'image et la place à l'écran, l'état
+    du figurant reste dans les tableaux de la foule.
+
+    :return: None
+
+    >>> sprite = CrowdSprite()
+    >>> sprite.rect.size
+    (23, 32)
+    """
+
+    def __init__(self):
+        """
+        Initialise un sprite sans image, placé par Crowd.interpolate.
+
+        :return: None
+        """
+        super().__init__()
+        self.image = None
+        self.rect = pygame.Rect(0, 0, FRAME_WIDTH, FRAME_HEIGHT)
+
+
+class Crowd:
+    """
+    Classe Crowd qui simule d'un coup des milliers de figurants d'une carte, rangés dans des tableaux NumPy
+    (un élément par figurant) plutôt qu'un sprite par NPC.
+
+    Les figurants suivent leur chemin en boucle comme les NPCs (NPC.move sans Pathfinder : d'un point au suivant
+    quand ils sont alignés), s'arrêtent au contact du joueur et reculent quand leurs pieds touchent un mur. Ils ne
+    parlent pas et ne combattent pas, et ne sont pas sauvegardés. Seuls les figurants visibles reçoivent un sprite,
+    ajouté au groupe de la carte pour le dessin.
+
+    Les murs sont testés pour tous les figurants en un seul appel sur la grille des tuiles de la carte : seuls les
+    figurants dont les pieds touchent une tuile bloquée sont confirmés, d'un coup eux aussi, avec les rectangles
+    exacts des murs rangés par tuile dans la grille (CollisionGrid.rects_hit).
+
+    :param collision_grid: (CollisionGrid) La grille des murs de la carte, construite avec ses murs.
+    :param capacity: (int) Le nombre de figurants prévus, les tableaux grandissent au besoin.
+    :return: None
+
+    >>> crowd = Crowd(map.collision_grid)
+    >>> crowd.spawn("mushroom", npc.points, count=1000)  # Ceci ajoutera 1000 champignons sur le chemin du NPC
+    >>> crowd.update(1 / 60, player.rect)  # Ceci fera avancer tous les champignons d'un tick
+    """
+
+    def __init__(self, collision_grid, capacity=64):
+        """
+        Initialise une foule vide.
+
+        :param collision_grid: (CollisionGrid) La grille des murs de la carte.
+        :param capacity: (int) Le nombre de figurants prévus.
+        :return: None
+        """
+        self.collision_grid = collision_grid
+        self.count = 0  # figurants ajoutés, vaincus compris
+        self.kinds = []  # numéro de planche -> nom de la planche de sprites
+        self.images = []  # numéro de planche -> animations (images partagées par frame_cache)
+        self.waypoints = np.zeros((0, 4), dtype=np.int64)  # points (x, y, largeur, hauteur) de tous les chemins, bout à bout
+
+        self.position = np.zeros((capacity, 2))  # coin haut gauche du sprite, comme Entity.position
+        self.previous_position = np.zeros((capacity, 2))  # position au tick précédent, pour l'interpolation
+        self.speed = np.zeros(capacity)
+        self.path_start = np.zeros(capacity, dtype=np.int64)  # premier point du chemin dans waypoints
+        self.path_length = np.ones(capacity, dtype=np.int64)
+        self.current_point = np.zeros(capacity, dtype=np.int64)  # dernier point atteint, dans le chemin
+        self.hp = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.kind = np.zeros(capacity, dtype=np.int64)
+        self.direction = np.zeros(capacity, dtype=np.int64)  # animation affichée (indice dans ANIMATIONS)
+        self.frame = np.zeros(capacity, dtype=np.int64)  # image affichée dans l'animation
+        self.animation_index = np.zeros(capacity, dtype=np.int64)  # image suivante, comme AnimateSprite
+        self.clock = np.zeros(capacity)  # pixels parcourus depuis le dernier changement d'image
+
+        self.sprites = []  # sprites réutilisés pour les figurants visibles
+        self.shown = np.zeros(0, dtype=np.int64)  # figurant affiché par chacun des premiers sprites
+
+    def __len__(self):
+        """
+        Donne le nombre de figurants encore présents.
+
+        :return: (int) Le nombre de figurants vivants.
+        """
+        return int(self.alive[:self.count].sum())
+
+    def _reserve(self, count):
+        """
+        Agrandit les tableaux pour qu'ils puissent contenir count figurants.
+
+        :param count: (int) Le nombre de figurants à pouvoir contenir.
+        :return: None
+        """
+        capacity = len(self.alive)
+        if count <= capacity:
+            return
+        capacity = max(count, 2 * capacity)
+        for name in ("position", "previous_position", "speed", "path_start", "path_length", "current_point", "hp",
+                     "alive", "kind", "direction", "frame", "animation_index", "clock"):
+            array = getattr(self, name)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def spawn(self, name, points, count=1, start_point=0):
+        """
+        Ajoute des figurants qui suivent en boucle un même chemin, répartis sur ses points.
+
+        :param name: (str) Le nom de la planche de sprites (et des caractéristiques dans NPC_STATS).
+        :param points: (list) Les points du chemin (pygame.Rect), comme NPC.points.
+        :param count: (int) Le nombre de figurants.
+        :param start_point: (int) Le point où apparaît le premier figurant, le suivant apparaît au point d'après...
+        :return: (range) Les numéros des figurants ajoutés.
+        :CU: len(points) > 0 and count >= 0
+
+        >>> bandits = crowd.spawn("bandit", [pygame.Rect(0, 0, 16, 16)], count=3)  # Ceci ajoutera 3 bandits immobiles en (0, 0)
+        """
+        if name not in self.kinds:
+            self.kinds.append(name)
+            self.images.append(frame_cache.get_animations(name))
+        kind = self.kinds.index(name)
+
+        path_start = len(self.waypoints)
+        self.waypoints = np.concatenate([self.waypoints, np.array([tuple(point) for point in points], dtype=np.int64)])
+
+        first, end = self.count, self.count + count
+        self._reserve(end)
+        self.count = end
+        current_point = (start_point + np.arange(count)) % len(points)
+        self.path_start[first:end] = path_start
+        self.path_length[first:end] = len(points)
+        self.current_point[first:end] = current_point
+        self.position[first:end] = self.waypoints[path_start + current_point, :2]
+        self.previous_position[first:end] = self.position[first:end]
+        self.speed[first:end] = NPC_SPEED
+        self.hp[first:end] = NPC_STATS.get(name, DEFAULT_NPC_STATS)["hp"]
+        self.alive[first:end] = True
+        self.kind[first:end] = kind
+        self.direction[first:end] = 0
+        self.frame[first:end] = 0
+        self.animation_index[first:end] = 0
+        self.clock[first:end] = 0
+        return range(first, end)
+
+    def kill(self, index):
+        """
+        Retire un figurant de la foule ; sa place dans les tableaux n'est pas réutilisée.
+
+        :param index: (int) Le numéro du figurant.
+        :return: None
+        """
+        self.alive[index] = False
+        self.hp[index] = 0
+
+    def clear(self):
+        """
+        Retire tous les figurants (leurs sprites quittent leurs groupes).
+
+        :return: None
+        """
+        for sprite in self.sprites:
+            sprite.kill()
+        self.__init__(self.collision_grid)
+
+    def feet(self, position=None):
+        """
+        Calcule les pieds de tous les figurants, placés comme ceux d'Entity.
+
+        :param position: (numpy.ndarray) Les positions à utiliser, celles des figurants par défaut.
+        :return: (numpy.ndarray) Un tableau (n, 4) de rectangles (x, y, largeur, hauteur) en pixels.
+        """
+        if position is None:
+            position = self.position[:self.count]
+        corner = _pixels(position)  # comme les pieds d'Entity, placés par pygame.Rect
+        feet = np.empty((len(position), 4), dtype=np.int64)
+        feet[:, 0] = corner[:, 0] + FEET_X
+        feet[:, 1] = corner[:, 1] + FEET_Y
+        feet[:, 2] = FEET_WIDTH
+        feet[:, 3] = FEET_HEIGHT
+        return feet
+
+    def update(self, dt, player_rect):
+        """
+        Fait avancer tous les figurants d'un tick : arrêt au contact du joueur, pas vers le point suivant du chemin,
+        animation, recul devant les murs et passage au point suivant.
+
+        :param dt: (float) La durée du tick en secondes.
+        :param player_rect: (pygame.Rect) Le rectangle du joueur.
+        :return: None
+
+        >>> crowd.update(1 / 60, player.rect)  # Ceci fera avancer tous les figurants d'un tick
+        """
+        count = self.count
+        if not count:
+            return
+        alive = self.alive[:count]
+        position = self.position[:count]
+        old_position = position.copy()
+
+        # Arrêt au contact du joueur, comme MapManager.check_collisions pour les NPCs
+        feet = self.feet()
+        px, py, pw, ph = player_rect
+        contact = ((feet[:, 0] < px + pw) & (px < feet[:, 0] + feet[:, 2])
+                   & (feet[:, 1] < py + ph) & (py < feet[:, 1] + feet[:, 3]))
+        speed = self.speed[:count]
+        speed[:] = np.where(contact, 0, NPC_SPEED)
+
+        # Direction vers le point suivant : seulement quand les deux points sont à peu près alignés
+        path_start, path_length = self.path_start[:count], self.path_length[:count]
+        current_point = self.current_point[:count]
+        target_point = (current_point + 1) % path_length
+        current_rect = self.waypoints[path_start + current_point]
+        target_rect = self.waypoints[path_start + target_point]
+        dx, dy = target_rect[:, 0] - current_rect[:, 0], target_rect[:, 1] - current_rect[:, 1]
+        vertical, horizontal = np.abs(dx) < ALIGNED, np.abs(dy) < ALIGNED
+        direction = np.select([vertical & (dy > 0), vertical & (dy < 0), horizontal & (dx < 0), horizontal & (dx > 0)],
+                              [0, 3, 1, 2], STANDING)
+        moving = alive & (direction != STANDING)
+        if moving.any():
+            movers = np.flatnonzero(moving)
+            direction = direction[movers]
+            position[movers] += STEPS[direction] * (speed[movers] * dt)[:, None]
+            self._animate(movers, direction, speed[movers] * dt)
+            self._move_back(movers, old_position)
+
+        # Point suivant atteint quand le sprite touche son rectangle, à sa place du début du tick comme NPC.move
+        corner = _pixels(old_position)
+        reached = (alive & (corner[:, 0] < target_rect[:, 0] + target_rect[:, 2])
+                   & (target_rect[:, 0] < corner[:, 0] + FRAME_WIDTH)
+                   & (corner[:, 1] < target_rect[:, 1] + target_rect[:, 3])
+                   & (target_rect[:, 1] < corner[:, 1] + FRAME_HEIGHT))
+        current_point[reached] = target_point[reached]
+
+    def _animate(self, movers, direction, distance):
+        """
+        Fait avancer l'animation des figurants qui bougent, comme AnimateSprite.change_animation.
+
+        :param movers: (numpy.ndarray) Les numéros des figurants qui bougent.
+        :param direction: (numpy.ndarray) La direction de chacun.
+        :param distance: (numpy.ndarray) La distance parcourue par chacun pendant le tick.
+        :return: None
+        """
+        self.direction[movers] = direction
+        animation_index = self.animation_index[movers]
+        self.frame[movers] = animation_index  # l'image affichée est choisie avant d'avancer l'horloge
+        clock = self.clock[movers] + distance
+        turned = clock >= ANIMATION_STEP
+        self.animation_index[movers] = np.where(turned, (animation_index + 1) % FRAMES_PER_ANIMATION, animation_index)
+        self.clock[movers] = np.where(turned, clock - ANIMATION_STEP, clock)
+
+    def _move_back(self, movers, old_position):
+        """
+        Remet à leur position du début du tick les figurants dont les pieds touchent un mur.
+
+        :param movers: (numpy.ndarray) Les numéros des figurants qui ont bougé.
+        :param old_position: (numpy.ndarray) Les positions au début du tick.
+        :return: None
+        """
+        # La grille des tuiles écarte d'un coup les figurants loin des murs, les rectangles exacts confirment les autres
+        grid = self.collision_grid
+        feet = self.feet(self.position[movers])
+        candidates = np.flatnonzero(grid.rects_blocked(feet))
+        hits = movers[candidates[grid.rects_hit(feet[candidates])]]
+        self.position[hits] = old_position[hits]
+
+    def save_previous_positions(self):
+        """
+        Enregistre la position de chaque figurant au début d'un tick.
+
+        :return: None
+        """
+        self.previous_position[:self.count] = self.position[:self.count]
+
+    def visible(self, view):
+        """
+        Cherche les figurants dont le sprite touche une zone de la carte (la vue de la caméra...).
+
+        :param view: (pygame.Rect) La zone de la carte en pixels.
+        :return: (numpy.ndarray) Les numéros des figurants visibles.
+        """
+        corner = self.position[:self.count]
+        x, y, width, height = view
+        return np.flatnonzero(self.alive[:self.count]
+                              & (corner[:, 0] < x + width) & (x < corner[:, 0] + FRAME_WIDTH)
+                              & (corner[:, 1] < y + height) & (y < corner[:, 1] + FRAME_HEIGHT))
+
+    def sync(self, group, view):
+        """
+        Donne un sprite aux figurants visibles et les ajoute au groupe de la carte ; les sprites des autres
+        quittent le groupe.
+
+        :param group: (pyscroll.PyscrollGroup) Le groupe de la carte.
+        :param view: (pygame.Rect) La partie de la carte vue par la caméra.
+        :return: None
+
+        >>> crowd.sync(map.group, map.group.world_view)  # Ceci affichera les figurants visibles
+        """
+        shown = self.visible(pygame.Rect(view).inflate(2 * VIEW_MARGIN, 2 * VIEW_MARGIN))
+        while len(self.sprites) < len(shown):
+            self.sprites.append(CrowdSprite())
+        for sprite in self.sprites[len(shown):len(self.shown)]:
+            sprite.kill()
+        for sprite in self.sprites[len(self.shown):len(shown)]:
+            group.add(sprite)
+        self.shown = shown
+        self.interpolate(1.0)
+
+    def interpolate(self, alpha):
+        """
+        Place les sprites des figurants visibles entre les deux derniers ticks et choisit leur image.
+
+        :param alpha: (float) La part du tick suivant déjà écoulée ; 1 place les sprites à la position actuelle.
+        :return: None
+        """
+        shown = self.shown
+        if not len(shown):
+            return
+        position = self.position[shown]
+        if alpha < 1:
+            previous = self.previous_position[shown]
+            position = previous + (position - previous) * alpha
+        corners = _pixels(position).tolist()
+        images, kinds = self.images, self.kind[shown].tolist()
+        directions, frames = self.direction[shown].tolist(), self.frame[shown].tolist()
+        for sprite, corner, kind, direction, frame in zip(self.sprites, corners, kinds, directions, frames):
+            sprite.image = images[kind][ANIMATIONS[direction]][frame]
+            sprite.rect.topleft = corner
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
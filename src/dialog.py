@@ -1,14 +1,151 @@
 import pygame
 import os
 
+from startup import startup_report
+
 # Définir le répertoire de base du projet
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
+class GlyphAtlas:
+    """
+    Classe GlyphAtlas qui garde l'image de chaque caractère d'une police, dessinée une seule fois.
+
+    Un texte est écrit en collant les images de ses caractères les unes après les autres, au lieu de
+    redessiner tout le texte avec la police à chaque nouvelle lettre.
+
+    :param font: (pygame.font.Font) La police.
+    :return: None
+
+    >>> atlas = GlyphAtlas(pygame.font.Font(None, 18))
+    >>> atlas.wrap("un deux trois", atlas.width("un deux"))
+    ['un deux ', 'trois']
+    """
+
+    def __init__(self, font):
+        """
+        Initialise un atlas vide.
+
+        :param font: (pygame.font.Font) La police.
+        :return: None
+        """
+        self.font = font
+        self.line_height = font.get_linesize()
+        self.glyphs = dict()  # (caractère, couleur) -> image du caractère
+        self.advances = dict()  # caractère -> largeur en pixels
+
+    def get_glyph(self, char, color):
+        """
+        Récupère l'image d'un caractère, dessinée au premier appel.
+
+        :param char: (str) Le caractère.
+        :param color: (tuple) La couleur (r, g, b) du texte.
+        :return: (pygame.Surface) L'image du caractère.
+        """
+        key = (char, color)
+        glyph = self.glyphs.get(key)
+        if glyph is None:
+            glyph = self.font.render(char, False, color)
+            self.glyphs[key] = glyph
+        return glyph
+
+    def advance(self, char):
+        """
+        Donne la largeur d'un caractère, c'est-à-dire le décalage jusqu'au caractère suivant.
+
+        :param char: (str) Le caractère.
+        :return: (int) La largeur en pixels.
+        """
+        width = self.advances.get(char)
+        if width is None:
+            width = self.font.size(char)[0]
+            self.advances[char] = width
+        return width
+
+    def width(self, text):
+        """
+        Donne la largeur d'un texte écrit caractère par caractère.
+
+        :param text: (str) Le texte.
+        :return: (int) La largeur en pixels.
+        """
+        return sum(self.advance(char) for char in text)
+
+    def wrap(self, text, width):
+        """
+        Coupe un texte en lignes qui tiennent dans une largeur, entre les mots quand c'est possible.
+
+        Les espaces sont gardés en fin de ligne, pour que chaque caractère du texte soit dans exactement une ligne.
+
+        :param text: (str) Le texte.
+        :param width: (int) La largeur maximale d'une ligne en pixels.
+        :return: (list) Les lignes.
+        """
+        lines = []
+        line = ""
+        for word in text.split(" "):
+            candidate = word if not line else line + " " + word
+            if line and self.width(candidate) > width:
+                lines.append(line + " ")
+                line = word
+            else:
+                line = candidate
+            while self.width(line) > width and len(line) > 1:  # mot plus long qu'une ligne
+                cut = len(line) - 1
+                while cut > 1 and self.width(line[:cut]) > width:
+                    cut -= 1
+                lines.append(line[:cut])
+                line = line[cut:]
+        lines.append(line)
+        return lines
+
+
+class GlyphCache:
+    """
+    Classe GlyphCache qui partage un atlas par police et par taille entre toutes les boîtes de dialogue du jeu.
+
+    :return: None
+
+    >>> atlas = glyph_cache.get(font_path, 18)  # Ceci renverra l'atlas de la police de dialogue
+    """
+
+    def __init__(self):
+        """
+        Initialise un cache vide.
+
+        :return: None
+        """
+        self.atlases = dict()  # (chemin de la police, taille) -> GlyphAtlas
+
+    def get(self, font_path, size):
+        """
+        Récupère l'atlas d'une police, en chargeant la police au premier appel.
+
+        :param font_path: (str) Le chemin du fichier de la police.
+        :param size: (int) La taille de la police.
+        :return: (GlyphAtlas) L'atlas partagé.
+        """
+        key = (font_path, size)
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            atlas = GlyphAtlas(pygame.font.Font(font_path, size))
+            self.atlases[key] = atlas
+        return atlas
+
+
+# Cache partagé par toutes les boîtes de dialogue
+glyph_cache = GlyphCache()
+
+
 class DialogBox:
     """
     Classe DialogBox qui gère l'arrière-plan de la boîte de dialogue.
 
+    Le texte s'écrit à la vitesse de characters_per_second. Chaque nouvelle lettre est collée sur une image
+    de la boîte gardée entre deux images du jeu : le texte déjà écrit n'est jamais redessiné. Les textes
+    trop longs sont coupés en lignes ; quand la boîte est pleine, le texte remonte d'une ligne.
+
+    :param characters_per_second: (float) La vitesse d'écriture du texte.
     :return: None
 
     >>> dialog_box = DialogBox()
@@ -16,25 +153,48 @@ class DialogBox:
 
     X_POSITION = 60
     Y_POSITION = 470
+    TEXT_X = 60  # position du texte dans la boîte
+    TEXT_Y = 30
+    TEXT_MARGIN = 40  # marge à droite du texte
+    TEXT_COLOR = (0, 0, 0)
+    CHARACTERS_PER_SECOND = 25
 
-    def __init__(self):
+    def __init__(self, characters_per_second=CHARACTERS_PER_SECOND):
         """
         Initialise la boîte de dialogue.
 
+        :param characters_per_second: (float) La vitesse d'écriture du texte.
         :return: None
+        :CU: characters_per_second > 0
 
         >>> dialog_box = DialogBox()  # Ceci initialisera la boîte de dialogue
         """
-        dialog_box_path = os.path.join(BASE_DIR, 'dialogs', 'dialog_box.png')
-        self.box = pygame.image.load(dialog_box_path)
-        self.box = pygame.transform.scale(self.box, (700, 100))
+        with startup_report.phase("dialog_box"):
+            dialog_box_path = os.path.join(BASE_DIR, 'dialogs', 'dialog_box.png')
+            self.box = pygame.image.load(dialog_box_path)
+            self.box = pygame.transform.scale(self.box, (700, 100))
+            if pygame.display.get_surface() is not None:
+                self.box = self.box.convert_alpha()
+        self.rect = self.box.get_rect(topleft=(self.X_POSITION, self.Y_POSITION))  # zone de l'écran couverte par la boîte
         self.texts = []
         self.text_index = 0
         self.letter_index = 0
-        font_path = os.path.join(BASE_DIR, 'dialogs', 'dialog_font.ttf')
-        self.font = pygame.font.Font(font_path, 18)
+        self.characters_per_second = characters_per_second
+        self.letter_progress = 0.0  # fraction de la lettre suivante déjà écoulée
+        with startup_report.phase("font(dialog)"):
+            font_path = os.path.join(BASE_DIR, 'dialogs', 'dialog_font.ttf')
+            self.glyphs = glyph_cache.get(font_path, 18)  # police partagée, chaque caractère dessiné une seule fois
+            self.font = self.glyphs.font
         self.reading = False
 
+        # Image de la boîte avec le texte déjà écrit
+        self.page = None
+        self.page_text = None  # texte en cours d'écriture sur la page
+        self.layout = []  # (caractère, x, ligne) de chaque caractère du texte
+        self.drawn = 0  # nombre de caractères déjà collés sur la page
+        self.first_line = 0  # première ligne visible
+        self.max_lines = max(1, (self.box.get_height() - self.TEXT_Y) // self.glyphs.line_height)
+
     def execute(self, dialogs=[], npcs=[]):
         """
         Exécute une série de dialogues.
@@ -51,21 +211,52 @@ class DialogBox:
         else:
             self.reading = True
             self.text_index = 0
+            self.letter_index = 0
+            self.letter_progress = 0.0
             self.dialogs = dialogs
             self.npcs = npcs
             self.current_dialog = 0
             self.texts = self.dialogs[self.current_dialog]
             self.npc = self.npcs[self.current_dialog]
 
-    def render(self, screen):
+    def render(self, screen, dt):
         """
-        Dessine la boîte de dialogue sur l'écran.
+        Fait avancer le texte et dessine la boîte de dialogue sur l'écran.
 
         :param screen: (pygame.Surface) L'écran sur lequel dessiner la boîte de dialogue.
+        :param dt: (float) Le temps écoulé en secondes.
         :return: None
         :CU: isinstance(screen, pygame.Surface)
 
-        >>> dialog_box.render(screen)  # Ceci dessinera la boîte de dialogue sur l'écran
+        >>> dialog_box.render(screen, 1 / 60)  # Ceci dessinera la boîte de dialogue sur l'écran
+        """
+        self.update(dt)
+        self.draw(screen)
+
+    def update(self, dt):
+        """
+        Fait avancer le texte de characters_per_second lettres par seconde.
+
+        :param dt: (float) Le temps écoulé en secondes.
+        :return: None
+
+        >>> dialog_box.update(1 / 60)  # Ceci écrira les lettres d'un soixantième de seconde
+        """
+        if not self.reading:
+            return
+
+        self.letter_progress += self.characters_per_second * dt
+        while self.letter_progress >= 1 and self.reading:
+            self.letter_progress -= 1
+            self.next_letter()
+
+    def next_letter(self):
+        """
+        Écrit une lettre de plus, puis passe au texte et au dialogue suivants quand le texte est entièrement écrit.
+
+        :return: None
+
+        >>> dialog_box.next_letter()  # Ceci écrira une lettre de plus
         """
         # Vérification : si pas de dialogues en cours, ne rien faire
         if not self.reading or not self.texts:
@@ -94,11 +285,79 @@ class DialogBox:
                     self.texts = self.dialogs[self.current_dialog]
                     self.npc = self.npcs[self.current_dialog]
 
-        # Dessiner la boîte et le texte
-        screen.blit(self.box, (self.X_POSITION, self.Y_POSITION))
+    def draw(self, screen):
+        """
+        Dessine la boîte de dialogue et le texte déjà écrit, sans le faire avancer.
+
+        :param screen: (pygame.Surface) L'écran sur lequel dessiner la boîte de dialogue.
+        :return: None
+        :CU: isinstance(screen, pygame.Surface)
+
+        >>> dialog_box.draw(screen)  # Ceci dessinera la boîte de dialogue sur l'écran
+        """
+        if not self.reading or not self.texts:
+            return
+
         current_text = self.texts[self.text_index]
-        text = self.font.render(current_text[0:self.letter_index], False, (0, 0, 0))
-        screen.blit(text, (self.X_POSITION + 60, self.Y_POSITION + 30))
+        if current_text is not self.page_text or self.letter_index < self.drawn:
+            self.start_page(current_text)
+
+        # Coller seulement les lettres apparues depuis l'image précédente
+        for index in range(self.drawn, min(self.letter_index, len(self.layout))):
+            self.draw_letter(index)
+        self.drawn = max(self.drawn, self.letter_index)
+
+        # Dessiner la boîte et le texte
+        screen.blit(self.page, (self.X_POSITION, self.Y_POSITION))
+
+    def start_page(self, text):
+        """
+        Prépare l'écriture d'un nouveau texte : coupe le texte en lignes et remet la boîte vide.
+
+        :param text: (str) Le texte à écrire.
+        :return: None
+        """
+        width = self.box.get_width() - self.TEXT_X - self.TEXT_MARGIN
+        self.layout = []
+        for number, line in enumerate(self.glyphs.wrap(text, width)):
+            x = 0
+            for char in line:
+                self.layout.append((char, x, number))
+                x += self.glyphs.advance(char)
+
+        self.page_text = text
+        self.page = self.box.copy()
+        self.drawn = 0
+        self.first_line = 0
+
+    def draw_letter(self, index):
+        """
+        Colle une lettre du texte sur la page ; si sa ligne est sous la boîte, fait remonter le texte.
+
+        :param index: (int) La position de la lettre dans le texte.
+        :return: None
+        """
+        char, x, line = self.layout[index]
+        if line >= self.first_line + self.max_lines:
+            # La boîte est pleine : remonter le texte et recoller les lettres des lignes encore visibles
+            self.first_line = line - self.max_lines + 1
+            self.page = self.box.copy()
+            for previous in range(index):
+                if self.layout[previous][2] >= self.first_line:
+                    self.blit_letter(previous)
+        self.blit_letter(index)
+
+    def blit_letter(self, index):
+        """
+        Colle l'image d'une lettre à sa place sur la page.
+
+        :param index: (int) La position de la lettre dans le texte.
+        :return: None
+        """
+        char, x, line = self.layout[index]
+        if char != " ":
+            y = self.TEXT_Y + (line - self.first_line) * self.glyphs.line_height
+            self.page.blit(self.glyphs.get_glyph(char, self.TEXT_COLOR), (self.TEXT_X + x, y))
 
     def next_text(self):
         """
@@ -110,11 +369,24 @@ class DialogBox:
         """
         self.text_index += 1
         self.letter_index = 0
+        self.letter_progress = 0.0
 
         if self.text_index >= len(self.texts):
             # Pour fermer le dialogue
             self.reading = False
 
+    def close(self):
+        """
+        Ferme la boîte de dialogue tout de suite, même si des textes restent à lire.
+
+        :return: None
+
+        >>> dialog_box.close()  # Ceci fermera la boîte de dialogue
+        """
+        self.reading = False
+        self.letter_index = 0
+        self.letter_progress = 0.0
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
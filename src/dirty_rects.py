@@ -0,0 +1,83 @@
+import pygame
+
+
+class DirtyRectTracker:
+    """
+    Classe DirtyRectTracker qui trouve les zones de l'écran qui ont changé depuis l'image précédente,
+    pour n'envoyer que celles-ci à l'écran avec pygame.display.update(rects).
+
+    Une zone change quand un sprite bouge ou change d'image (ancienne et nouvelle place), quand une zone
+    toujours redessinée est demandée (boîte de dialogue, panneau des mesures), ou quand la caméra bouge :
+    dans ce cas tout l'écran est à redessiner.
+
+    :param screen_rect: (pygame.Rect) Le rectangle de l'écran.
+    :return: None
+
+    >>> tracker = DirtyRectTracker(pygame.Rect(0, 0, 800, 600))
+    >>> tracker.collect(map.group)  # Ceci renverra [écran entier] à la première image
+    """
+
+    def __init__(self, screen_rect):
+        """
+        Initialise le suivi : la première image est entièrement redessinée.
+
+        :param screen_rect: (pygame.Rect) Le rectangle de l'écran.
+        :return: None
+        """
+        self.screen_rect = pygame.Rect(screen_rect)
+        self.camera = None  # position de la caméra à l'image précédente
+        self.sprites = dict()  # sprite -> (image, rectangle à l'écran) à l'image précédente
+        self.full = True
+
+    def invalidate(self):
+        """
+        Demande de redessiner tout l'écran à la prochaine image (quelque chose a dessiné par-dessus le jeu).
+
+        :return: None
+
+        >>> tracker.invalidate()  # Ceci redessinera tout l'écran à la prochaine image
+        """
+        self.full = True
+
+    def collect(self, group, always=()):
+        """
+        Compare le groupe avec l'image précédente et renvoie les zones de l'écran à redessiner.
+
+        :param group: (pyscroll.PyscrollGroup) Le groupe de la carte actuelle (voir rendering.py).
+        :param always: (list) Des zones à redessiner quoi qu'il arrive (boîte de dialogue affichée...).
+        :return: (list) Les rectangles à redessiner et à envoyer à l'écran, vide si rien n'a changé.
+        """
+        map_layer = group._map_layer
+        camera = (id(map_layer), tuple(map_layer.view_rect), map_layer.zoom)
+
+        # Sprites : une entrée par sprite dessiné, pour repérer ceux qui bougent, changent d'image ou disparaissent
+        sprites = dict()
+        for sprite in group.sprites():
+            # un pixel de marge pour les arrondis du zoom
+            sprites[sprite] = (sprite.image, group.translate_rect(sprite.rect).inflate(2, 2))
+
+        previous = self.sprites
+        self.sprites = sprites
+
+        if self.full or camera != self.camera:
+            self.full = False
+            self.camera = camera
+            return [self.screen_rect.copy()]
+
+        dirty = [pygame.Rect(rect) for rect in always]
+        for sprite, (image, rect) in sprites.items():
+            old = previous.pop(sprite, None)
+            if old is None:
+                dirty.append(rect)
+            elif old[0] is not image or old[1] != rect:
+                dirty.append(old[1])
+                dirty.append(rect)
+        for image, rect in previous.values():  # sprites retirés du groupe
+            dirty.append(rect)
+
+        return [rect.clip(self.screen_rect) for rect in dirty if rect.colliderect(self.screen_rect)]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
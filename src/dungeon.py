@@ -0,0 +1,337 @@
+from dataclasses import dataclass
+import copy
+import os
+
+import numpy as np
+from pytmx.util_pygame import pygame_image_loader
+
+from map import Portal
+from map_compiler import CompiledLayer, CompiledMap, MapObject
+from player import NPC
+
+# Définir le répertoire de base du projet
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tileset des donjons dessinés à la main : 10 x 10 tuiles de 16 pixels, noir transparent
+TILESET_PATH = os.path.join(BASE_DIR, 'map', 'Dungeon_Tileset.png')
+TILESET_COLORKEY = "000000"
+TILESET_COLUMNS = 10
+TILESET_COUNT = 100
+TILE_SIZE = 16
+
+FLOOR_GIDS = (13, 14, 15, 23, 24, 25)
+WALL_GID = 8
+DECORATION_GIDS = (81, 82, 87, 88, 90, 95)  # coffres, pièce, potions
+DECORATION_RATE = 0.01  # part des tuiles du sol qui portent un objet
+
+DUNGEON_SIZE = 1000
+ROOM_MIN = 7   # une salle laisse toujours passer un sprite entre ses points et ses murs
+ROOM_MAX = 16
+ROOM_AREA = ((ROOM_MIN + ROOM_MAX) / 2) ** 2
+CORRIDOR_WIDTH = 3
+BAND_HEIGHT = 32  # les salles sont reliées dans l'ordre d'un serpentin de bandes de cette hauteur
+
+NPC_SPRITES = ("mushroom", "bandit", "wizard", "knight")
+NPC_DIALOG = ["Encore un couloir... ce donjon n'a pas de fin   "]
+
+_tileset = []  # images des tuiles du tileset, indexées par gid, chargées une seule fois
+
+
+class GeneratedMap(CompiledMap):
+    """
+    Classe GeneratedMap qui représente une carte construite en mémoire par generate_dungeon.
+
+    Elle a les attributs d'une carte compilée (calques de tuiles, objets, images...) sans fichier derrière : le
+    gestionnaire de cartes, le rendu et le découpage en blocs la lisent comme une CompiledMap.
+
+    :param width: (int) La largeur de la carte, en tuiles.
+    :param height: (int) La hauteur de la carte, en tuiles.
+    :param layers: (list) Les calques de la carte (CompiledLayer).
+    :param objects: (list) Les objets de la carte (MapObject) : murs, points nommés.
+    :param tile_images: (tuple) Les images des tuiles, indexées par gid.
+    :return: None
+
+    >>> tmx_data = generate_dungeon("donjon", seed=1, width=100, height=100).tmx_data
+    >>> tmx_data.get_object_by_name("player")  # Ceci donnera le point de départ du joueur
+    """
+
+    def __init__(self, width, height, layers, objects, tile_images, tilewidth=TILE_SIZE, tileheight=TILE_SIZE):
+        """
+        Range les calques et les objets de la carte.
+
+        :param width: (int) La largeur de la carte, en tuiles.
+        :param height: (int) La hauteur de la carte, en tuiles.
+        :param layers: (list) Les calques de la carte (CompiledLayer).
+        :param objects: (list) Les objets de la carte (MapObject).
+        :param tile_images: (tuple) Les images des tuiles, indexées par gid.
+        :param tilewidth: (int) La largeur d'une tuile en pixels.
+        :param tileheight: (int) La hauteur d'une tuile en pixels.
+        :return: None
+        """
+        self.filename = None
+        self.width, self.height = width, height
+        self.tilewidth, self.tileheight = tilewidth, tileheight
+        self.layers = layers
+        self.visible_tile_layers = [index for index, layer in enumerate(layers)
+                                    if layer.visible and layer.data is not None]
+        self.objects = objects
+        self.objects_by_name = {object.name: object for object in objects if object.name}
+        self.tile_images = tile_images
+        self.images = list(tile_images)
+
+    def fresh(self):
+        """
+        Donne la carte à charger : mêmes tuiles et mêmes objets, mais sa propre liste d'images, que le rendu
+        agrandit sur place à chaque chargement (voir rendering.prescale_images).
+
+        :return: (GeneratedMap) La carte, prête à être chargée.
+        """
+        result = copy.copy(self)
+        result.images = list(self.tile_images)
+        return result
+
+
+@dataclass
+class Dungeon:
+    """
+    Classe Dungeon qui regroupe ce que generate_dungeon construit : la carte, ses portails et ses NPCs, tels que
+    MapManager.register_map les attend.
+
+    :param name: (str) Le nom de la carte.
+    :param tmx_data: (GeneratedMap) La carte.
+    :param portals: (list) Les portails qui partent de la carte.
+    :param npcs: (list) Les NPCs de la carte, leurs chemins dans les objets de la carte.
+    :return: None
+
+    >>> dungeon = generate_dungeon("donjon", seed=1)
+    >>> dungeon.register(map_manager, enter=True)  # Ceci placera le joueur dans le donjon généré
+    """
+    name: str
+    tmx_data: GeneratedMap
+    portals: list[Portal]
+    npcs: list[NPC]
+
+    def register(self, map_manager, enter=False):
+        """
+        Enregistre le donjon dans un gestionnaire de cartes, comme les cartes tmx du jeu.
+
+        :param map_manager: (MapManager) Le gestionnaire de cartes.
+        :param enter: (bool) True pour y téléporter aussitôt le joueur, sur son point "player".
+        :return: None
+        """
+        map_manager.register_map(self.name, portals=self.portals, npcs=self.npcs, tmx_data=self.tmx_data)
+        if enter:
+            map_manager.current_map = self.name
+            map_manager.teleport_player("player")
+            map_manager.prefetch_neighbours()
+
+
+def load_tileset():
+    """
+    Charge les images des tuiles du tileset des donjons, une seule fois.
+
+    :return: (tuple) Les images, indexées par gid (None pour le gid 0).
+    :CU: pygame.display.get_surface() is not None
+    """
+    if not _tileset:
+        load = pygame_image_loader(TILESET_PATH, TILESET_COLORKEY)
+        _tileset.append(None)
+        for index in range(TILESET_COUNT):
+            x, y = index % TILESET_COLUMNS, index // TILESET_COLUMNS
+            _tileset.append(load((x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)))
+    return tuple(_tileset)
+
+
+def _neighbour_count(mask):
+    """
+    Compte, pour chaque case, ses 8 voisines à True.
+
+    :param mask: (numpy.ndarray) Le tableau de booléens (ligne, colonne).
+    :return: (numpy.ndarray) Le nombre de voisines à True de chaque case (uint8).
+
+    >>> mask = np.zeros((3, 3), dtype=bool)
+    >>> mask[1, 1] = True
+    >>> _neighbour_count(mask).tolist()
+    [[1, 1, 1], [1, 0, 1], [1, 1, 1]]
+    """
+    height, width = mask.shape
+    padded = np.pad(mask, 1).view(np.uint8)
+    count = np.zeros((height, width), dtype=np.uint8)
+    for dy in range(3):
+        for dx in range(3):
+            if dy != 1 or dx != 1:
+                count += padded[dy:dy + height, dx:dx + width]
+    return count
+
+
+def _wall_objects(walls, tilewidth, tileheight):
+    """
+    Découpe les tuiles de mur en murs de collision : un rectangle par suite de murs sur une même ligne, prolongé vers
+    le bas tant que les lignes suivantes ont la même suite (les murs des couloirs verticaux).
+
+    :param walls: (numpy.ndarray) Les tuiles de mur (ligne, colonne).
+    :param tilewidth: (int) La largeur d'une tuile en pixels.
+    :param tileheight: (int) La hauteur d'une tuile en pixels.
+    :return: (list) Les murs (MapObject de type "collision").
+
+    >>> walls = np.array([[True, True, False, True], [True, True, False, False]])
+    >>> [(object.x, object.width, object.height) for object in _wall_objects(walls, 16, 16)]
+    [(0.0, 32.0, 32.0), (48.0, 16.0, 16.0)]
+    """
+    height, width = walls.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = walls
+    changes = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(changes == 1)
+    ends = np.nonzero(changes == -1)[1]  # même ordre : ligne par ligne, de gauche à droite
+
+    # Les suites identiques de lignes consécutives se suivent une fois triées par colonnes puis par ligne
+    order = np.lexsort((rows, ends, starts))
+    rows, starts, ends = rows[order], starts[order], ends[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1]) | (rows[1:] != rows[:-1] + 1)
+    first = np.flatnonzero(first)
+    heights = np.diff(np.append(first, len(rows)))
+    return [MapObject(None, "collision", float(x * tilewidth), float(y * tileheight),
+                      float((end - x) * tilewidth), float(rect_height * tileheight))
+            for y, x, end, rect_height in zip(rows[first].tolist(), starts[first].tolist(), ends[first].tolist(),
+                                               heights.tolist())]
+
+
+def generate_dungeon(name, seed, width=DUNGEON_SIZE, height=DUNGEON_SIZE, room_density=0.5, walls=1000,
+                     npcs=100, nb_points=4, portals=4, target=None):
+    """
+    Construit un donjon au hasard, toujours le même pour une même graine : des salles reliées par des couloirs,
+    des piliers, des NPCs qui font chacun une ronde dans une salle et des portails.
+
+    Les salles sont reliées dans l'ordre d'un serpentin, de proche en proche : tout le sol est d'un seul tenant.
+    Les murs de collision bordent le sol ; un pilier est un mur d'une tuile entouré de sol, il ne ferme donc aucun
+    passage. Les salles du départ, des portails et des chemins n'ont pas de pilier : les NPCs y vont en ligne droite
+    d'un point à l'autre.
+
+    Le portail numéro n (objet "portal<n>") mène au point "portal<n+1>_exit" de la carte cible, le premier pour le
+    dernier : par défaut le donjon lui-même, ou un autre donjon généré avec autant de portails.
+
+    :param name: (str) Le nom de la carte.
+    :param seed: (int) La graine du hasard.
+    :param width: (int) La largeur de la carte, en tuiles.
+    :param height: (int) La hauteur de la carte, en tuiles.
+    :param room_density: (float) La part de la carte couverte par les salles, avant leurs chevauchements.
+    :param walls: (int) Le nombre de piliers ajoutés dans les salles, en plus des murs du bord (au plus).
+    :param npcs: (int) Le nombre de NPCs.
+    :param nb_points: (int) Le nombre de points du chemin de chaque NPC.
+    :param portals: (int) Le nombre de portails.
+    :param target: (str) La carte où mènent les portails, le donjon lui-même par défaut.
+    :return: (Dungeon) Le donjon, à enregistrer dans le gestionnaire de cartes (voir Dungeon.register).
+    :CU: width >= ROOM_MAX + 2 and height >= ROOM_MAX + 2 and nb_points >= 1
+
+    >>> dungeon = generate_dungeon("donjon", seed=1)  # Ceci construira un donjon de 1000 x 1000 tuiles
+    >>> len(generate_dungeon("donjon", seed=1, width=100, height=100, npcs=3).npcs)
+    3
+    """
+    if width < ROOM_MAX + 2 or height < ROOM_MAX + 2:
+        raise ValueError(f"donjon trop petit : {width} x {height} tuiles")
+    rng = np.random.default_rng(seed)
+    tilewidth = tileheight = TILE_SIZE
+
+    # Salles : des rectangles tirés au hasard, qui peuvent se chevaucher, jamais sur le bord de la carte
+    count = max(2, round(room_density * width * height / ROOM_AREA))
+    sizes = rng.integers(ROOM_MIN, ROOM_MAX + 1, size=(count, 2))
+    lefts = rng.integers(1, width - sizes[:, 0])
+    tops = rng.integers(1, height - sizes[:, 1])
+    centers = np.column_stack((lefts + sizes[:, 0] // 2, tops + sizes[:, 1] // 2))
+
+    # Chaque salle est reliée à la suivante d'un serpentin : de gauche à droite dans une bande, puis de droite à gauche
+    band = centers[:, 1] // BAND_HEIGHT
+    order = np.lexsort((np.where(band % 2, -centers[:, 0], centers[:, 0]), band))
+    room_table = np.column_stack((lefts, tops, sizes))[order]
+    rooms = room_table.tolist()
+    centers = centers[order].tolist()
+
+    floor = np.zeros((height, width), dtype=bool)
+    for left, top, room_width, room_height in rooms:
+        floor[top:top + room_height, left:left + room_width] = True
+    corridors = np.zeros_like(floor)
+    for (x1, y1), (x2, y2) in zip(centers, centers[1:]):
+        corridors[y1:y1 + CORRIDOR_WIDTH, min(x1, x2):max(x1, x2) + CORRIDOR_WIDTH] = True
+        corridors[min(y1, y2):max(y1, y2) + CORRIDOR_WIDTH, x2:x2 + CORRIDOR_WIDTH] = True
+    floor |= corridors
+
+    # Salles réservées : le départ du joueur (la première), les portails et les chemins des NPCs
+    portal_rooms = rng.choice(len(rooms), size=portals, replace=portals > len(rooms)).tolist()
+    npc_rooms = rng.integers(0, len(rooms), size=npcs)
+    reserved = np.zeros_like(floor)
+    for index in {0, *portal_rooms, *npc_rooms.tolist()}:
+        left, top, room_width, room_height = rooms[index]
+        reserved[top:top + room_height, left:left + room_width] = True
+
+    # Piliers : une tuile sur trois dans chaque sens, à deux tuiles au moins des murs de leur salle ; on en tire plus
+    # que demandé, puis on écarte ceux qui touchent un couloir, une salle réservée, un mur ou un autre pilier
+    if walls:
+        left, top, room_width, room_height = room_table[rng.integers(0, len(rooms), size=4 * walls + 64)].T
+        xs = left + 2 + 3 * rng.integers(0, (room_width - 2) // 3)
+        ys = top + 2 + 3 * rng.integers(0, (room_height - 2) // 3)
+        pillars = np.zeros_like(floor)
+        pillars[ys, xs] = True
+        pillars &= floor & ~reserved & ~corridors & (_neighbour_count(corridors) == 0)
+        pillars &= _neighbour_count(~floor | pillars) == 0
+        ys, xs = np.nonzero(pillars)
+        if len(xs) > walls:
+            keep = rng.choice(len(xs), size=walls, replace=False)
+            ys, xs = ys[keep], xs[keep]
+        floor[ys, xs] = False
+
+    # Murs : les tuiles hors du sol qui en touchent une (les piliers compris)
+    wall_tiles = ~floor & (_neighbour_count(floor) > 0)
+    objects = _wall_objects(wall_tiles, tilewidth, tileheight)
+
+    # Départ du joueur : le centre de la première salle du serpentin
+    left, top, room_width, room_height = rooms[0]
+    objects.append(MapObject("player", None, float((left + room_width // 2) * tilewidth),
+                             float((top + room_height // 2) * tileheight), 0.0, 0.0))
+
+    # Portails : une tuile dans une salle, l'arrivée deux tuiles plus bas, les pieds du joueur hors de la zone
+    portal_list = []
+    target = target or name
+    for number, index in enumerate(portal_rooms):
+        left, top, room_width, room_height = rooms[index]
+        x = int(rng.integers(left + 1, left + room_width - 2))
+        y = int(rng.integers(top + 1, top + room_height - 4))
+        objects.append(MapObject(f"portal{number}", None, float(x * tilewidth), float(y * tileheight),
+                                 float(tilewidth), float(tileheight)))
+        objects.append(MapObject(f"portal{number}_exit", None, float(x * tilewidth), float((y + 2) * tileheight),
+                                 0.0, 0.0))
+        portal_list.append(Portal(from_world=name, origin_point=f"portal{number}", target_world=target,
+                                  teleport_point=f"portal{(number + 1) % portals}_exit"))
+
+    # Chemins des NPCs : des points dans leur salle, le sprite (2 x 2 tuiles) à une tuile au moins de ses murs
+    left, top, room_width, room_height = room_table[npc_rooms].T
+    xs = (left[:, None] + 1 + rng.integers(0, room_width[:, None] - 3, size=(npcs, nb_points))) * tilewidth
+    ys = (top[:, None] + 1 + rng.integers(0, room_height[:, None] - 3, size=(npcs, nb_points))) * tileheight
+    npc_list = []
+    for number, (row_x, row_y) in enumerate(zip(xs.tolist(), ys.tolist())):
+        path = f"npc{number}"
+        for point, (x, y) in enumerate(zip(row_x, row_y), 1):
+            objects.append(MapObject(f"{path}_path{point}", None, float(x), float(y),
+                                     float(tilewidth), float(tileheight)))
+        npc_list.append(NPC(NPC_SPRITES[number % len(NPC_SPRITES)], nb_points, NPC_DIALOG, path=path))
+
+    # Calques : le sol et les murs, puis quelques objets posés sur le sol
+    background = np.zeros((height, width), dtype=np.uint32)
+    background[floor] = np.asarray(FLOOR_GIDS, dtype=np.uint32)[
+        rng.integers(0, len(FLOOR_GIDS), size=int(np.count_nonzero(floor)))]
+    background[wall_tiles] = WALL_GID
+    decorations = np.zeros((height, width), dtype=np.uint32)
+    scattered = floor & (rng.random((height, width)) < DECORATION_RATE)
+    decorations[scattered] = np.asarray(DECORATION_GIDS, dtype=np.uint32)[
+        rng.integers(0, len(DECORATION_GIDS), size=int(np.count_nonzero(scattered)))]
+    layers = [CompiledLayer("background", True, memoryview(background.reshape(-1))),
+              CompiledLayer("decorations", True, memoryview(decorations.reshape(-1)))]
+
+    tmx_data = GeneratedMap(width, height, layers, objects, load_tileset(), tilewidth, tileheight)
+    return Dungeon(name, tmx_data, portal_list, npc_list)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
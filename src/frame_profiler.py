@@ -0,0 +1,333 @@
+import csv
+import json
+import os
+import time
+
+import pygame
+
+# Définir le répertoire de base du projet
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Les phases d'une image de Game.run, dans l'ordre où elles s'exécutent
+PHASES = [
+    "handle_input",
+    "group.update",
+    "check_collisions",
+    "npc.move",
+    "crowd",
+    "autosave",
+    "group.draw",
+    "group.center",
+    "dialog.render",
+    "overlay",
+    "display.flip",
+    "events",
+    "clock.tick",
+]
+
+# Les compteurs d'une image (nombre d'entités...) : la valeur donnée au dernier tick de l'image
+COUNTERS = [
+    "npcs.active",
+    "npcs.reduced",
+    "npcs.dormant",
+    "npcs.moved",
+]
+
+
+class FrameProfiler:
+    """
+    Classe FrameProfiler qui mesure la durée de chaque phase des dernières images du jeu.
+
+    Chaque appel à mark() attribue le temps écoulé depuis le marqueur précédent à une phase : les phases
+    se suivent donc sans trou, et leur somme est la durée de l'image. Les mesures sont rangées dans un
+    tampon circulaire de taille fixe : seules les capacity dernières images sont gardées.
+
+    Désactivé, chaque marqueur ne coûte qu'un appel de méthode et un test.
+
+    :param capacity: (int) Le nombre d'images gardées.
+    :return: None
+    :CU: capacity > 0
+
+    >>> profiler = FrameProfiler(capacity=2)
+    >>> profiler.enabled = True
+    >>> for _ in range(3):
+    ...     profiler.begin_frame()
+    ...     profiler.mark("handle_input")
+    ...     profiler.end_frame()
+    >>> profiler.count, len(profiler.frames())
+    (3, 2)
+    """
+
+    def __init__(self, capacity=600):
+        """
+        Initialise un profileur vide et désactivé.
+
+        :param capacity: (int) Le nombre d'images gardées.
+        :return: None
+        """
+        self.capacity = capacity
+        self.enabled = False
+        self.overlay = False
+        self.index = {name: position for position, name in enumerate(PHASES)}
+        self.durations = [[0.0] * len(PHASES) for _ in range(capacity)]  # secondes, une ligne par image
+        self.starts = [0.0] * capacity  # début de chaque image (perf_counter)
+        self.totals = [0.0] * capacity  # durée de chaque image
+        self.counter_index = {name: position for position, name in enumerate(COUNTERS)}
+        self.counters = [[0] * len(COUNTERS) for _ in range(capacity)]  # une ligne par image
+        self.count = 0  # nombre d'images terminées depuis le début
+        self.csv_path = None  # fichiers écrits par finish()
+        self.trace_path = None
+        self.recording = False  # True entre begin_frame et end_frame
+        self.last = 0.0
+        self.row = self.durations[0]
+        self.counter_row = self.counters[0]
+
+        self.font = None
+        self.overlay_surface = None
+        self.overlay_time = 0.0
+
+    def begin_frame(self):
+        """
+        Commence une image : les marqueurs suivants seront enregistrés dans une nouvelle ligne du tampon.
+
+        :return: None
+
+        >>> frame_profiler.begin_frame()  # Ceci commencera la mesure d'une image
+        """
+        if not self.enabled:
+            self.recording = False
+            return
+        slot = self.count % self.capacity
+        self.row = self.durations[slot]
+        for position in range(len(PHASES)):
+            self.row[position] = 0.0
+        self.counter_row = self.counters[slot]
+        for position in range(len(COUNTERS)):
+            self.counter_row[position] = 0
+        self.last = self.starts[slot] = time.perf_counter()
+        self.recording = True
+
+    def mark(self, phase):
+        """
+        Attribue à une phase le temps écoulé depuis le marqueur précédent.
+
+        :param phase: (str) Le nom de la phase qui vient de se terminer (voir PHASES).
+        :return: None
+        :CU: phase in PHASES
+
+        >>> frame_profiler.mark("check_collisions")  # Ceci comptera le temps écoulé dans check_collisions
+        """
+        if not self.recording:
+            return
+        now = time.perf_counter()
+        self.row[self.index[phase]] += now - self.last
+        self.last = now
+
+    def set_counter(self, name, value):
+        """
+        Donne la valeur d'un compteur pour l'image en cours.
+
+        :param name: (str) Le nom du compteur (voir COUNTERS).
+        :param value: (int) Sa valeur.
+        :return: None
+        :CU: name in COUNTERS
+
+        >>> frame_profiler.set_counter("npcs.active", 3)  # Ceci notera 3 NPCs actifs pour cette image
+        """
+        if not self.recording:
+            return
+        self.counter_row[self.counter_index[name]] = value
+
+    def latest_counters(self):
+        """
+        Donne les compteurs de la dernière image terminée.
+
+        :return: (list) La valeur de chaque compteur de COUNTERS, des zéros si aucune image n'est terminée.
+        """
+        if not self.count:
+            return [0] * len(COUNTERS)
+        return list(self.counters[(self.count - 1) % self.capacity])
+
+    def end_frame(self):
+        """
+        Termine l'image en cours.
+
+        :return: None
+
+        >>> frame_profiler.end_frame()  # Ceci terminera la mesure de l'image
+        """
+        if not self.recording:
+            return
+        slot = self.count % self.capacity
+        self.totals[slot] = self.last - self.starts[slot]
+        self.count += 1
+        self.recording = False
+
+    def frames(self):
+        """
+        Récupère les images gardées, de la plus ancienne à la plus récente.
+
+        :return: (list) Des triplets (début en secondes, durée en secondes, durées des phases).
+        """
+        kept = min(self.count, self.capacity)
+        first = self.count - kept
+        return [(self.starts[number % self.capacity], self.totals[number % self.capacity],
+                 self.durations[number % self.capacity]) for number in range(first, self.count)]
+
+    def averages(self, frames=60):
+        """
+        Calcule la durée moyenne d'une image et de chaque phase sur les dernières images.
+
+        :param frames: (int) Le nombre d'images prises en compte.
+        :return: (tuple) La durée moyenne d'une image et la liste des durées moyennes des phases, en secondes.
+        """
+        recent = self.frames()[-frames:]
+        if not recent:
+            return 0.0, [0.0] * len(PHASES)
+        total = sum(duration for start, duration, phases in recent) / len(recent)
+        phases = [sum(row[position] for start, duration, row in recent) / len(recent)
+                  for position in range(len(PHASES))]
+        return total, phases
+
+    def toggle_overlay(self):
+        """
+        Affiche ou cache le panneau des mesures ; la mesure est active tant que le panneau est affiché.
+
+        :return: None
+
+        >>> frame_profiler.toggle_overlay()  # Ceci affichera le panneau des mesures (touche F3)
+        """
+        self.overlay = not self.overlay
+        self.overlay_surface = None
+        if self.overlay:
+            self.enabled = True
+
+    def draw_overlay(self, screen, refresh=0.5):
+        """
+        Dessine le panneau des mesures : durée d'une image, images par seconde et détail par phase.
+
+        Le texte n'est recalculé que toutes les refresh secondes, pour que le panneau coûte peu.
+
+        :param screen: (pygame.Surface) L'écran sur lequel dessiner le panneau.
+        :param refresh: (float) L'intervalle entre deux mises à jour du panneau, en secondes.
+        :return: None
+        :CU: isinstance(screen, pygame.Surface)
+
+        >>> frame_profiler.draw_overlay(screen)  # Ceci dessinera le panneau des mesures
+        """
+        if not self.overlay:
+            return
+
+        now = time.perf_counter()
+        if self.overlay_surface is None or now - self.overlay_time >= refresh:
+            self.overlay_surface = self._render_overlay()
+            self.overlay_time = now
+        screen.blit(self.overlay_surface, (8, 8))
+
+    def overlay_rect(self):
+        """
+        Donne la zone de l'écran couverte par le panneau des mesures.
+
+        :return: (pygame.Rect) La zone du panneau, None s'il n'a pas encore été dessiné.
+        """
+        if self.overlay_surface is None:
+            return None
+        return self.overlay_surface.get_rect(topleft=(8, 8))
+
+    def _render_overlay(self):
+        """
+        Construit l'image du panneau des mesures (voir draw_overlay).
+
+        :return: (pygame.Surface) Le panneau.
+        """
+        if self.font is None:
+            font_path = os.path.join(BASE_DIR, 'dialogs', 'dialog_font.ttf')
+            self.font = pygame.font.Font(font_path, 10)
+
+        total, phases = self.averages()
+        fps = 1 / total if total > 0 else 0.0
+        lines = [f"image {total * 1000:6.2f} ms  {fps:5.0f} FPS"]
+        lines += [f"{name:<17}{duration * 1000:6.2f} ms" for name, duration in zip(PHASES, phases)]
+        counters = "  ".join(f"{name.split('.')[-1]} {value}" for name, value in zip(COUNTERS, self.latest_counters()))
+
+        line_height = self.font.get_linesize()
+        bar_width = 60
+        panel = pygame.Surface((260 + bar_width, line_height * (len(lines) + 1) + 8), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for number, line in enumerate(lines):
+            panel.blit(self.font.render(line, True, (255, 255, 255)), (4, 4 + number * line_height))
+            if number > 0 and total > 0:
+                # barre proportionnelle à la part de la phase dans l'image
+                width = round(bar_width * phases[number - 1] / total)
+                panel.fill((90, 200, 90, 255), (252, 6 + number * line_height, width, line_height - 4))
+        panel.blit(self.font.render(f"npcs {counters}", True, (255, 255, 255)), (4, 4 + len(lines) * line_height))
+        return panel
+
+    def export_csv(self, path):
+        """
+        Écrit les images gardées dans un fichier CSV : une ligne par image, une colonne par phase (en ms).
+
+        :param path: (str) Le chemin du fichier CSV.
+        :return: None
+
+        >>> frame_profiler.export_csv("images.csv")  # Ceci écrira les mesures dans "images.csv"
+        """
+        frames = self.frames()
+        origin = frames[0][0] if frames else 0.0
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["frame", "start_ms", "frame_ms"] + PHASES + COUNTERS)
+            first = self.count - len(frames)
+            for number, (start, duration, phases) in enumerate(frames, first):
+                writer.writerow([number, f"{(start - origin) * 1000:.3f}", f"{duration * 1000:.3f}"]
+                                + [f"{phase * 1000:.3f}" for phase in phases]
+                                + self.counters[number % self.capacity])
+
+    def export_trace(self, path):
+        """
+        Écrit les images gardées au format « Trace Event » de Chrome (chrome://tracing, Perfetto) :
+        un événement par image, et un événement par phase à l'intérieur.
+
+        :param path: (str) Le chemin du fichier JSON.
+        :return: None
+
+        >>> frame_profiler.export_trace("images.json")  # Ceci écrira une trace lisible par chrome://tracing
+        """
+        frames = self.frames()
+        origin = frames[0][0] if frames else 0.0
+        events = []
+        for number, (start, duration, phases) in enumerate(frames, self.count - len(frames)):
+            timestamp = (start - origin) * 1e6
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1, "ts": timestamp,
+                           "dur": duration * 1e6, "args": {"frame": number}})
+            events.append({"name": "npcs", "ph": "C", "pid": 1, "ts": timestamp,
+                           "args": dict(zip(COUNTERS, self.counters[number % self.capacity]))})
+            for name, phase in zip(PHASES, phases):
+                if phase > 0:
+                    events.append({"name": name, "ph": "X", "pid": 1, "tid": 1, "ts": timestamp,
+                                   "dur": phase * 1e6})
+                    timestamp += phase * 1e6
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def finish(self):
+        """
+        Écrit les exports demandés (options --frame-csv et --frame-trace) à la fin de la partie.
+
+        :return: None
+
+        >>> frame_profiler.finish()  # Ceci écrira les fichiers de mesures demandés
+        """
+        if self.csv_path:
+            self.export_csv(self.csv_path)
+        if self.trace_path:
+            self.export_trace(self.trace_path)
+
+
+# Profileur partagé par la boucle du jeu et le gestionnaire de cartes
+frame_profiler = FrameProfiler()
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -4,46 +4,128 @@ import pygame
 from player import Player
 from dialog import DialogBox
 from map import MapManager
+from startup import startup_report
+from frame_profiler import frame_profiler
+from dirty_rects import DirtyRectTracker
+from timestep import DEFAULT_TICK_RATE, FixedTimestep
+from scenes import ExplorationScene
+from savegame import AutoSaver, SaveError, load
+from rendering import DEFAULT_RENDER_MODE
 
 import os
+import time
 
 # Définir le répertoire de base du projet
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, input_source=pygame.key, dirty_rendering=False, tick_rate=DEFAULT_TICK_RATE, max_fps=60,
+                 save_path=None, render_mode=DEFAULT_RENDER_MODE, stream=None, dungeon=None):
         """
         Initialise le jeu en créant la fenêtre, le joueur, le gestionnaire de carte et la boîte de dialogue.
 
+        Avec un fichier de sauvegarde, la partie qui y est sauvegardée reprend, elle est sauvegardée régulièrement
+        pendant l'exploration, et une dernière fois en quittant.
+
+        :param input_source: L'objet qui donne les touches enfoncées avec get_pressed() : le clavier (pygame.key) ou un ScriptedInput.
+        :param dirty_rendering: (bool) True pour n'envoyer à l'écran que les zones qui ont changé (voir draw).
+        :param tick_rate: (int) Le nombre de ticks de simulation par seconde, indépendant du nombre d'images.
+        :param max_fps: (int) Le nombre maximal d'images dessinées par seconde, 0 pour ne pas le limiter.
+        :param save_path: (str) Le fichier de sauvegarde, None pour ne pas sauvegarder la partie.
+        :param render_mode: (str) La façon d'afficher les cartes agrandies : PRESCALED ou LOW_RES (voir rendering.py).
+        :param stream: (bool) True pour découper toutes les cartes en blocs, None pour ne découper que les grandes (voir streaming.py).
+        :param dungeon: (int) La graine d'un donjon généré où commence la partie (voir dungeon.py), None pour commencer sur "world".
         :return: None
+        :CU: tick_rate > 0 and max_fps >= 0
         """
-        self.reset_game()
+        self.input_source = input_source
+        self.dirty_rendering = dirty_rendering
+        self.tick_rate = tick_rate
+        self.dt = 1 / tick_rate  # durée d'un tick en secondes
+        self.max_fps = max_fps
+        self.render_mode = render_mode
+        self.stream = stream
+        with startup_report.phase("Game.build"):
+            self._build()
+        if dungeon is not None:
+            # Avant l'état de départ et la sauvegarde : une partie sauvegardée dans le donjon doit y reprendre
+            from dungeon import generate_dungeon
+            with startup_report.phase("generate_dungeon"):
+                generate_dungeon("generated", dungeon).register(self.map_manager, enter=True)
+        self.initial_state = self.map_manager.snapshot()  # état restauré par reset_game à la mort du joueur
+
+        self.autosaver = None
+        if save_path is not None:
+            if os.path.exists(save_path):
+                self.load_game(save_path)
+            self.autosaver = AutoSaver(save_path)
+
+    def load_game(self, path):
+        """
+        Reprend une partie sauvegardée. Si la sauvegarde ne peut pas être lue, la partie actuelle continue.
+
+        :param path: (str) Le fichier de sauvegarde.
+        :return: (bool) True si la partie sauvegardée a repris.
 
-    def reset_game(self):
+        >>> game.load_game(DEFAULT_SAVE_PATH)  # Ceci reprendra la partie sauvegardée dans saves/partie.sav
         """
-        Réinitialise le jeu en recréant la fenêtre, le joueur, le gestionnaire de carte et la boîte de dialogue.
+        try:
+            snapshot = load(path)
+            if snapshot.current_map not in self.map_manager.map_definitions:
+                raise SaveError(f"carte inconnue : {snapshot.current_map}")
+        except (OSError, SaveError) as error:
+            print(f"Avertissement : sauvegarde {path} illisible, nouvelle partie : {error}")
+            return False
+
+        self.reset_game(snapshot)
+        return True
+
+    def reset_game(self, snapshot=None):
+        """
+        Recommence la partie en restaurant un état gardé, sans rien recharger : la fenêtre, les cartes et leurs rendus,
+        les polices, les images et la musique restent ceux du début de la partie.
+
+        :param snapshot: (GameSnapshot) L'état à restaurer, celui du début de la partie par défaut.
+        :return: None
+
+        >>> game.reset_game()  # Ceci remettra le joueur à son point de départ avec tous ses points de vie
+        """
+        self.map_manager.restore(snapshot or self.initial_state)
+        self.dialog_box.close()
+        self.dialog_visible = False
+        self.change_scene(ExplorationScene(self))
+
+    def _build(self):
+        """
+        Crée la fenêtre, le joueur, le gestionnaire de carte et la boîte de dialogue, puis lance la musique.
 
         :return: None
         """
         # Pour créer la fenêtre du jeu
-        self.screen = pygame.display.set_mode((800, 600)) # taille de la fenêtre
-        pygame.display.set_caption("Dungeon et Donjon")
+        with startup_report.phase("display.set_mode"):
+            self.screen = pygame.display.set_mode((800, 600)) # taille de la fenêtre
+            pygame.display.set_caption("Dungeon et Donjon")
 
 
         # Générer un joueur
         self.player = Player()
-        self.map_manager = MapManager(self.screen, self, self.player)
+        self.map_manager = MapManager(self.screen, self, self.player, render_mode=self.render_mode,
+                                      stream=self.stream)
         self.dialog_box = DialogBox()
+        self.dialog_visible = False  # boîte de dialogue dessinée à l'image précédente
+        self.dirty_rects = DirtyRectTracker(self.screen.get_rect()) if self.dirty_rendering else None
+        self.scene = ExplorationScene(self)  # état actuel du jeu : exploration, dialogue, combat ou fin de partie
 
         # Créer une police et un texte de bienvenue
-        font_path = os.path.join(BASE_DIR, 'dialogs', 'dialog_font.ttf')
-        self.font = pygame.font.Font(font_path, 12)
-        self.texte_bienvenue = self.font.render(
-            "Bienvenue dans Dungeon et Donjon ! Appuyez sur {espace} pour déclencher un dialogue.", True,
-            (255, 255, 255))
-        self.texte_bienvenue2 = self.font.render(
-            "Utilisez les touches directionnelles pour vous déplacer", True, (255, 255, 255))
+        with startup_report.phase("font(welcome)"):
+            font_path = os.path.join(BASE_DIR, 'dialogs', 'dialog_font.ttf')
+            self.font = pygame.font.Font(font_path, 12)
+            self.texte_bienvenue = self.font.render(
+                "Bienvenue dans Dungeon et Donjon ! Appuyez sur {espace} pour déclencher un dialogue.", True,
+                (255, 255, 255))
+            self.texte_bienvenue2 = self.font.render(
+                "Utilisez les touches directionnelles pour vous déplacer", True, (255, 255, 255))
 
         # Charger la musique
         music_path = os.path.join(BASE_DIR, 'lost_woods.mp3')
@@ -57,36 +139,167 @@ class Game:
             print(f"Avertissement : fichier musique non trouvé : {music_path}")
 
 
-    def handle_input(self):
+    def handle_input(self, dt):
         """
         Gère les entrées du joueur en vérifiant les touches enfoncées et en déplaçant le joueur en conséquence.
 
+        :param dt: (float) La durée du tick en secondes.
         :return: None
         """
-        pressed = pygame.key.get_pressed()
+        pressed = self.input_source.get_pressed()
 
         if pressed[pygame.K_UP]:
-            self.player.move_up()
+            self.player.move_up(dt)
         elif pressed[pygame.K_DOWN]:
-            self.player.move_down()
+            self.player.move_down(dt)
         elif pressed[pygame.K_LEFT]:
-            self.player.move_left()
+            self.player.move_left(dt)
         elif pressed[pygame.K_RIGHT]:
-            self.player.move_right()
+            self.player.move_right(dt)
 
-    def update(self):
+    def update(self, dt):
         """
         Met à jour le gestionnaire de carte.
 
+        :param dt: (float) La durée du tick en secondes.
         :return: None
         """
-        self.map_manager.update()
+        self.map_manager.update(dt)
+
+    def tick(self):
+        """
+        Fait avancer la simulation d'un tick de durée fixe (self.dt) : entrées, déplacements et collisions.
+
+        :return: None
+        """
+        self.map_manager.save_previous_positions()
+        self.player.save_location()
+        self.handle_input(self.dt)
+        frame_profiler.mark("handle_input")
+        self.update(self.dt) # Actualisation du groupe
+
+        if self.autosaver is not None:
+            self.autosaver.update(self.dt, self.map_manager) # l'écriture se fait dans un autre thread
+            frame_profiler.mark("autosave")
 
 
+    def change_scene(self, scene):
+        """
+        Passe à une autre scène (exploration, dialogue, combat, fin de partie) à partir de la prochaine mise à jour.
+
+        :param scene: (Scene) La nouvelle scène.
+        :return: None
+
+        >>> game.change_scene(DialogScene(game, npc))  # Ceci ouvrira le dialogue avec le NPC
+        """
+        self.scene = scene
+        if self.dirty_rects is not None:
+            self.dirty_rects.invalidate()  # la scène précédente a pu dessiner autre chose que la carte
+
+    def draw(self, alpha=1.0):
+        """
+        Dessine une image du jeu et l'envoie à l'écran, les sprites placés entre les deux derniers ticks.
+
+        Sans suivi des zones modifiées, tout l'écran est redessiné et envoyé avec pygame.display.flip().
+        Avec, seules les zones qui ont changé sont redessinées (l'écran est limité à leur union) et envoyées
+        avec pygame.display.update(rects) ; si rien n'a changé, l'image n'est pas envoyée du tout.
+
+        :param alpha: (float) La part du tick suivant déjà écoulée (voir FixedTimestep.alpha).
+        :return: None
+        """
+        self.map_manager.interpolate(alpha)
+        if self.dirty_rects is None:
+            self.map_manager.draw() # Centrer caméra sur joueur + Dessiner les calques sur l'écran
+            self.dialog_box.draw(self.screen)
+            frame_profiler.mark("dialog.render")
+            self.present()
+        else:
+            self._draw_dirty()
+        self.map_manager.interpolate(1.0) # remettre les sprites à leur position simulée
+
+    def present(self):
+        """
+        Dessine le panneau des mesures par-dessus l'image et envoie tout l'écran.
+
+        :return: None
+        """
+        frame_profiler.draw_overlay(self.screen) # Panneau des mesures (F3)
+        frame_profiler.mark("overlay")
+        pygame.display.flip() # Actualiser en temps réel
+        frame_profiler.mark("display.flip")
+
+    def _draw_dirty(self):
+        """
+        Dessine et envoie seulement les zones de l'écran qui ont changé (voir draw).
+
+        :return: None
+        """
+        # Zones redessinées à chaque image : la boîte de dialogue (et sa place quand elle vient de se fermer), le panneau
+        always = []
+        if self.dialog_box.reading or self.dialog_visible:
+            always.append(self.dialog_box.rect)
+        if frame_profiler.overlay and frame_profiler.overlay_surface is not None:
+            always.append(frame_profiler.overlay_rect())
+
+        rects = self.dirty_rects.collect(self.map_manager.get_group(), always)
+        if rects:
+            self.screen.set_clip(rects[0].unionall(rects[1:]))
+            self.map_manager.draw()
+        else:
+            self.map_manager.get_group().center(self.player.rect.center)
+            frame_profiler.mark("group.center")
+
+        self.dialog_box.draw(self.screen)
+        self.dialog_visible = self.dialog_box.reading
+        frame_profiler.mark("dialog.render")
+        frame_profiler.draw_overlay(self.screen)
+        frame_profiler.mark("overlay")
+        self.screen.set_clip(None)
+
+        if rects:
+            pygame.display.update(rects)
+        frame_profiler.mark("display.flip")
+
+    def simulate(self, ticks):
+        """
+        Fait avancer le monde d'un nombre fixe de ticks, aussi vite que possible et sans rien dessiner.
+
+        Chaque tick dure self.dt secondes de jeu : le résultat ne dépend que du script d'entrée,
+        pas de la vitesse de la machine.
+
+        :param ticks: (int) Le nombre de ticks à simuler.
+        :return: (dict) Le nombre de ticks, la durée réelle (s) et le nombre de ticks simulés par seconde.
+        :CU: ticks >= 0
+
+        >>> game = Game(ScriptedInput.random_walk(42))
+        >>> stats = game.simulate(10000)  # Ceci simulera 10000 ticks sans fenêtre
+        """
+        advance = getattr(self.input_source, "tick", None)
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            self.scene.update()
+            if advance:
+                advance()
+        duration = time.perf_counter() - start
+
+        return {
+            "ticks": ticks,
+            "seconds": duration,
+            "ticks_per_second": ticks / duration if duration > 0 else float("inf"),
+        }
+
     def run(self):
         """
         Exécute le jeu en affichant un message de bienvenue, en gérant les entrées du joueur, en mettant à jour le jeu et en dessinant la carte.
 
+        La simulation avance par ticks de durée fixe, autant qu'il en faut pour rattraper le temps réel ; l'image est
+        ensuite dessinée avec les sprites placés entre les deux derniers ticks. Le jeu va donc à la même vitesse quel
+        que soit le nombre d'images par seconde.
+
+        Le dialogue, le combat et l'écran de fin de partie sont des scènes de cette même boucle (voir scenes.py) :
+        les événements sont toujours traités et la fenêtre répond pendant toute la partie.
+
         :return: None
 
         >>> game = Game()
@@ -99,30 +312,43 @@ class Game:
         self.screen.blit(self.texte_bienvenue, (40, 300))  # Positionner le texte au centre de l'écran
         self.screen.blit(self.texte_bienvenue2, (175, 350))  # Positionner le deuxième texte juste en dessous du premier
         pygame.display.flip()  # Actualiser l'écran
-        pygame.time.wait(5000)  # Attendre 5 secondes
+        with startup_report.phase("welcome_wait"):
+            pygame.time.wait(5000)  # Attendre 5 secondes
+        startup_report.finish()  # Le démarrage est terminé, afficher le rapport si demandé
+
+        timestep = FixedTimestep(self.tick_rate)
+        clock.tick()  # ne pas compter l'écran de bienvenue
+        elapsed = 0.0
 
         # Boucle du jeu, pour pas que la fenêtre se ferme instantanément
         jouer = True
 
         while jouer:
+            frame_profiler.begin_frame()
 
-            self.player.save_location()
-            self.handle_input()
-            self.update() # Actualisation du groupe
-            self.map_manager.draw() # Centrer caméra sur joueur + Dessiner les calques sur l'écran
-            self.dialog_box.render(self.screen)
-            pygame.display.flip() # Actualiser en temps réel
+            for _ in range(timestep.advance(elapsed)):
+                self.scene.update()
+            self.scene.render(timestep.alpha) # Dessiner la scène et le panneau des mesures, puis actualiser l'écran
 
             for event in pygame.event.get(): #Liste tous les événements qui peuvent survenir avec pygame
                 if event.type == pygame.QUIT: # Si le joueur a tenté de fermer la fenêtre
                     jouer = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_SPACE:
-                        self.map_manager.check_npc_collisions(self.dialog_box)
-
-            clock.tick(60) # Définir 60 images par seconde
-
-
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    frame_profiler.toggle_overlay()
+                    if self.dirty_rects is not None:
+                        self.dirty_rects.invalidate()  # effacer le panneau caché
+                else:
+                    self.scene.handle_event(event) # ESPACE : dialogue...
+            frame_profiler.mark("events")
+
+            elapsed = clock.tick(self.max_fps) / 1000 # Limiter le nombre d'images par seconde (0 : pas de limite)
+            frame_profiler.mark("clock.tick")
+            frame_profiler.end_frame()
+
+        if self.autosaver is not None:
+            # Sauvegarder la partie en quittant, sauf au milieu d'un dialogue, d'un combat ou sur l'écran de fin
+            self.autosaver.close(self.map_manager.snapshot() if isinstance(self.scene, ExplorationScene) else None)
+        frame_profiler.finish() # Écrire les mesures demandées avant de quitter
         pygame.quit()
         # Arrêter la musique lorsque le jeu est terminé
         pygame.mixer.music.stop()
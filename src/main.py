@@ -1,7 +1,29 @@
 
-##################### installer modules : pygame, pytmx et pyscroll ######################
+##################### vérifier modules : pygame, pytmx, pyscroll et numpy ######################
+import argparse
+import importlib.util
+import json
+import os
 import subprocess
 import sys
+from importlib import metadata
+
+from savegame import DEFAULT_SAVE_PATH
+from startup import startup_report
+
+# Définir le répertoire de base du projet
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, '.cache')
+DEPENDENCIES_CACHE = os.path.join(CACHE_DIR, 'dependencies.json')
+
+# module importé -> nom du paquet pip
+REQUIRED_PACKAGES = {
+    'pygame': 'pygame',
+    'pyscroll': 'pyscroll',
+    'pytmx': 'PyTMX',
+    'numpy': 'numpy',
+}
+
 
 def install(package):
     """
@@ -14,48 +36,207 @@ def install(package):
     """
     subprocess.check_call([sys.executable, "-m", "pip", "install", package])
 
-# Installer les packages nécessaires
-install('pygame')
-install('pyscroll')
-install('pytmx')
 
-import pygame
-from game import Game
-
-
-if __name__ == '__main__':
+def dependencies_key():
     """
-    Point d'entrée principal du programme. Initialise pygame et lance le jeu.
-    """
-    pygame.init()
-    game = Game()
-    game.run()
-
-
-if __name__ == "__main__":
-    import doctest
-    doctest.testmod()
-
-
-
+    Calcule la clé du cache des dépendances : l'interpréteur et la version de chaque paquet.
 
+    :return: (dict) La clé du cache, une version vaut None si le paquet n'est pas installé.
 
+    >>> sorted(dependencies_key()["packages"]) == sorted(REQUIRED_PACKAGES)
+    True
+    """
+    packages = {}
+    for module, package in REQUIRED_PACKAGES.items():
+        try:
+            packages[module] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            packages[module] = None
 
+    return {"executable": sys.executable, "python": sys.version, "packages": packages}
 
 
+def check_dependencies():
+    """
+    Vérifie que les paquets nécessaires sont installés, en n'appelant pip que pour ceux qui manquent.
 
+    Le résultat est mis en cache : tant que l'interpréteur et les versions des paquets ne changent pas,
+    aucune vérification supplémentaire n'est faite aux lancements suivants.
 
+    :return: None
 
+    >>> check_dependencies()  # Ceci vérifiera (ou installera) pygame, pyscroll, pytmx et numpy
+    """
+    key = dependencies_key()
+    try:
+        with open(DEPENDENCIES_CACHE, encoding="utf-8") as file:
+            if json.load(file) == key:
+                return  # déjà vérifié pour cet interpréteur et ces versions
+    except (OSError, ValueError):
+        pass
+
+    missing = [module for module, version in key["packages"].items()
+               if version is None or importlib.util.find_spec(module) is None]
+
+    for module in missing:
+        try:
+            install(REQUIRED_PACKAGES[module])
+        except subprocess.CalledProcessError:
+            print(f"Erreur : impossible d'installer {REQUIRED_PACKAGES[module]}. "
+                  f"Installez-le manuellement : pip install {REQUIRED_PACKAGES[module]}")
+            sys.exit(1)
+
+    if missing:
+        key = dependencies_key()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(DEPENDENCIES_CACHE, "w", encoding="utf-8") as file:
+        json.dump(key, file)
+
+
+def parse_arguments(argv=None):
+    """
+    Lit les options de la ligne de commande.
 
+    :param argv: (list) Les arguments à lire, sys.argv par défaut.
+    :return: (argparse.Namespace) Les options lues.
 
+    >>> parse_arguments(["--startup-report"]).startup_report
+    ''
+    """
+    return argument_parser().parse_args(argv)
 
 
+def argument_parser():
+    """
+    Décrit les options de la ligne de commande.
 
+    :return: (argparse.ArgumentParser) L'analyseur des options, aussi utilisé pour signaler une option invalide.
 
+    >>> argument_parser().error("fichier introuvable")  # Ceci affichera l'usage et l'erreur, puis quittera
+    """
+    parser = argparse.ArgumentParser(description="Dungeon et Donjon")
+    parser.add_argument("--startup-report", nargs="?", const="", default=None, metavar="FICHIER",
+                        help="affiche la durée de chaque phase du démarrage "
+                             "(et l'ajoute au fichier JSON donné)")
+    parser.add_argument("--headless", action="store_true",
+                        help="simule le jeu sans fenêtre, aussi vite que possible, puis affiche les ticks par seconde")
+    parser.add_argument("--ticks", type=int, default=10000, help="nombre de ticks simulés en mode --headless")
+    parser.add_argument("--script", metavar="FICHIER",
+                        help='script d\'entrées JSON [[ticks, ["UP", ...]], ...] pour le mode --headless')
+    parser.add_argument("--seed", type=int, default=0,
+                        help="graine de la promenade aléatoire utilisée en mode --headless sans --script, "
+                             "et des combats simulés avec --balance")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="n'envoie à l'écran que les zones qui ont changé, et rien quand l'image est identique")
+    parser.add_argument("--render", choices=["prescaled", "low_res"], default="prescaled",  # rendering.RENDER_MODES
+                        help="affichage des cartes agrandies : tuiles et sprites agrandis au chargement (prescaled, "
+                             "par défaut) ou carte dessinée en petit puis agrandie à chaque image (low_res)")
+    parser.add_argument("--stream", action="store_const", const=True, default=None,
+                        help="découpe toutes les cartes en blocs chargés autour du joueur, comme les grandes cartes")
+    parser.add_argument("--dungeon", type=int, metavar="GRAINE",
+                        help="commence dans un donjon de 1000 x 1000 tuiles généré à partir de cette graine "
+                             "(voir dungeon.py), pour mesurer le jeu sur une très grande carte")
+    parser.add_argument("--tick-rate", type=int, default=60,
+                        help="nombre de ticks de simulation par seconde (60 par défaut)")
+    parser.add_argument("--fps", type=int, default=60,
+                        help="nombre maximal d'images par seconde, 0 pour ne pas le limiter (60 par défaut)")
+    parser.add_argument("--frame-csv", metavar="FICHIER",
+                        help="mesure chaque phase des images et les écrit dans ce fichier CSV en quittant")
+    parser.add_argument("--frame-trace", metavar="FICHIER",
+                        help="mesure chaque phase des images et les écrit dans ce fichier JSON "
+                             "(format Trace Event, pour chrome://tracing ou Perfetto) en quittant")
+    parser.add_argument("--save", metavar="FICHIER", default=DEFAULT_SAVE_PATH,
+                        help="fichier de sauvegarde : la partie y reprend et y est sauvegardée "
+                             "(saves/partie.sav par défaut, saves/partie-donjon-GRAINE.sav avec --dungeon)")
+    parser.add_argument("--no-save", action="store_true", help="ne reprend pas et ne sauvegarde pas la partie")
+    parser.add_argument("--balance", nargs="?", type=int, const=100000, default=None, metavar="COMBATS",
+                        help="simule COMBATS combats (100000 par défaut) contre chaque NPC, "
+                             "affiche la part de victoires, les tours et les dégâts reçus, puis quitte")
+    return parser
+
+
+def save_path(arguments):
+    """
+    Choisit le fichier de sauvegarde d'après les options : une partie commencée dans un donjon généré a son propre
+    fichier par graine, pour ne pas remplacer la partie normale par une carte qui n'existe qu'avec cette graine.
 
+    :param arguments: (argparse.Namespace) Les options lues.
+    :return: (str) Le fichier de sauvegarde, None avec --no-save.
 
+    >>> save_path(parse_arguments(["--save", "test.sav", "--dungeon", "3"]))
+    'test-donjon-3.sav'
+    """
+    if arguments.no_save:
+        return None
+    if arguments.dungeon is None:
+        return arguments.save
+    root, extension = os.path.splitext(arguments.save)
+    return f"{root}-donjon-{arguments.dungeon}{extension}"
 
 
+def main(argv=None):
+    """
+    Point d'entrée principal du programme. Vérifie les dépendances, initialise pygame et lance le jeu.
 
+    :param argv: (list) Les arguments de la ligne de commande.
+    :return: None
+    """
+    arguments = parse_arguments(argv)
+    if arguments.startup_report is not None:
+        startup_report.enabled = True
+        startup_report.output_path = arguments.startup_report or None
+
+    if arguments.frame_csv or arguments.frame_trace:
+        from frame_profiler import frame_profiler
+        frame_profiler.enabled = True
+        frame_profiler.csv_path = arguments.frame_csv
+        frame_profiler.trace_path = arguments.frame_trace
+
+    with startup_report.phase("check_dependencies"):
+        check_dependencies()
+
+    if arguments.balance is not None:
+        from combat_sim import balance_report
+        print(balance_report(arguments.balance, seed=arguments.seed))
+        return
+
+    if arguments.headless:
+        # Pilotes SDL factices : pas de fenêtre ni de son
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    # Les modules lourds ne sont importés qu'une fois les dépendances vérifiées
+    with startup_report.phase("imports"):
+        import pygame
+        from game import Game
+
+    with startup_report.phase("pygame.init"):
+        pygame.init()
+
+    if arguments.headless:
+        from scripted_input import ScriptedInput
+
+        if arguments.script:
+            try:
+                input_source = ScriptedInput.from_file(arguments.script)
+            except (OSError, ValueError) as error:
+                argument_parser().error(f"--script : {error}")
+        else:
+            input_source = ScriptedInput.random_walk(arguments.seed)
+        game = Game(input_source, tick_rate=arguments.tick_rate, stream=arguments.stream, dungeon=arguments.dungeon)
+        startup_report.finish()
+
+        stats = game.simulate(arguments.ticks)
+        print(f"Simulation : {stats['ticks']} ticks en {stats['seconds']:.3f} s "
+              f"-> {stats['ticks_per_second']:.0f} ticks/s")
+        return
+
+    game = Game(dirty_rendering=arguments.dirty_rects, tick_rate=arguments.tick_rate, max_fps=arguments.fps,
+                save_path=save_path(arguments), render_mode=arguments.render, stream=arguments.stream,
+                dungeon=arguments.dungeon)
+    game.run()
 
 
+if __name__ == '__main__':
+    main()
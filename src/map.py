@@ -1,14 +1,29 @@
 from dataclasses import dataclass
 import pygame, pytmx, pyscroll
 
-from player import NPC
-from combat import Combat
+from player import NPC, NPC_SPEED
+from snapshot import GameSnapshot, NPCSnapshot, PlayerSnapshot
+from map_cache import MapCache
+from map_compiler import CompiledMapData, load_compiled_map
+from spatial import SpatialHash
+from collision_grid import CollisionGrid, RectBatch
+from crowd import Crowd
+from pathfinding import Pathfinder
+from triggers import TriggerIndex, TriggerZone
+from startup import startup_report
+from frame_profiler import frame_profiler
+from activity import ActivityScheduler, ACTIVE, REDUCED, DORMANT, MAX_CATCH_UP
+from rendering import DEFAULT_RENDER_MODE, build_group
+from streaming import ChunkStreamer, MapChunkSource, StreamedMapData, STREAM_MIN_TILES
 
 import os
 
 # Définir le répertoire de base du projet
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# À partir de ce nombre de sprites, les pieds de tous les sprites sont testés en un seul appel NumPy
+BATCH_COLLISION_THRESHOLD = 32
+
 
 @dataclass
 class Portal:
@@ -38,51 +53,91 @@ class Map:
     :param name: (str) Le nom de la carte.
     :param walls: (list) La liste des murs de la carte.
     :param group: (pyscroll.PyscrollGroup) Le groupe de la carte.
-    :param tmx_data: (pytmx.TiledMap) Les données tmx de la carte.
+    :param tmx_data: (pytmx.TiledMap ou CompiledMap) Les données tmx de la carte.
     :param portals: (list) La liste des portails de la carte.
     :param npcs: (list) La liste des NPCs de la carte.
+    :param wall_index: (SpatialHash) Les murs rangés par case de tuile, pour ne tester que les murs proches.
+    :param collision_grid: (CollisionGrid) Les tuiles touchées par un mur, partagées par les collisions, les NPCs et l'IA.
+    :param objects: (dict) Les objets nommés de la carte, par nom.
+    :param triggers: (TriggerIndex) Les zones de déclenchement de la carte (portails...).
+    :param pathfinder: (Pathfinder) La recherche de chemins entre les tuiles où passent les pieds des NPCs.
+    :param crowd: (Crowd) Les figurants de la carte, simulés ensemble dans des tableaux NumPy.
+    :param stream: (ChunkStreamer) Les blocs chargés d'une carte découpée, None pour une carte gardée en entier.
     :return: None
     :CU: type(name) == str and type(walls) == list and isinstance(group, pyscroll.PyscrollGroup) and isinstance(tmx_data, pytmx.TiledMap) and type(portals) == list and type(npcs) == list
 
-    >>> map = Map(name="world", walls=[], group=pyscroll.PyscrollGroup(), tmx_data=pytmx.TiledMap(), portals=[], npcs=[])  # Ceci créera une nouvelle carte nommée "world" sans murs, portails ou NPCs
+    >>> map = Map(name="world", walls=[], group=pyscroll.PyscrollGroup(), tmx_data=pytmx.TiledMap(), portals=[], npcs=[], wall_index=SpatialHash(), collision_grid=CollisionGrid.from_rects([], 100, 100, 16, 16), objects={}, triggers=TriggerIndex([]), pathfinder=Pathfinder(CollisionGrid.from_rects([], 100, 100, 16, 16)), crowd=Crowd(CollisionGrid.from_rects([], 100, 100, 16, 16)))  # Ceci créera une nouvelle carte nommée "world" sans murs, portails ou NPCs
     """
     name: str # type du nom de la map
     walls: list[pygame.Rect] # collisions avec le joueur
     group: pyscroll.PyscrollGroup # Assembler toutes les tuiles de notre jeu
-    tmx_data: pytmx.TiledMap    # Recuperer objets depuis la carte
+    tmx_data: pytmx.TiledMap    # Recuperer objets depuis la carte (ou CompiledMap, même interface)
     portals: list[Portal]
     npcs: list[NPC]
+    wall_index: SpatialHash # murs rangés par case, construits une seule fois au chargement
+    collision_grid: CollisionGrid # tuiles bloquées par un mur
+    objects: dict # nom -> objet de la carte, pour ne pas chercher les objets à chaque image
+    triggers: TriggerIndex # zones des portails, rectangles construits une seule fois
+    pathfinder: Pathfinder # chemins et champs de directions entre les tuiles accessibles, gardés en cache
+    crowd: Crowd # figurants : seuls ceux qui sont visibles ont un sprite dans le groupe
+    stream: ChunkStreamer = None # carte découpée : murs, grille, chemins et NPCs ne couvrent que les blocs autour du joueur
 
 class MapManager:
     """
     Classe MapManager qui gère les cartes du jeu.
 
+    Les cartes sont chargées à la demande et gardées dans un cache LRU ; les cartes accessibles
+    par un portail depuis la carte actuelle sont préchargées en arrière-plan.
+
+    Les grandes cartes sont découpées en blocs (voir streaming.py) : seuls les blocs autour du joueur sont en mémoire
+    et simulés. Les murs, la grille de collision, la recherche de chemins et les NPCs de la Map sont alors ceux de
+    ces blocs, remplacés quand le joueur avance : les collisions et les téléportations ne font pas de différence.
+
     :param screen: (pygame.Surface) L'écran sur lequel dessiner les cartes.
     :param game: (Game) Le jeu auquel appartient le gestionnaire de cartes.
     :param player: (Player) Le joueur du jeu.
+    :param max_maps: (int) Le nombre maximal de cartes gardées en mémoire.
+    :param memory_budget: (int) La mémoire maximale (en octets) occupée par les cartes, None pour ne pas la limiter.
+    :param stream: (bool) True pour découper toutes les cartes en blocs, False pour n'en découper aucune, None selon leur taille.
     :return: None
     :CU: isinstance(screen, pygame.Surface) and isinstance(game, Game) and isinstance(player, Player)
 
     >>> map_manager = MapManager(screen, game, player)  # Ceci créera un nouveau gestionnaire de cartes pour l'écran, le jeu et le joueur donnés
     """
 
-    def __init__(self, screen, game,  player):
+    def __init__(self, screen, game,  player, max_maps=3, memory_budget=None, render_mode=DEFAULT_RENDER_MODE,
+                 stream=None):
         """
         Initialise le gestionnaire de cartes en enregistrant les cartes et en téléportant le joueur et les NPCs.
 
         :param screen: (pygame.Surface) L'écran sur lequel dessiner les cartes.
         :param game: (Game) Le jeu auquel appartient le gestionnaire de cartes.
         :param player: (Player) Le joueur du jeu.
+        :param max_maps: (int) Le nombre maximal de cartes gardées en mémoire.
+        :param memory_budget: (int) La mémoire maximale (en octets) occupée par les cartes, None pour ne pas la limiter.
+        :param render_mode: (str) La façon d'afficher les cartes agrandies : PRESCALED ou LOW_RES (voir rendering.py).
+        :param stream: (bool) True pour découper toutes les cartes en blocs, False pour n'en découper aucune,
+            None pour ne découper que celles de plus de STREAM_MIN_TILES tuiles.
         :return: None
         :CU: isinstance(screen, pygame.Surface) and isinstance(game, Game) and isinstance(player, Player)
 
         >>> map_manager = MapManager(screen, game, player)  # Ceci initialisera le gestionnaire de cartes, enregistrera les cartes et téléportera le joueur et les NPCs
         """
-        self.maps = dict() # "dungeon" -> Map("dungeon", walls, group) -> directement accéder aux données d'une map
+        self.map_definitions = dict() # "dungeon" -> (portals, npcs) : cartes connues, chargées ou non
+        self.map_sources = dict() # nom -> carte construite en mémoire (voir dungeon.py), lue à la place d'un fichier tmx
+        self.maps = MapCache(self._load_map, max_maps, memory_budget,
+                             sizeof=self._estimate_map_size, on_evict=self._unload_map) # "dungeon" -> Map("dungeon", walls, group), chargée à la demande
         self.screen = screen
+        self.render_mode = render_mode
+        self.stream = stream
         self.game = game
         self.player = player
         self.current_map = "world"
+        self.scheduler = ActivityScheduler() # fréquence de déplacement des NPCs selon leur distance à la caméra
+        self.clock = 0.0 # temps de jeu simulé, en secondes
+        self.left_at = dict() # nom de carte -> temps de jeu quand le joueur l'a quittée
+        self.simulated_map = self.current_map # carte simulée au dernier tick
+        self.collision_batch = None # RectBatch des pieds du joueur et des NPCs, gardé d'un tick à l'autre
 
         self.register_map("world", portals=[
             Portal(from_world="world", origin_point="enter_dungeon", target_world="dungeon", teleport_point="spawn_dungeon")
@@ -102,33 +157,21 @@ class MapManager:
         ])
 
         self.teleport_player("player")
-        self.teleport_npcs()
+        self.prefetch_neighbours()
 
 
-    def check_npc_collisions(self, dialog_box):
+    def npc_in_contact(self):
         """
-        Vérifie les collisions entre le joueur et les NPCs et déclenche un combat si nécessaire.
+        Cherche le NPC que le joueur touche, pour lancer un dialogue puis un combat.
 
-        :param dialog_box: (DialogBox) La boîte de dialogue à utiliser pour afficher les dialogues.
-        :return: None
-        :CU: isinstance(dialog_box, DialogBox)
+        :return: (NPC) Le premier NPC touché par le joueur, None s'il n'y en a pas.
 
-        >>> map_manager.check_npc_collisions(dialog_box)  # Ceci vérifiera les collisions entre le joueur et les NPCs et déclenchera un combat si nécessaire
+        >>> npc = map_manager.npc_in_contact()  # Ceci renverra le NPC à côté du joueur
         """
-        for sprite in self.get_group().sprites():
+        for sprite in self.entities():
             if sprite.feet.colliderect(self.player.rect) and type(sprite) is NPC:
-                # Lancer les dialogues
-                dialog_box.execute([sprite.dialog], [sprite])
-
-                # Attendre que tous les dialogues soient affichés
-                while dialog_box.reading:
-                    dialog_box.render(self.screen)
-                    pygame.display.flip()  # Mettre à jour l'affichage
-                    pygame.time.delay(40)  # Petit délai pour ne pas surcharger le CPU
-
-                # UNE FOIS les dialogues terminés, lancer le combat
-                combat = Combat(self.player, sprite, self.screen, self.game)
-                combat.run()
+                return sprite
+        return None
 
 
     def check_collisions(self):
@@ -139,30 +182,70 @@ class MapManager:
 
         >>> map_manager.check_collisions()  # Ceci vérifiera les collisions entre le joueur et les NPCs et déclenchera un combat si nécessaire
         """
-        # portails et leurs déclenchements
-        for portal in self.get_map().portals:
-            if portal.from_world == self.current_map:
-                point = self.get_object(portal.origin_point)
-                rect = pygame.Rect(point.x, point.y, point.width, point.height)
-
-                if self.player.feet.colliderect(rect): #si les pieds du joueurs rentrent en collision avec ce ractangle
-                    copy_portal = portal
+        # portails et leurs déclenchements : seulement quand les pieds du joueur entrent dans la zone
+        player = self.player
+        position, offset = player.position, player.feet_offset
+        entered, left = self.get_map().triggers.update(player.feet, position[0] + offset[0], position[1] + offset[1])
+        if entered:  # presque toujours vide : pas de boucle, qui créerait un itérateur à chaque tick
+            for zone in entered:
+                if isinstance(zone.data, Portal):
+                    portal = zone.data
                     self.current_map = portal.target_world
-                    self.teleport_player(copy_portal.teleport_point)
-
-
+                    self.teleport_player(portal.teleport_point)
+                    self.prefetch_neighbours()
+                    break
 
         # collision
-        for sprite in self.get_group().sprites():
-
-            if type(sprite) is NPC:
-                if sprite.feet.colliderect(self.player.rect):
-                    sprite.speed = 0
+        map = self.get_map()
+        npcs = map.npcs
+
+        if len(npcs) + 1 >= BATCH_COLLISION_THRESHOLD:
+            # La grille de collision écarte d'un coup les entités loin des murs, les rectangles exacts des murs
+            # confirment les autres. Le lot garde ses tableaux d'un tick à l'autre : rien n'est créé ici
+            batch = self.collision_batch
+            if batch is None or batch.size != len(npcs) + 1:
+                batch = self.collision_batch = RectBatch(len(npcs) + 1)
+            feet = player.feet
+            batch.set(0, position[0] + offset[0], position[1] + offset[1], feet.width, feet.height)
+            index = 0
+            while index < len(npcs):
+                npc = npcs[index]
+                if npc.killed:
+                    batch.set(index + 1, 0.0, 0.0, 0, 0)  # largeur nulle : jamais bloqué
                 else:
-                    sprite.speed = 1
-
-            if sprite.feet.collidelist(self.get_walls()) > -1:
-                sprite.move_back()
+                    position, offset, feet = npc.position, npc.feet_offset, npc.feet
+                    batch.set(index + 1, position[0] + offset[0], position[1] + offset[1], feet.width, feet.height)
+                index += 1
+
+            blocked = map.collision_grid.batch_blocked(batch)
+            if blocked[0] and player.collides(map.wall_index):
+                player.move_back()
+            index = 0
+            while index < len(npcs):
+                if blocked[index + 1] and npcs[index].collides(map.wall_index):
+                    npcs[index].move_back()
+                index += 1
+        else:
+            # Peu d'entités : chacune est testée directement, sans créer d'objet (boucle while plutôt que for)
+            if player.collides(map.wall_index):
+                player.move_back()
+            index = 0
+            while index < len(npcs):
+                npc = npcs[index]
+                if not npc.killed and npc.collides(map.wall_index):
+                    npc.move_back()
+                index += 1
+
+        player_rect = player.rect
+        index = 0
+        while index < len(npcs):
+            npc = npcs[index]
+            if not npc.killed:
+                if npc.feet.colliderect(player_rect):
+                    npc.speed = 0
+                else:
+                    npc.speed = NPC_SPEED
+            index += 1
 
     def teleport_player(self, name):
         """
@@ -178,45 +261,230 @@ class MapManager:
         self.player.position[0] = point.x
         self.player.position[1] = point.y
         self.player.save_location()  # Eviter problematique de tp avec colllision
+        self.player.save_previous_position()  # ne pas dessiner le joueur entre son ancienne et sa nouvelle place
+
+        # Carte découpée : les blocs autour du point d'arrivée sont chargés tout de suite
+        map = self.get_map()
+        if map.stream is not None and map.stream.ensure(point.x, point.y):
+            self._follow_stream(map)
+
+        # Le joueur arrive sur les zones qu'il touche déjà : elles ne se déclenchent pas avant qu'il en sorte
+        self.player.update()
+        self.get_map().triggers.reset(self.player.feet)
 
 
-    def register_map(self, name, portals=[], npcs=[]):
+    def register_map(self, name, portals=[], npcs=[], tmx_data=None):
         """
-        Enregistre une carte dans le gestionnaire de cartes.
+        Enregistre une carte dans le gestionnaire de cartes. Elle ne sera chargée qu'à sa première utilisation.
 
         :param name: (str) Le nom de la carte à enregistrer.
         :param portals: (list) La liste des portails de la carte.
         :param npcs: (list) La liste des NPCs de la carte.
+        :param tmx_data: (GeneratedMap) La carte construite en mémoire (voir dungeon.py), None pour lire map/<name>.tmx.
         :return: None
         :CU: type(name) == str and type(portals) == list and type(npcs) == list
 
         >>> map_manager.register_map("world", portals=[Portal(from_world="world", origin_point="enter_dungeon", target_world="dungeon", teleport_point="spawn_dungeon")], npcs=[NPC("mushroom", 4, ["Je te souhaite une excellente aventure", "Les cours de NSI sont les meilleurs", "Dédicace au meilleur graphiste : Karl", " Bye !"])])  # Ceci enregistrera une carte nommée "world" avec un portail et un NPC
         """
-        # Charger la carte sous format tmx
+        self.map_definitions[name] = (portals, npcs)
+        if tmx_data is not None:
+            self.map_sources[name] = tmx_data
+
+    def _load_map(self, name):
+        """
+        Charge une carte enregistrée (appelée par le cache de cartes, éventuellement depuis un thread).
+
+        :param name: (str) Le nom de la carte à charger.
+        :return: (Map) La carte chargée.
+        :CU: name in self.map_definitions
+        """
+        with startup_report.phase(f"load_map({name})"):
+            return self._load_map_data(name)
+
+    def _load_map_data(self, name):
+        """
+        Lit le fichier tmx d'une carte et construit son rendu, ses murs et son groupe (voir _load_map).
+
+        :param name: (str) Le nom de la carte à charger.
+        :return: (Map) La carte chargée.
+        """
+        portals, npcs = self.map_definitions[name]
+
+        # Charger la carte construite en mémoire, la carte compilée, ou sous format tmx si elle ne peut pas être utilisée
         map_path = os.path.join(BASE_DIR, 'map', f'{name}.tmx')
-        tmx_data = pytmx.util_pygame.load_pygame(map_path)  # Pour spécifier le bon fichier tmx contenant notre carte
-        map_data = pyscroll.data.TiledMapData(tmx_data)  # Extraire la carte
-        map_layer = pyscroll.orthographic.BufferedRenderer(map_data, self.screen.get_size())  # Va contenir tous les calques de la map regroupés
-                                                                                            # + parametre self.ecran permettent de choisir sur quelle surface dessiner la map
-        map_layer.zoom = 3  # zoomer en X fois plus gros
+        tmx_data = self.map_sources.get(name)
+        if tmx_data is not None:
+            tmx_data = tmx_data.fresh()  # le rendu agrandit sur place les images de chaque chargement
+        else:
+            tmx_data = load_compiled_map(map_path, name)
+        if tmx_data is not None:
+            map_data = CompiledMapData(tmx_data)
+        else:
+            tmx_data = pytmx.util_pygame.load_pygame(map_path)  # Pour spécifier le bon fichier tmx contenant notre carte
+            map_data = pyscroll.data.TiledMapData(tmx_data)  # Extraire la carte
+
+        # Les grandes cartes sont découpées en blocs : leurs murs sont rangés par bloc (voir streaming.py)
+        streamed = self.stream
+        if streamed is None:
+            streamed = tmx_data.width * tmx_data.height > STREAM_MIN_TILES
+        stream = None
+        if streamed:
+            stream = ChunkStreamer(MapChunkSource(tmx_data))
+            map_data = StreamedMapData(stream)
 
         # définir une liste qui va stocker les rectangles de collision
         walls = []
+        objects = dict()
 
         for object in tmx_data.objects:
-            if object.type == "collision":
+            if object.type == "collision" and stream is None:
                 walls.append(pygame.Rect(object.x, object.y, object.width, object.height))
-
-        # Dessiner le groupe de calques
-        group = pyscroll.PyscrollGroup(map_layer=map_layer, default_layer=4)  # default_layer permet de donner la position du calque par défaut
+            if object.name:
+                objects[object.name] = object
+
+        # zones de déclenchement des portails qui partent de cette carte
+        zones = []
+        for portal in portals:
+            if portal.from_world == name:
+                point = objects[portal.origin_point]
+                zones.append(TriggerZone(portal.origin_point, pygame.Rect(point.x, point.y, point.width, point.height), portal))
+        triggers = TriggerIndex(zones, tmx_data.tilewidth)
+
+        # Point d'arrivée du portail qui mène ici depuis la carte actuelle
+        arrival = None
+        for portal in self.map_definitions[self.current_map][0]:
+            if portal.target_world == name:
+                arrival = objects[portal.teleport_point]
+        if stream is not None:
+            # charger les blocs autour de l'arrivée (ou du point de départ du joueur) avant le premier dessin
+            start = arrival or objects.get("player")
+            if start is not None:
+                stream.ensure(start.x, start.y)
+            else:
+                stream.ensure(0, 0)
+
+        # Dessiner le groupe de calques, zoomé trois fois sans agrandir l'image à chaque affichage (voir rendering.py)
+        group = build_group(map_data, self.screen.get_size(), self.render_mode, default_layer=4)  # default_layer permet de donner la position du calque par défaut
         group.add(self.player)
 
         # recuperer tous les npc pour les ajouter au groupe
         for npc in npcs:
-            group.add(npc)
+            if not npc.points:
+                # Premier chargement : charger les points du npc par rapport à son monde
+                npc.load_points(objects)
+                npc.teleport_spawn()
+            if not npc.killed and stream is None:
+                group.add(npc)  # carte découpée : seulement les NPCs des blocs chargés (voir _place_npcs)
+
+        # Centrer la caméra sur le point d'arrivée du portail qui mène ici depuis la carte actuelle,
+        # pour que la première image après la téléportation ne redessine pas tout le tampon
+        if arrival is not None:
+            group.center((arrival.x, arrival.y))
+
+        if stream is not None:
+            window = stream.window
+            map = Map(name, window.walls, group, tmx_data, portals, [], window.wall_index, window.collision_grid,
+                      objects, triggers, window.pathfinder, Crowd(window.collision_grid), stream)
+            self._place_npcs(map)
+            return map
+
+        wall_index = SpatialHash.from_rects(walls, tmx_data.tilewidth)  # une case par tuile
+        collision_grid = CollisionGrid.from_rects(walls, tmx_data.width, tmx_data.height,
+                                                  tmx_data.tilewidth, tmx_data.tileheight)
+
+        return Map(name, walls, group, tmx_data, portals, npcs, wall_index, collision_grid, objects, triggers,
+                   Pathfinder(collision_grid, wall_index), Crowd(collision_grid))
+
+    def _follow_stream(self, map):
+        """
+        Donne à une carte découpée les murs, la grille de collision et la recherche de chemins de sa nouvelle fenêtre
+        de blocs, et y fait entrer ou sortir les NPCs.
+
+        :param map: (Map) La carte découpée.
+        :return: None
+        """
+        window = map.stream.window
+        map.walls = window.walls
+        map.wall_index = window.wall_index
+        map.collision_grid = window.collision_grid
+        map.pathfinder = window.pathfinder
+        map.crowd.collision_grid = window.collision_grid
+        self._place_npcs(map)
+
+    def _place_npcs(self, map):
+        """
+        Range les NPCs d'une carte découpée : ceux des blocs simulés sont dans map.npcs et dans le groupe, les autres
+        attendent sans bouger. Un NPC qui revient rattrape le temps passé dehors (voir ActivityScheduler), MAX_CATCH_UP
+        secondes au plus.
+
+        :param map: (Map) La carte découpée.
+        :return: None
+        """
+        stream = map.stream
+        area = stream.window.rect
+        active = set(map.npcs)
+        npcs = []
+        for npc in self.map_definitions[map.name][1]:
+            if area.collidepoint(npc.rect.center):
+                parked_at = stream.parked.pop(npc, None)
+                if parked_at is not None:
+                    npc.lag = min(npc.lag + self.clock - parked_at, MAX_CATCH_UP)
+                npcs.append(npc)
+                if npc.killed:
+                    map.group.remove(npc)
+                elif npc not in map.group:
+                    map.group.add(npc)
+            else:
+                if npc in active or npc not in stream.parked:
+                    stream.parked[npc] = self.clock
+                map.group.remove(npc)
+        map.npcs[:] = npcs  # même liste : l'ordonnanceur et les collisions la relisent à chaque tick
+
+    def _unload_map(self, map):
+        """
+        Libère une carte retirée du cache : le joueur et les NPCs quittent son groupe.
+
+        :param map: (Map) La carte libérée.
+        :return: None
+        """
+        map.group.empty()
+
+    @staticmethod
+    def _estimate_map_size(map):
+        """
+        Estime la mémoire occupée par une carte : images des tuiles et tampons du rendu.
 
-        # Enregistrer la nouvelle carte chargée
-        self.maps[name] = Map(name, walls, group, tmx_data, portals, npcs)
+        :param map: (Map) La carte.
+        :return: (int) La mémoire estimée, en octets.
+        """
+        map_layer = map.group._map_layer
+        surfaces = {id(image): image for image in map.tmx_data.images if image is not None}
+        for buffer in (map_layer._buffer, map_layer._zoom_buffer, getattr(map.group, "canvas", None)):
+            if buffer is not None:
+                surfaces[id(buffer)] = buffer
+        for chunk in map_layer.chunks.surfaces():  # calques fixes aplatis (voir rendering.StaticChunks)
+            surfaces[id(chunk)] = chunk
+
+        streamed = map.stream.nbytes if map.stream is not None else 0  # blocs d'une carte découpée
+        return streamed + sum(surface.get_bytesize() * surface.get_width() * surface.get_height()
+                              for surface in surfaces.values())
+
+    def prefetch_neighbours(self):
+        """
+        Précharge en arrière-plan les cartes accessibles par un portail depuis la carte actuelle.
+
+        :return: None
+
+        >>> map_manager.prefetch_neighbours()  # Ceci chargera "dungeon" dans un thread si la carte actuelle est "world"
+        """
+        portals = self.map_definitions[self.current_map][0]
+        targets = []
+        for portal in portals:
+            if portal.target_world not in targets:
+                targets.append(portal.target_world)
+
+        # ne pas précharger plus de cartes que le cache ne peut en garder avec la carte actuelle
+        self.maps.prefetch(targets[:max(self.maps.max_maps - 1, 0)])
 
     def get_map(self):
         """
@@ -258,7 +526,7 @@ class MapManager:
 
         >>> object = map_manager.get_object("player")  # Ceci récupérera l'objet nommé "player" de la carte actuelle
         """
-        return self.get_map().tmx_data.get_object_by_name(name)
+        return self.get_map().objects[name]
 
     def teleport_npcs(self):
         """
@@ -268,13 +536,156 @@ class MapManager:
 
         >>> map_manager.teleport_npcs()  # Ceci téléportera tous les NPCs à leurs points de spawn respectifs
         """
-        for map in self.maps:
-            map_data = self.maps[map]
-            npcs = map_data.npcs
-
+        for map_data in self.maps.values():
+            # carte découpée : aussi les NPCs hors des blocs simulés, qui peuvent y revenir
+            npcs = map_data.npcs if map_data.stream is None else self.map_definitions[map_data.name][1]
             for npc in npcs:
-                npc.load_points(map_data.tmx_data) # Charger les points du npc par rapport à son monde
                 npc.teleport_spawn()
+            if map_data.stream is not None:
+                self._place_npcs(map_data)
+
+    def snapshot(self):
+        """
+        Garde l'état de la partie : carte actuelle, position et points de vie du joueur, état de chaque NPC.
+
+        :return: (GameSnapshot) L'état de la partie.
+
+        >>> snapshot = map_manager.snapshot()  # Ceci gardera l'état de la partie pour le restaurer plus tard
+        """
+        # Les NPCs d'une carte pas encore chargée (ou en cours de préchargement) n'ont pas encore de place :
+        # ils seront remis au point current_point de leur chemin
+        loaded = {map.name for map in self.maps.values()}
+
+        npcs = dict()
+        for name, (portals, map_npcs) in self.map_definitions.items():
+            npcs[name] = tuple(
+                NPCSnapshot(tuple(npc.position) if name in loaded else None, npc.hp, npc.killed, npc.current_point)
+                for npc in map_npcs)
+        return GameSnapshot(self.current_map, PlayerSnapshot(tuple(self.player.position), self.player.hp), npcs)
+
+    def restore(self, snapshot):
+        """
+        Remet la partie dans l'état d'un snapshot, sans recharger les cartes : les cartes en mémoire, leurs rendus
+        et les sprites sont réutilisés.
+
+        :param snapshot: (GameSnapshot) L'état à restaurer, donné par snapshot().
+        :return: None
+
+        >>> map_manager.restore(snapshot)  # Ceci remettra le joueur et les NPCs dans l'état du snapshot
+        """
+        self.maps.wait_prefetch()  # une carte en cours de préchargement place encore ses NPCs
+        loaded = {map.name: map for map in self.maps.values()}
+
+        for name, states in snapshot.npcs.items():
+            if name not in self.map_definitions:
+                continue  # carte qui n'existe plus dans cette version du jeu
+            map = loaded.get(name)
+            for npc, state in zip(self.map_definitions[name][1], states):
+                npc.hp = state.hp
+                npc.killed = state.killed
+                npc.current_point = state.current_point
+                npc.route = None
+                npc.lag = 0.0  # la position restaurée est déjà à jour
+                npc.speed = NPC_SPEED
+                npc.reset_animation()
+                if state.position is not None:
+                    npc.position[0], npc.position[1] = state.position
+                    npc.save_location()
+                    npc.save_previous_position()
+                elif npc.points:
+                    npc.teleport_spawn()  # chemin chargé après le snapshot : retour au point du snapshot
+                npc.update()
+
+                # Les cartes pas encore en mémoire ajouteront leurs NPCs vivants à leur chargement
+                if map is not None and map.stream is None:
+                    if npc.killed:
+                        map.group.remove(npc)
+                    elif npc not in map.group:
+                        map.group.add(npc)
+
+        player = self.player
+        player.hp = snapshot.player.hp
+        player.reset_animation()
+        player.position[0], player.position[1] = snapshot.player.position
+        player.save_location()
+        player.save_previous_position()
+        player.update()
+
+        self.current_map = snapshot.current_map
+        self.simulated_map = self.current_map # les NPCs sont déjà à leur place : rien à rattraper
+        self.left_at.clear()
+        for map in loaded.values():
+            if map.stream is not None:
+                map.stream.parked.clear()  # les NPCs restaurés n'ont rien à rattraper
+                map.npcs.clear()
+                if map.name == self.current_map:
+                    map.stream.ensure(*player.rect.center)
+                self._follow_stream(map)
+        self.get_map().triggers.reset(player.feet)
+        self.prefetch_neighbours()
+
+    def player_flow_field(self):
+        """
+        Donne le champ de directions vers la tuile du joueur sur la carte actuelle, partagé par tous les NPCs qui le
+        poursuivent ; il n'est recalculé que quand le joueur change de tuile.
+
+        :return: (FlowField) Le champ de directions vers le joueur.
+
+        >>> field = map_manager.player_flow_field()
+        >>> npc.chase(field, 1 / 60)  # Ceci fera avancer le NPC vers le joueur en contournant les murs
+        """
+        pathfinder = self.get_map().pathfinder
+        return pathfinder.flow_field(pathfinder.tile_at(*self.player.feet.center))
+
+    def entities(self):
+        """
+        Donne les sprites de la carte actuelle simulés un par un : le joueur et les NPCs. Les sprites des figurants
+        sont aussi dans le groupe pour être dessinés, mais c'est leur Crowd qui les simule.
+
+        :return: (list) Les entités de la carte actuelle.
+
+        >>> sprites = map_manager.entities()  # Ceci donnera le joueur et les NPCs de la carte actuelle
+        """
+        return [self.player] + [npc for npc in self.get_map().npcs if not npc.killed]
+
+    def save_previous_positions(self):
+        """
+        Enregistre la position de chaque sprite de la carte actuelle au début d'un tick.
+
+        :return: None
+
+        >>> map_manager.save_previous_positions()  # Ceci enregistrera la position de départ du tick de chaque sprite
+        """
+        map = self.get_map()
+        self.player.save_previous_position()
+        npcs = map.npcs
+        index = 0
+        while index < len(npcs):  # appelé à chaque tick : sans liste ni itérateur
+            if not npcs[index].killed:
+                npcs[index].save_previous_position()
+            index += 1
+        if map.crowd.count:
+            map.crowd.save_previous_positions()
+
+    def interpolate(self, alpha):
+        """
+        Place les sprites de la carte actuelle entre les deux derniers ticks pour le dessin.
+
+        :param alpha: (float) La part du tick suivant déjà écoulée ; 1 remet les sprites à leur position actuelle.
+        :return: None
+
+        >>> map_manager.interpolate(0.5)  # Ceci placera les sprites à mi-chemin entre les deux derniers ticks
+        """
+        map = self.get_map()
+        self.player.interpolate(alpha)
+        npcs = map.npcs
+        index = 0
+        while index < len(npcs):
+            if not npcs[index].killed:
+                npcs[index].interpolate(alpha)
+            index += 1
+        if map.crowd.count:
+            map.crowd.interpolate(alpha)
 
     def draw(self):
         """
@@ -284,22 +695,68 @@ class MapManager:
 
         >>> map_manager.draw()  # Ceci dessinera la carte actuelle
         """
+        profiler = frame_profiler  # nom local : aucun objet créé à chaque appel, voir update
         self.get_group().draw(self.screen)
+        profiler.mark("group.draw")
         self.get_group().center(self.player.rect.center) # Centrer sur le joueur
+        profiler.mark("group.center")
 
-    def update(self):
+    def follow_current_map(self, dt):
         """
-        Met à jour le groupe de la carte actuelle et vérifie les collisions.
+        Tient compte d'un changement de carte depuis le tick précédent : la carte quittée garde l'heure du départ,
+        et les NPCs de la nouvelle carte rattrapent le temps passé sans elle.
 
+        :param dt: (float) La durée d'un tick en secondes.
         :return: None
 
-        >>> map_manager.update()  # Ceci mettra à jour le groupe de la carte actuelle et vérifiera les collisions
+        >>> map_manager.follow_current_map(1 / 60)  # Ceci fera rattraper leur retard aux NPCs de la carte où arrive le joueur
         """
-        self.get_group().update()
-        self.check_collisions()
+        if self.current_map == self.simulated_map:
+            return
+        self.left_at[self.simulated_map] = self.clock
+        self.simulated_map = self.current_map
+        left_at = self.left_at.pop(self.current_map, None)
+        if left_at is not None:
+            self.scheduler.catch_up(self.get_map(), self.clock - left_at, dt)
+
+    def update(self, dt):
+        """
+        Met à jour le joueur et les NPCs de la carte actuelle et vérifie les collisions.
 
-        for npc in self.get_map().npcs:
-            npc.move()
+        Les NPCs proches de la caméra avancent à chaque tick, les autres moins souvent (voir ActivityScheduler).
+
+        :param dt: (float) La durée du tick en secondes.
+        :return: None
+
+        >>> map_manager.update(1 / 60)  # Ceci mettra à jour le groupe de la carte actuelle et vérifiera les collisions
+        """
+        # Mesuré avec update_allocations : frame_profiler.mark() sur le nom importé crée 64 octets par appel,
+        # profiler.mark() sur ce nom local n'en crée aucun
+        profiler = frame_profiler
+        self.player.update() # les NPCs mettent leur rectangle à jour quand ils bougent
+        map = self.get_map()
+        if map.stream is not None and map.stream.update(self.player.rect):
+            self._follow_stream(map)  # carte découpée : la fenêtre de blocs autour du joueur a avancé
+        profiler.mark("group.update")
+        self.check_collisions()
+        profiler.mark("check_collisions")
+
+        self.follow_current_map(dt)
+        map = self.get_map()
+        scheduler = self.scheduler
+        # world_view plutôt que group.view, qui en renvoie une copie à chaque appel
+        scheduler.update(map.npcs, map.group.world_view, dt, map.pathfinder, map.wall_index)
+        profiler.set_counter("npcs.active", scheduler.counts[ACTIVE])
+        profiler.set_counter("npcs.reduced", scheduler.counts[REDUCED])
+        profiler.set_counter("npcs.dormant", scheduler.counts[DORMANT])
+        profiler.set_counter("npcs.moved", scheduler.moved)
+        profiler.mark("npc.move")
+
+        if map.crowd.count:
+            map.crowd.update(dt, self.player.rect)
+            map.crowd.sync(map.group, map.group.world_view)
+        profiler.mark("crowd")
+        self.clock += dt
 
 if __name__ == "__main__":
     import doctest
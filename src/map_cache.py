@@ -0,0 +1,224 @@
+import threading
+from collections import OrderedDict, deque
+
+
+class MapCache:
+    """
+    Classe MapCache qui garde en mémoire les cartes chargées, dans la limite d'un nombre de cartes
+    et d'un budget mémoire, en libérant d'abord les cartes utilisées le moins récemment (LRU).
+
+    Les cartes peuvent être préchargées en arrière-plan par un thread.
+
+    :param loader: (function) La fonction qui charge une carte à partir de son nom.
+    :param max_maps: (int) Le nombre maximal de cartes gardées en mémoire.
+    :param memory_budget: (int) La mémoire maximale (en octets) occupée par les cartes, None pour ne pas la limiter.
+    :param sizeof: (function) La fonction qui estime la mémoire (en octets) occupée par une carte.
+    :param on_evict: (function) La fonction appelée avec chaque carte libérée.
+    :return: None
+    :CU: max_maps >= 1
+
+    >>> cache = MapCache(lambda name: name.upper(), max_maps=2)
+    >>> cache["world"], cache["dungeon"], cache["dungeon_2"]
+    ('WORLD', 'DUNGEON', 'DUNGEON_2')
+    >>> list(cache)
+    ['dungeon', 'dungeon_2']
+    """
+
+    def __init__(self, loader, max_maps=3, memory_budget=None, sizeof=None, on_evict=None):
+        """
+        Initialise un cache de cartes vide.
+
+        :param loader: (function) La fonction qui charge une carte à partir de son nom.
+        :param max_maps: (int) Le nombre maximal de cartes gardées en mémoire.
+        :param memory_budget: (int) La mémoire maximale (en octets) occupée par les cartes, None pour ne pas la limiter.
+        :param sizeof: (function) La fonction qui estime la mémoire (en octets) occupée par une carte.
+        :param on_evict: (function) La fonction appelée avec chaque carte libérée.
+        :return: None
+        """
+        self.loader = loader
+        self.max_maps = max_maps
+        self.memory_budget = memory_budget
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+
+        self._maps = OrderedDict()  # nom -> carte, de la moins récemment utilisée à la plus récente
+        self._sizes = dict()        # nom -> mémoire estimée de la carte
+        self._loading = dict()      # nom -> threading.Event des cartes en cours de chargement
+        self._active = None         # carte demandée en dernier, jamais libérée
+        self._lock = threading.RLock()
+
+        self._pending = deque()     # cartes à précharger
+        self._worker = None         # thread de préchargement
+
+    def __getitem__(self, name):
+        """
+        Récupère une carte, en la chargeant si elle n'est pas en mémoire.
+
+        :param name: (str) Le nom de la carte.
+        :return: (Map) La carte.
+        :CU: type(name) == str
+
+        >>> world = cache["world"]  # Ceci récupérera (et chargera si besoin) la carte "world"
+        """
+        return self.get(name, activate=True)
+
+    def __contains__(self, name):
+        """
+        Indique si une carte est en mémoire.
+
+        :param name: (str) Le nom de la carte.
+        :return: (bool) True si la carte est chargée.
+        """
+        return name in self._maps
+
+    def __iter__(self):
+        """
+        Parcourt les noms des cartes en mémoire.
+
+        :return: (iterator) Les noms des cartes chargées.
+        """
+        with self._lock:
+            return iter(list(self._maps))
+
+    def __len__(self):
+        """
+        Compte les cartes en mémoire.
+
+        :return: (int) Le nombre de cartes chargées.
+        """
+        return len(self._maps)
+
+    def values(self):
+        """
+        Récupère les cartes en mémoire.
+
+        :return: (list) Les cartes chargées.
+        """
+        with self._lock:
+            return list(self._maps.values())
+
+    def memory_usage(self):
+        """
+        Estime la mémoire occupée par les cartes chargées.
+
+        :return: (int) La mémoire estimée, en octets.
+        """
+        return sum(self._sizes.values())
+
+    def get(self, name, activate=False):
+        """
+        Récupère une carte, en la chargeant si elle n'est pas en mémoire.
+
+        Si la carte est en cours de préchargement, attend la fin du chargement au lieu de la charger une deuxième fois.
+
+        :param name: (str) Le nom de la carte.
+        :param activate: (bool) True si la carte devient la carte active, qui ne peut pas être libérée.
+        :return: (Map) La carte.
+        :CU: type(name) == str
+        """
+        while True:
+            # acquire et release plutôt que with, qui crée des objets à chaque appel : get est appelé à chaque tick
+            self._lock.acquire()
+            try:
+                if name in self._maps:
+                    self._maps.move_to_end(name)
+                    if activate:
+                        self._active = name
+                    return self._maps[name]
+
+                event = self._loading.get(name)
+                if event is None:
+                    event = self._loading[name] = threading.Event()
+                    break
+            finally:
+                self._lock.release()
+
+            # Une autre thread charge déjà cette carte : attendre puis réessayer
+            event.wait()
+
+        try:
+            map = self.loader(name)
+            with self._lock:
+                self._maps[name] = map
+                self._sizes[name] = self.sizeof(map) if self.sizeof else 0
+                if activate:
+                    self._active = name
+                self._evict()
+            return map
+        finally:
+            with self._lock:
+                del self._loading[name]
+            event.set()
+
+    def prefetch(self, names):
+        """
+        Précharge des cartes en arrière-plan, sans bloquer le jeu.
+
+        :param names: (list) Les noms des cartes à précharger.
+        :return: None
+
+        >>> cache.prefetch(["dungeon"])  # Ceci chargera la carte "dungeon" dans un thread
+        """
+        with self._lock:
+            for name in names:
+                if name not in self._maps and name not in self._pending:
+                    self._pending.append(name)
+
+            if self._pending and self._worker is None:
+                self._worker = threading.Thread(target=self._prefetch_worker, daemon=True)
+                self._worker.start()
+
+    def wait_prefetch(self):
+        """
+        Attend la fin du préchargement en cours.
+
+        :return: None
+        """
+        worker = self._worker
+        if worker is not None:
+            worker.join()
+
+    def _prefetch_worker(self):
+        """
+        Charge les cartes en attente une par une, puis s'arrête quand il n'y en a plus.
+
+        :return: None
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._worker = None
+                    return
+                name = self._pending.popleft()
+
+            try:
+                self.get(name)
+            except Exception as error:  # la carte sera chargée (et l'erreur levée) à la demande
+                print(f"Avertissement : préchargement de la carte {name} impossible : {error}")
+
+    def _evict(self):
+        """
+        Libère les cartes les moins récemment utilisées tant que les limites sont dépassées.
+
+        :return: None
+        """
+        while len(self._maps) > 1:
+            over_count = len(self._maps) > self.max_maps
+            over_budget = self.memory_budget is not None and self.memory_usage() > self.memory_budget
+            if not (over_count or over_budget):
+                return
+
+            # la moins récemment utilisée, sauf la carte active
+            name = next((name for name in self._maps if name != self._active), None)
+            if name is None:
+                return
+
+            map = self._maps.pop(name)
+            del self._sizes[name]
+            if self.on_evict:
+                self.on_evict(map)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
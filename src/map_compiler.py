@@ -0,0 +1,531 @@
+from dataclasses import dataclass
+import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import time
+from xml.etree import ElementTree
+
+import pygame, pytmx, pyscroll
+from pytmx.util_pygame import pygame_image_loader
+
+# Définir le répertoire de base du projet
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, '.cache', 'maps')
+
+# Format du fichier compilé (petit-boutiste) :
+#   en-tête, sources, images, objets, calques, chaînes, puis les tuiles de chaque calque (uint32 alignés)
+MAGIC = b"RPGMAP"
+VERSION = 2  # 2 : les images des tilesets sont aussi des sources
+HEADER = struct.Struct("<6sHIIHHHHIII20s")  # magic, version, largeur, hauteur, taille des tuiles, nombre de sources, de calques, d'images, d'objets, taille des chaînes, empreinte
+SOURCE = struct.Struct("<iqQ")              # chemin, mtime (ns), taille
+IMAGE = struct.Struct("<iiHHHHB")           # fichier, colorkey, x, y, largeur, hauteur, retournements
+OBJECT = struct.Struct("<iidddd")           # nom, type, x, y, largeur, hauteur
+LAYER = struct.Struct("<iBI")               # nom, drapeaux, position des tuiles
+LAYER_VISIBLE = 1
+LAYER_TILES = 2
+NO_STRING = -1
+
+
+@dataclass
+class MapObject:
+    """
+    Classe MapObject qui représente un objet nommé d'une carte compilée (mur, portail, point de chemin...).
+
+    Elle a les mêmes attributs que pytmx.TiledObject pour pouvoir la remplacer.
+
+    :param name: (str) Le nom de l'objet, None s'il n'en a pas.
+    :param type: (str) Le type de l'objet ("collision"...), None s'il n'en a pas.
+    :param x: (float) La position x de l'objet.
+    :param y: (float) La position y de l'objet.
+    :param width: (float) La largeur de l'objet.
+    :param height: (float) La hauteur de l'objet.
+    :return: None
+
+    >>> MapObject(name="player", type=None, x=160.0, y=608.0, width=0.0, height=0.0).name
+    'player'
+    """
+    name: str
+    type: str
+    x: float
+    y: float
+    width: float
+    height: float
+
+
+@dataclass
+class CompiledLayer:
+    """
+    Classe CompiledLayer qui représente un calque d'une carte compilée.
+
+    :param name: (str) Le nom du calque.
+    :param visible: (bool) True si le calque est affiché.
+    :param data: (memoryview) Les tuiles du calque ligne par ligne, None pour un calque d'objets.
+    :return: None
+    """
+    name: str
+    visible: bool
+    data: memoryview
+
+
+class CompiledMap:
+    """
+    Classe CompiledMap qui lit une carte compilée projetée en mémoire (mmap).
+
+    Elle offre les attributs de pytmx.TiledMap utilisés par le jeu (objects, images, get_object_by_name...).
+
+    :param path: (str) Le chemin du fichier compilé.
+    :param map_dir: (str) Le dossier du fichier tmx d'origine, pour retrouver les images des tuiles.
+    :return: None
+    :CU: os.path.exists(path)
+
+    >>> tmx_data = CompiledMap(compiled_path("world"), os.path.join(BASE_DIR, 'map'))  # Ceci lira la carte "world" compilée
+    """
+
+    def __init__(self, path, map_dir):
+        """
+        Projette le fichier compilé en mémoire et lit ses tables.
+
+        :param path: (str) Le chemin du fichier compilé.
+        :param map_dir: (str) Le dossier du fichier tmx d'origine.
+        :return: None
+        """
+        self.filename = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+
+        (magic, version, self.width, self.height, self.tilewidth, self.tileheight,
+         n_sources, n_layers, n_images, n_objects, strings_size, self.source_hash) = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"fichier de carte compilée invalide : {path}")
+
+        offset = HEADER.size
+        sources = [SOURCE.unpack_from(buffer, offset + i * SOURCE.size) for i in range(n_sources)]
+        offset += n_sources * SOURCE.size
+        images = [IMAGE.unpack_from(buffer, offset + i * IMAGE.size) for i in range(n_images)]
+        offset += n_images * IMAGE.size
+        objects = [OBJECT.unpack_from(buffer, offset + i * OBJECT.size) for i in range(n_objects)]
+        offset += n_objects * OBJECT.size
+        layers = [LAYER.unpack_from(buffer, offset + i * LAYER.size) for i in range(n_layers)]
+        offset += n_layers * LAYER.size
+        strings = bytes(buffer[offset:offset + strings_size]).decode("utf-8").split("\0")
+
+        def string(index):
+            return None if index == NO_STRING else strings[index]
+
+        self.sources = [(string(path_index), mtime, size) for path_index, mtime, size in sources]
+        self.objects = [MapObject(string(name), string(type), x, y, width, height)
+                        for name, type, x, y, width, height in objects]
+        self.objects_by_name = {object.name: object for object in self.objects if object.name}
+
+        tile_count = self.width * self.height
+        self.layers = []
+        for name, flags, data_offset in layers:
+            data = None
+            if flags & LAYER_TILES:
+                data = buffer[data_offset:data_offset + 4 * tile_count].cast("I")
+            self.layers.append(CompiledLayer(string(name), bool(flags & LAYER_VISIBLE), data))
+        self.visible_tile_layers = [index for index, layer in enumerate(self.layers)
+                                    if layer.visible and layer.data is not None]
+
+        self.images = self._load_images(images, map_dir, string)
+
+    @staticmethod
+    def _load_images(images, map_dir, string):
+        """
+        Découpe les images des tuiles dans les images des tilesets, chacune chargée une seule fois.
+
+        :param images: (list) La table des images du fichier compilé.
+        :param map_dir: (str) Le dossier du fichier tmx d'origine.
+        :param string: (function) La fonction qui renvoie une chaîne à partir de son indice.
+        :return: (list) Les images des tuiles, indexées par gid (None pour le gid 0).
+        """
+        loaders = dict()  # (fichier, colorkey) -> fonction de pytmx qui découpe les tuiles
+        result = []
+        for file_index, colorkey_index, x, y, width, height, flip in images:
+            if file_index == NO_STRING:
+                result.append(None)
+                continue
+
+            key = (string(file_index), string(colorkey_index))
+            if key not in loaders:
+                loaders[key] = pygame_image_loader(os.path.join(map_dir, key[0]), key[1])
+
+            rect = (x, y, width, height) if width and height else None
+            flags = pytmx.TileFlags(bool(flip & 1), bool(flip & 2), bool(flip & 4)) if flip else None
+            result.append(loaders[key](rect, flags))
+        return result
+
+    def get_object_by_name(self, name):
+        """
+        Récupère un objet de la carte par son nom.
+
+        :param name: (str) Le nom de l'objet.
+        :return: (MapObject) L'objet trouvé.
+        :CU: type(name) == str
+
+        >>> tmx_data.get_object_by_name("player")  # Ceci récupérera l'objet nommé "player"
+        """
+        return self.objects_by_name[name]
+
+    def get_tile_gid(self, x, y, layer):
+        """
+        Récupère le gid de la tuile à une position.
+
+        :param x: (int) La colonne de la tuile.
+        :param y: (int) La ligne de la tuile.
+        :param layer: (int) L'indice du calque.
+        :return: (int) Le gid de la tuile, 0 si la case est vide.
+        """
+        return self.layers[layer].data[y * self.width + x]
+
+    def get_tile_image(self, x, y, layer):
+        """
+        Récupère l'image de la tuile à une position.
+
+        :param x: (int) La colonne de la tuile.
+        :param y: (int) La ligne de la tuile.
+        :param layer: (int) L'indice du calque.
+        :return: (pygame.Surface) L'image de la tuile, None si la case est vide.
+        """
+        return self.images[self.get_tile_gid(x, y, layer)]
+
+
+class CompiledMapData(pyscroll.data.PyscrollDataAdapter):
+    """
+    Classe CompiledMapData qui fournit les tuiles d'une carte compilée au rendu de pyscroll.
+
+    :param tmx_data: (CompiledMap) La carte compilée.
+    :return: None
+    :CU: isinstance(tmx_data, CompiledMap)
+
+    >>> map_data = CompiledMapData(tmx_data)  # Ceci préparera la carte compilée pour pyscroll
+    """
+
+    def __init__(self, tmx_data):
+        """
+        Initialise l'adaptateur (les cartes compilées n'ont pas de tuiles animées).
+
+        :param tmx_data: (CompiledMap) La carte compilée.
+        :return: None
+        """
+        super().__init__()
+        self.tmx = tmx_data
+        self.reload_animations()
+
+    def reload_data(self):
+        pass
+
+    def get_animations(self):
+        return iter(())
+
+    @property
+    def tile_size(self):
+        return self.tmx.tilewidth, self.tmx.tileheight
+
+    @property
+    def map_size(self):
+        return self.tmx.width, self.tmx.height
+
+    @property
+    def visible_tile_layers(self):
+        return self.tmx.visible_tile_layers
+
+    def _get_tile_image(self, x, y, l):
+        if 0 <= x < self.tmx.width and 0 <= y < self.tmx.height:
+            return self.tmx.get_tile_image(x, y, l)
+        return None
+
+    def _get_tile_image_by_id(self, id):
+        return self.tmx.images[id]
+
+    def get_tile_images_by_rect(self, rect, layers=None):
+        # layers : ne parcourir que ces calques (voir rendering.ChunkedRenderer), tous les calques visibles par défaut
+        x1, y1, x2, y2 = pyscroll.common.rect_to_bb(rect)
+        width = self.tmx.width
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, width - 1), min(y2, self.tmx.height - 1)
+        images = self.tmx.images
+        tile_layers = self.tmx.layers
+
+        for l in self.tmx.visible_tile_layers if layers is None else layers:
+            data = tile_layers[l].data
+            for y in range(y1, y2 + 1):
+                row = y * width
+                for x, gid in enumerate(data[row + x1:row + x2 + 1], x1):
+                    if gid:
+                        tile = images[gid]
+                        if tile:
+                            yield x, y, l, tile
+
+
+def _recording_image_loader(filename, colorkey, **kwargs):
+    """
+    Remplace le chargeur d'images de pytmx pendant la compilation : au lieu de charger les images,
+    il renvoie la description de chaque tuile (fichier, colorkey, rectangle, retournements).
+
+    :param filename: (str) Le chemin de l'image du tileset.
+    :param colorkey: (str) La couleur transparente du tileset, None s'il n'y en a pas.
+    :return: (function) La fonction qui décrit une tuile.
+    """
+    def load_image(rect=None, flags=None):
+        return filename, colorkey, rect, flags
+
+    return load_image
+
+
+def compiled_path(name):
+    """
+    Donne le chemin du fichier compilé d'une carte.
+
+    :param name: (str) Le nom de la carte.
+    :return: (str) Le chemin du fichier compilé.
+
+    >>> os.path.basename(compiled_path("world"))
+    'world.rpgmap'
+    """
+    return os.path.join(CACHE_DIR, f"{name}.rpgmap")
+
+
+def _sources_hash(paths):
+    """
+    Calcule l'empreinte du contenu des fichiers sources d'une carte.
+
+    :param paths: (list) Les chemins des fichiers sources.
+    :return: (bytes) L'empreinte SHA-1 (20 octets).
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.digest()
+
+
+def compile_map(tmx_path, output_path):
+    """
+    Compile un fichier tmx en fichier binaire : tuiles de chaque calque, table des images, objets nommés et murs.
+
+    :param tmx_path: (str) Le chemin du fichier tmx.
+    :param output_path: (str) Le chemin du fichier compilé à écrire.
+    :return: None
+    :CU: os.path.exists(tmx_path)
+
+    >>> compile_map(os.path.join(BASE_DIR, 'map', 'world.tmx'), compiled_path("world"))  # Ceci compilera la carte "world"
+    """
+    tmx_data = pytmx.TiledMap(tmx_path, image_loader=_recording_image_loader)
+    if any(properties.get("frames") for properties in tmx_data.tile_properties.values()):
+        raise ValueError("les tuiles animées ne sont pas prises en charge par les cartes compilées")
+
+    map_dir = os.path.dirname(tmx_path)
+    strings = dict()
+
+    def string(value):
+        if value is None:
+            return NO_STRING
+        return strings.setdefault(str(value), len(strings))
+
+    # Sources : le tmx, les tilesets externes (tsx) qui définissent la découpe des tuiles et leurs images
+    sources = [tmx_path]
+    for tileset in ElementTree.parse(tmx_path).getroot().iter("tileset"):
+        source = tileset.get("source", "")
+        if source.lower().endswith(".tsx"):
+            sources.append(os.path.join(map_dir, source))
+    for image in tmx_data.images:
+        if image is not None and os.path.normpath(image[0]) not in sources:
+            sources.append(os.path.normpath(image[0]))
+    source_table = b"".join(SOURCE.pack(string(os.path.relpath(path, map_dir)),
+                                        os.stat(path).st_mtime_ns, os.stat(path).st_size)
+                            for path in sources)
+
+    image_table = bytearray()
+    for image in tmx_data.images:
+        if image is None:
+            image_table += IMAGE.pack(NO_STRING, NO_STRING, 0, 0, 0, 0, 0)
+            continue
+        filename, colorkey, rect, flags = image
+        x, y, width, height = rect if rect else (0, 0, 0, 0)
+        flip = 0
+        if flags:
+            flip = flags.flipped_horizontally | flags.flipped_vertically << 1 | flags.flipped_diagonally << 2
+        image_table += IMAGE.pack(string(os.path.relpath(filename, map_dir)), string(colorkey),
+                                  x, y, width, height, flip)
+
+    object_table = b"".join(OBJECT.pack(string(object.name), string(object.type),
+                                        object.x, object.y, object.width, object.height)
+                            for object in tmx_data.objects)
+
+    tile_layers = []
+    layer_entries = []
+    for layer in tmx_data.layers:
+        flags = LAYER_VISIBLE if layer.visible else 0
+        if isinstance(layer, pytmx.TiledTileLayer):
+            flags |= LAYER_TILES
+            data = array.array("I", (gid for row in layer.data for gid in row))
+            if sys.byteorder != "little":
+                data.byteswap()
+            tile_layers.append(data)
+        layer_entries.append((string(layer.name), flags))
+
+    strings_data = "\0".join(strings).encode("utf-8")
+
+    # Les tuiles commencent après toutes les tables, alignées sur 4 octets
+    tables_size = (HEADER.size + len(source_table) + len(image_table) + len(object_table)
+                   + len(layer_entries) * LAYER.size + len(strings_data))
+    padding = -tables_size % 4
+    data_offset = tables_size + padding
+    layer_table = bytearray()
+    for name, flags in layer_entries:
+        layer_table += LAYER.pack(name, flags, data_offset if flags & LAYER_TILES else 0)
+        if flags & LAYER_TILES:
+            data_offset += 4 * tmx_data.width * tmx_data.height
+
+    header = HEADER.pack(MAGIC, VERSION, tmx_data.width, tmx_data.height,
+                         tmx_data.tilewidth, tmx_data.tileheight,
+                         len(sources), len(layer_entries), len(tmx_data.images),
+                         len(object_table) // OBJECT.size, len(strings_data), _sources_hash(sources))
+
+    # Écrire dans un fichier temporaire puis le renommer, pour ne jamais laisser un fichier à moitié écrit
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temporary_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        for part in (header, source_table, image_table, object_table, layer_table, strings_data, b"\0" * padding):
+            file.write(part)
+        for data in tile_layers:
+            file.write(data.tobytes())
+    os.replace(temporary_path, output_path)
+
+
+def is_up_to_date(tmx_data, map_dir):
+    """
+    Vérifie qu'une carte compilée correspond encore à ses fichiers sources.
+
+    Les dates de modification sont comparées d'abord ; si elles ont changé, c'est le contenu qui décide. Un fichier
+    touché sans être modifié n'est relu qu'une fois : ses nouvelles dates sont gardées dans la carte compilée.
+
+    :param tmx_data: (CompiledMap) La carte compilée.
+    :param map_dir: (str) Le dossier du fichier tmx d'origine.
+    :return: (bool) True si la carte compilée est à jour.
+    """
+    paths = []
+    stats = []
+    unchanged = True
+    for path, mtime, size in tmx_data.sources:
+        path = os.path.join(map_dir, path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        unchanged = unchanged and stat.st_mtime_ns == mtime and stat.st_size == size
+        paths.append(path)
+        stats.append(stat)
+
+    if unchanged:
+        return True
+    if _sources_hash(paths) != tmx_data.source_hash:
+        return False
+    _store_source_stats(tmx_data, stats)
+    return True
+
+
+def _store_source_stats(tmx_data, stats):
+    """
+    Réécrit sur place les dates et les tailles des sources d'une carte compilée restée à jour.
+
+    :param tmx_data: (CompiledMap) La carte compilée.
+    :param stats: (list) Le résultat de os.stat pour chaque source, dans l'ordre de tmx_data.sources.
+    :return: None
+    """
+    try:
+        with open(tmx_data.filename, "r+b") as file:
+            for index, stat in enumerate(stats):
+                offset = HEADER.size + index * SOURCE.size
+                path_index = SOURCE.unpack_from(tmx_data._mmap, offset)[0]
+                file.seek(offset)
+                file.write(SOURCE.pack(path_index, stat.st_mtime_ns, stat.st_size))
+    except OSError:
+        pass  # fichier en lecture seule : la carte reste utilisable, son contenu sera relu au prochain lancement
+
+
+def load_compiled_map(tmx_path, name):
+    """
+    Charge la version compilée d'une carte, en la (re)compilant si elle manque ou n'est plus à jour.
+
+    :param tmx_path: (str) Le chemin du fichier tmx.
+    :param name: (str) Le nom de la carte.
+    :return: (CompiledMap) La carte compilée, None si elle ne peut pas être utilisée (il faut alors lire le tmx).
+    :CU: os.path.exists(tmx_path)
+
+    >>> tmx_data = load_compiled_map(os.path.join(BASE_DIR, 'map', 'world.tmx'), "world")  # Ceci chargera "world" sans relire le XML
+    """
+    if sys.byteorder != "little":
+        return None
+
+    path = compiled_path(name)
+    map_dir = os.path.dirname(tmx_path)
+    try:
+        if os.path.exists(path):
+            try:
+                tmx_data = CompiledMap(path, map_dir)
+            except (ValueError, struct.error):
+                tmx_data = None  # ancienne version du format ou fichier abîmé : recompilé ci-dessous
+            if tmx_data is not None:
+                if is_up_to_date(tmx_data, map_dir):
+                    return tmx_data
+                del tmx_data  # libérer la projection avant de remplacer le fichier
+
+        compile_map(tmx_path, path)
+        return CompiledMap(path, map_dir)
+    except (OSError, ValueError, struct.error) as error:
+        print(f"Avertissement : carte compilée {name} inutilisable, lecture du tmx : {error}")
+        return None
+
+
+def benchmark(names, repeat=5):
+    """
+    Compare le temps de chargement de chaque carte depuis le tmx et depuis le fichier compilé.
+
+    :param names: (list) Les noms des cartes à mesurer.
+    :param repeat: (int) Le nombre de mesures par carte (la meilleure est gardée).
+    :return: None
+
+    >>> benchmark(["world", "dungeon", "dungeon_2"])  # Ceci affichera les temps de chargement avant et après
+    """
+    map_dir = os.path.join(BASE_DIR, 'map')
+    print(f"{'carte':<12} {'tmx (ms)':>10} {'compilée (ms)':>14}")
+    for name in names:
+        tmx_path = os.path.join(map_dir, f"{name}.tmx")
+        compile_map(tmx_path, compiled_path(name))
+
+        timings = []
+        for load in (lambda: pytmx.util_pygame.load_pygame(tmx_path),
+                     lambda: load_compiled_map(tmx_path, name)):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                load()
+                best = min(best, time.perf_counter() - start)
+            timings.append(best * 1000)
+        print(f"{name:<12} {timings[0]:>10.1f} {timings[1]:>14.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile les cartes tmx en fichiers binaires.")
+    parser.add_argument("maps", nargs="*", default=["world", "dungeon", "dungeon_2"], help="cartes à compiler")
+    parser.add_argument("--benchmark", action="store_true", help="compare les temps de chargement tmx / compilé")
+    arguments = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    if arguments.benchmark:
+        benchmark(arguments.maps)
+    else:
+        for name in arguments.maps:
+            compile_map(os.path.join(BASE_DIR, 'map', f'{name}.tmx'), compiled_path(name))
+            print(f"{name} -> {compiled_path(name)}")
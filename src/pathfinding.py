@@ -0,0 +1,451 @@
+import heapq
+from collections import OrderedDict, deque
+
+import numpy as np
+import pygame
+
+# Déplacements d'une tuile à sa voisine (colonne, ligne) : les entités ne se déplacent que sur les quatre axes
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))  # haut, bas, gauche, droite
+UNREACHABLE = -1
+FEET_SIZE = (12, 8)  # place laissée autour du centre des tuiles : les pieds d'un NPC (voir Entity.feet)
+
+
+class FlowField:
+    """
+    Classe FlowField qui donne, depuis chaque tuile d'une carte, la tuile suivante sur le plus court chemin vers une cible.
+
+    Le champ est calculé une seule fois pour une tuile cible ; ensuite, chaque entité qui va vers cette cible
+    n'a plus qu'à lire sa case : cent entités qui poursuivent le joueur coûtent un seul calcul.
+
+    :param goal: (tuple) La tuile cible (colonne, ligne).
+    :param distance: (numpy.ndarray) Le nombre de pas jusqu'à la cible depuis chaque tuile (lignes, colonnes), -1 si elle est inaccessible.
+    :param tile_width: (int) La largeur d'une tuile en pixels.
+    :param tile_height: (int) La hauteur d'une tuile en pixels.
+    :param origin: (tuple) La tuile (colonne, ligne) de la carte qui correspond à distance[0, 0].
+    :return: None
+
+    >>> from collision_grid import CollisionGrid
+    >>> grid = CollisionGrid.from_rects([(16, 0, 16, 32)], 3, 3, 16, 16)
+    >>> field = Pathfinder(grid).flow_field((2, 0))
+    >>> field.next_tile(0, 0), field.next_tile(0, 2), field.next_tile(1, 2)
+    ((0, 1), (1, 2), (2, 2))
+    """
+
+    def __init__(self, goal, distance, tile_width, tile_height, origin=(0, 0)):
+        """
+        Initialise le champ et calcule la direction à suivre depuis chaque tuile.
+
+        :param goal: (tuple) La tuile cible (colonne, ligne).
+        :param distance: (numpy.ndarray) Le nombre de pas jusqu'à la cible depuis chaque tuile, -1 si elle est inaccessible.
+        :param tile_width: (int) La largeur d'une tuile en pixels.
+        :param tile_height: (int) La hauteur d'une tuile en pixels.
+        :param origin: (tuple) La tuile (colonne, ligne) de la carte qui correspond à distance[0, 0].
+        :return: None
+        """
+        self.goal = goal
+        self.distance = distance
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.rows, self.columns = distance.shape
+        self.origin_column, self.origin_row = origin
+
+        # Distance de chaque voisine (inaccessible ou hors carte : très loin), puis la voisine la plus proche de la cible
+        far = np.iinfo(np.int32).max
+        padded = np.full((self.rows + 2, self.columns + 2), far, dtype=np.int32)
+        padded[1:-1, 1:-1] = np.where(distance >= 0, distance, far)
+        neighbours = np.stack([padded[1 + dy:self.rows + 1 + dy, 1 + dx:self.columns + 1 + dx]
+                               for dx, dy in DIRECTIONS])
+        self.step = neighbours.argmin(axis=0).astype(np.int8)  # indice dans DIRECTIONS
+        self.step[(distance <= 0) | (neighbours.min(axis=0) == far)] = -1  # cible atteinte ou inaccessible
+
+    def next_tile(self, column, row):
+        """
+        Donne la tuile suivante vers la cible.
+
+        :param column: (int) La colonne de la tuile de départ.
+        :param row: (int) La ligne de la tuile de départ.
+        :return: (tuple) La tuile suivante (colonne, ligne), None si la cible est atteinte ou inaccessible.
+        """
+        local_column, local_row = column - self.origin_column, row - self.origin_row
+        if not (0 <= local_column < self.columns and 0 <= local_row < self.rows):
+            return None
+        step = self.step[local_row, local_column]
+        if step < 0:
+            return None
+        dx, dy = DIRECTIONS[step]
+        return column + dx, row + dy
+
+    def next_point(self, x, y):
+        """
+        Donne le centre de la tuile suivante vers la cible, depuis un point en pixels.
+
+        :param x: (float) La position x en pixels.
+        :param y: (float) La position y en pixels.
+        :return: (tuple) Le centre (x, y) de la tuile suivante, None si la cible est atteinte ou inaccessible.
+        """
+        tile = self.next_tile(int(x) // self.tile_width, int(y) // self.tile_height)
+        if tile is None:
+            return None
+        return (tile[0] * self.tile_width + self.tile_width // 2, tile[1] * self.tile_height + self.tile_height // 2)
+
+
+class Pathfinder:
+    """
+    Classe Pathfinder qui cherche des chemins entre les tuiles libres d'une carte, en contournant les murs.
+
+    Les chemins (A*) et les champs de directions (FlowField) sont gardés dans des caches : une même recherche
+    n'est faite qu'une fois, jusqu'à ce qu'une tuile change (set_blocked) ou que les caches soient vidés (invalidate).
+
+    Une entité peut passer d'une tuile à sa voisine si des pieds de taille clearance, déplacés du centre de l'une
+    au centre de l'autre, ne touchent aucun mur. Les tuiles que la CollisionGrid dit libres ne touchent aucun mur :
+    seuls les passages autour des autres tuiles sont testés avec les rectangles exacts des murs (wall_index).
+    Sans wall_index, seules les tuiles libres de la grille sont utilisées.
+
+    Les tuiles sont toujours données en colonnes et lignes de la carte, même quand la grille n'en couvre qu'une partie
+    (CollisionGrid.origin) : les tableaux ne gardent que cette partie, et les tuiles hors de la grille sont inaccessibles.
+
+    :param collision_grid: (CollisionGrid) La grille des murs de la carte.
+    :param wall_index: (SpatialHash) Les rectangles des murs, pour tester les passages près des murs.
+    :param clearance: (tuple) La taille (largeur, hauteur) des pieds qui doivent passer.
+    :param max_paths: (int) Le nombre maximal de chemins gardés.
+    :param max_fields: (int) Le nombre maximal de champs de directions gardés.
+    :return: None
+
+    >>> from collision_grid import CollisionGrid
+    >>> grid = CollisionGrid.from_rects([(16, 0, 16, 32)], 3, 3, 16, 16)
+    >>> pathfinder = Pathfinder(grid)
+    >>> pathfinder.find_path((0, 0), (2, 0))
+    [(0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0)]
+    >>> pathfinder.find_path((0, 0), (1, 0)) is None
+    True
+    """
+
+    def __init__(self, collision_grid, wall_index=None, clearance=FEET_SIZE, max_paths=1024, max_fields=8):
+        """
+        Initialise la recherche et calcule les passages ouverts entre tuiles voisines.
+
+        :param collision_grid: (CollisionGrid) La grille des murs de la carte.
+        :param wall_index: (SpatialHash) Les rectangles des murs, None pour n'utiliser que les tuiles libres de la grille.
+        :param clearance: (tuple) La taille (largeur, hauteur) des pieds qui doivent passer.
+        :param max_paths: (int) Le nombre maximal de chemins gardés.
+        :param max_fields: (int) Le nombre maximal de champs de directions gardés.
+        :return: None
+        """
+        self.tile_width = collision_grid.tile_width
+        self.tile_height = collision_grid.tile_height
+        self.rows, self.columns = collision_grid.rows, collision_grid.columns
+        self.origin_column, self.origin_row = collision_grid.origin
+        self.wall_index = wall_index
+        self.clearance = clearance
+        self.max_paths = max_paths
+        self.max_fields = max_fields
+        self.paths = OrderedDict()   # (départ, arrivée) -> chemin, du moins récemment utilisé au plus récent
+        self.fields = OrderedDict()  # tuile cible -> FlowField
+        self.hits = 0
+        self.misses = 0
+
+        # Tuiles où les pieds tiennent, et passages ouverts : bit i de moves[ligne, colonne] pour DIRECTIONS[i]
+        self.walkable = ~collision_grid.blocked  # copie : les changements ne touchent pas la grille des collisions
+        self.moves = np.zeros((self.rows, self.columns), dtype=np.uint8)
+        free = np.zeros((self.rows + 2, self.columns + 2), dtype=bool)
+        free[1:-1, 1:-1] = self.walkable
+        for bit, (dx, dy) in enumerate(DIRECTIONS):
+            neighbour = free[1 + dy:self.rows + 1 + dy, 1 + dx:self.columns + 1 + dx]
+            self.moves |= ((self.walkable & neighbour).astype(np.uint8) << bit)
+        if wall_index is not None:
+            rows, columns = np.nonzero(collision_grid.blocked)
+            self._update_tiles(list(zip(columns.tolist(), rows.tolist())))
+        self._sync()
+
+    def tile_at(self, x, y):
+        """
+        Donne la tuile qui contient un point.
+
+        :param x: (float) La position x en pixels.
+        :param y: (float) La position y en pixels.
+        :return: (tuple) La tuile (colonne, ligne).
+        """
+        return int(x) // self.tile_width, int(y) // self.tile_height
+
+    def tile_center(self, tile):
+        """
+        Donne le centre d'une tuile en pixels.
+
+        :param tile: (tuple) La tuile (colonne, ligne).
+        :return: (tuple) Le centre (x, y).
+        """
+        return tile[0] * self.tile_width + self.tile_width // 2, tile[1] * self.tile_height + self.tile_height // 2
+
+    def feet_rect(self, tile):
+        """
+        Donne le rectangle des pieds d'une entité placée au centre d'une tuile.
+
+        :param tile: (tuple) La tuile (colonne, ligne).
+        :return: (pygame.Rect) Le rectangle des pieds.
+        """
+        rect = pygame.Rect((0, 0), self.clearance)
+        rect.center = self.tile_center(tile)
+        return rect
+
+    def _update_tiles(self, tiles):
+        """
+        Recalcule avec les rectangles exacts des murs si les pieds tiennent sur ces tuiles, et les passages vers leurs voisines.
+
+        :param tiles: (list) Les tuiles (colonne, ligne) à recalculer, dans les tableaux (sans origin).
+        :return: None
+        """
+        origin_column, origin_row = self.origin_column, self.origin_row
+        for column, row in tiles:
+            self.walkable[row, column] = not self.wall_index.collides(self.feet_rect((column + origin_column,
+                                                                                      row + origin_row)))
+        for column, row in tiles:
+            here = self.feet_rect((column + origin_column, row + origin_row))
+            for bit, (dx, dy) in enumerate(DIRECTIONS):
+                other = (column + dx, row + dy)
+                if not (0 <= other[0] < self.columns and 0 <= other[1] < self.rows):
+                    continue
+                back = bit ^ 1  # direction opposée : haut <-> bas, gauche <-> droite
+                opened = (self.walkable[row, column] and self.walkable[other[1], other[0]]
+                          and not self.wall_index.collides(
+                              here.union(self.feet_rect((other[0] + origin_column, other[1] + origin_row)))))
+                if opened:
+                    self.moves[row, column] |= 1 << bit
+                    self.moves[other[1], other[0]] |= 1 << back
+                else:
+                    self.moves[row, column] &= ~(1 << bit) & 0xFF
+                    self.moves[other[1], other[0]] &= ~(1 << back) & 0xFF
+
+    def _sync(self):
+        """
+        Prépare les données lues case par case par A* (listes Python, plus rapides à lire que NumPy) et oublie les caches.
+
+        :return: None
+        """
+        self._moves = self.moves.ravel().tolist()
+        self._components = None  # zones connexes, calculées à la première recherche
+        self.invalidate()
+
+    def is_walkable(self, tile):
+        """
+        Indique si une tuile est dans la carte et si les pieds d'une entité y tiennent.
+
+        :param tile: (tuple) La tuile (colonne, ligne).
+        :return: (bool) True si une entité peut se trouver sur la tuile.
+        """
+        column, row = tile[0] - self.origin_column, tile[1] - self.origin_row
+        return 0 <= column < self.columns and 0 <= row < self.rows and bool(self.walkable[row, column])
+
+    def set_blocked(self, tile, blocked=True):
+        """
+        Bloque ou libère une tuile (porte, obstacle déplacé...) et vide les caches, qui ne sont plus justes.
+
+        :param tile: (tuple) La tuile (colonne, ligne).
+        :param blocked: (bool) True pour bloquer la tuile, False pour la rendre aux murs de la carte.
+        :return: None
+
+        >>> pathfinder.set_blocked((1, 2))  # Ceci bloquera la tuile et oubliera les chemins déjà trouvés
+        """
+        column, row = tile[0] - self.origin_column, tile[1] - self.origin_row
+        if blocked:
+            self.walkable[row, column] = False
+            self.moves[row, column] = 0
+            for bit, (dx, dy) in enumerate(DIRECTIONS):
+                if 0 <= column + dx < self.columns and 0 <= row + dy < self.rows:
+                    self.moves[row + dy, column + dx] &= ~(1 << (bit ^ 1)) & 0xFF
+        elif self.wall_index is not None:
+            self._update_tiles([(column, row)])
+        else:
+            self.walkable[row, column] = True
+            for bit, (dx, dy) in enumerate(DIRECTIONS):
+                if self.is_walkable((tile[0] + dx, tile[1] + dy)):
+                    self.moves[row, column] |= 1 << bit
+                    self.moves[row + dy, column + dx] |= 1 << (bit ^ 1)
+        self._sync()
+
+    def invalidate(self):
+        """
+        Oublie tous les chemins et champs de directions déjà calculés.
+
+        :return: None
+        """
+        self.paths.clear()
+        self.fields.clear()
+
+    def _component_labels(self):
+        """
+        Numérote les zones connexes de la carte : deux tuiles de zones différentes ne sont reliées par aucun chemin.
+
+        :return: (list) Le numéro de zone de chaque tuile (ligne * colonnes + colonne), -1 si la tuile n'est pas accessible.
+        """
+        if self._components is not None:
+            return self._components
+
+        columns, moves = self.columns, self._moves
+        offsets = (-columns, columns, -1, 1)
+        labels = [-1] * len(moves)
+        walkable = self.walkable.ravel().tolist()
+        label = 0
+        for first in range(len(moves)):
+            if labels[first] >= 0 or not walkable[first]:
+                continue
+            labels[first] = label
+            queue = deque([first])
+            while queue:
+                index = queue.popleft()
+                bits = moves[index]
+                for bit in range(4):
+                    if bits & (1 << bit):
+                        other = index + offsets[bit]
+                        if labels[other] < 0:
+                            labels[other] = label
+                            queue.append(other)
+            label += 1
+        self._components = labels
+        return labels
+
+    def find_path(self, start, goal):
+        """
+        Cherche le plus court chemin entre deux tuiles libres avec A* (distance de Manhattan), ou le reprend du cache.
+
+        :param start: (tuple) La tuile de départ (colonne, ligne).
+        :param goal: (tuple) La tuile d'arrivée (colonne, ligne).
+        :return: (list) Les tuiles du chemin, départ et arrivée compris, None s'il n'y a pas de chemin.
+        """
+        key = (start, goal)
+        if key in self.paths:
+            self.hits += 1
+            self.paths.move_to_end(key)
+            path = self.paths[key]
+            return list(path) if path is not None else None
+
+        self.misses += 1
+        path = self._search(start, goal)
+        self.paths[key] = tuple(path) if path is not None else None
+        if len(self.paths) > self.max_paths:
+            self.paths.popitem(last=False)
+        return path
+
+    def _search(self, start, goal):
+        """
+        Recherche A* sur les tuiles, sans cache (voir find_path).
+
+        :param start: (tuple) La tuile de départ (colonne, ligne).
+        :param goal: (tuple) La tuile d'arrivée (colonne, ligne).
+        :return: (list) Les tuiles du chemin, None s'il n'y a pas de chemin.
+        """
+        if not self.is_walkable(start) or not self.is_walkable(goal):
+            return None
+
+        columns, moves = self.columns, self._moves
+        origin_column, origin_row = self.origin_column, self.origin_row
+        start_index = (start[1] - origin_row) * columns + start[0] - origin_column
+        goal_index = (goal[1] - origin_row) * columns + goal[0] - origin_column
+        labels = self._component_labels()
+        if labels[start_index] != labels[goal_index]:
+            return None  # zones séparées : inutile de parcourir toute la zone de départ
+        goal_column, goal_row = goal[0] - origin_column, goal[1] - origin_row
+        offsets = (-columns, columns, -1, 1)
+
+        came_from = {start_index: -1}
+        cost = {start_index: 0}
+        # À estimation égale, la tuile la plus avancée d'abord (coût négatif) : moins de tuiles visitées
+        open_heap = [(abs(start[0] - goal[0]) + abs(start[1] - goal[1]), 0, start_index)]
+
+        while open_heap:
+            _, negative_cost, index = heapq.heappop(open_heap)
+            if index == goal_index:
+                break
+            current_cost = -negative_cost
+            if current_cost > cost[index]:
+                continue  # entrée périmée : la tuile a déjà été atteinte par un chemin plus court
+
+            bits = moves[index]
+            next_cost = current_cost + 1
+            for bit in range(4):
+                if not bits & (1 << bit):
+                    continue
+                next_index = index + offsets[bit]
+                if next_cost < cost.get(next_index, next_cost + 1):
+                    cost[next_index] = next_cost
+                    came_from[next_index] = index
+                    next_row, next_column = divmod(next_index, columns)
+                    estimate = next_cost + abs(next_column - goal_column) + abs(next_row - goal_row)
+                    heapq.heappush(open_heap, (estimate, -next_cost, next_index))
+        else:
+            return None
+
+        path = []
+        index = goal_index
+        while index != -1:
+            row, column = divmod(index, columns)
+            path.append((column + origin_column, row + origin_row))
+            index = came_from[index]
+        path.reverse()
+        return path
+
+    def route(self, start, goal):
+        """
+        Cherche un chemin entre deux points en pixels et le donne sous forme d'étapes à suivre.
+
+        :param start: (tuple) Le point de départ (x, y) en pixels.
+        :param goal: (tuple) Le point d'arrivée (x, y) en pixels.
+        :return: (list) Le centre (x, y) de chaque tuile à traverser après celle de départ, None s'il n'y a pas de chemin.
+
+        >>> route = pathfinder.route(npc.feet.center, target_rect.center)  # Ceci donnera les étapes du NPC jusqu'à sa cible
+        """
+        path = self.find_path(self.tile_at(*start), self.tile_at(*goal))
+        if path is None:
+            return None
+        return [self.tile_center(tile) for tile in path[1:]]
+
+    def flow_field(self, goal):
+        """
+        Calcule le champ de directions vers une tuile cible (parcours en largeur fait avec NumPy), ou le reprend du cache.
+
+        :param goal: (tuple) La tuile cible (colonne, ligne).
+        :return: (FlowField) Le champ de directions.
+
+        >>> field = pathfinder.flow_field(pathfinder.tile_at(*player.feet.center))  # Ceci calculera le champ vers le joueur
+        """
+        field = self.fields.get(goal)
+        if field is not None:
+            self.hits += 1
+            self.fields.move_to_end(goal)
+            return field
+
+        self.misses += 1
+        column, row = goal[0] - self.origin_column, goal[1] - self.origin_row
+        distance = np.full((self.rows, self.columns), UNREACHABLE, dtype=np.int32)
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            # La cible compte même si sa tuile touche un mur : le joueur peut se tenir contre un mur
+            distance[row, column] = 0
+            # Passages ouverts dans chaque direction, et tuiles pas encore atteintes
+            opened = [(self.moves & (1 << bit)) != 0 for bit in range(4)]
+            unvisited = np.ones((self.rows, self.columns), dtype=bool)
+            unvisited[row, column] = False
+            frontier = np.zeros((self.rows + 2, self.columns + 2), dtype=bool)
+            frontier[1 + row, 1 + column] = True
+            steps = 0
+            while True:
+                # Une tuile est atteinte si une de ses voisines est sur le front et que le passage vers elle est ouvert
+                grown = np.zeros((self.rows, self.columns), dtype=bool)
+                for bit, (dx, dy) in enumerate(DIRECTIONS):
+                    grown |= opened[bit] & frontier[1 + dy:self.rows + 1 + dy, 1 + dx:self.columns + 1 + dx]
+                grown &= unvisited
+                if not grown.any():
+                    break
+                steps += 1
+                distance[grown] = steps
+                unvisited &= ~grown
+                frontier[1:-1, 1:-1] = grown
+
+        field = FlowField(goal, distance, self.tile_width, self.tile_height, (self.origin_column, self.origin_row))
+        self.fields[goal] = field
+        if len(self.fields) > self.max_fields:
+            self.fields.popitem(last=False)
+        return field
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
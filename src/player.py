@@ -3,6 +3,42 @@
 import pygame
 from animation import AnimateSprite
 
+NPC_SPEED = 60  # pixels par seconde
+
+# Caractéristiques de combat : points de vie et dégâts d'une attaque
+PLAYER_STATS = {"hp": 100, "attack_strength": 10}
+NPC_STATS = {
+    "mushroom": {"hp": 50, "attack_strength": 7},
+    "bandit": {"hp": 50, "attack_strength": 7},
+    "wizard": {"hp": 50, "attack_strength": 7},
+    "knight": {"hp": 50, "attack_strength": 7},
+}
+DEFAULT_NPC_STATS = {"hp": 50, "attack_strength": 7}  # pour un NPC absent de NPC_STATS
+
+
+def path_direction(current_rect, target_rect):
+    """
+    Donne la direction d'un NPC entre deux points de son chemin, calculée une fois au chargement des points.
+
+    :param current_rect: (pygame.Rect) Le point de départ.
+    :param target_rect: (pygame.Rect) Le point d'arrivée.
+    :return: (str) "down", "up", "left" ou "right" si les points sont alignés (à 3 pixels près), None sinon.
+
+    >>> path_direction(pygame.Rect(368, 271, 16, 16), pygame.Rect(463, 272, 16, 16))
+    'right'
+    >>> path_direction(pygame.Rect(0, 0, 16, 16), pygame.Rect(40, 40, 16, 16)) is None
+    True
+    """
+    if current_rect.y < target_rect.y and abs(current_rect.x - target_rect.x) < 3: # pouvoir faire déplacement du pnj si rectangle est à peu près 3 pixels de différence
+        return "down"
+    if current_rect.y > target_rect.y and abs(current_rect.x - target_rect.x) < 3:
+        return "up"
+    if current_rect.x > target_rect.x and abs(current_rect.y - target_rect.y) < 3:
+        return "left"
+    if current_rect.x < target_rect.x and abs(current_rect.y - target_rect.y) < 3:
+        return "right"
+    return None
+
 
 class Entity(AnimateSprite):
     """
@@ -17,16 +53,23 @@ class Entity(AnimateSprite):
     >>> entity = Entity("player", 0, 0)  # Ceci créera une nouvelle entité avec le nom "player" et la position (0, 0)
     """
 
+    # Attributs lus à chaque tick : rangés dans des cases fixes plutôt que dans le __dict__ (que pygame.sprite.Sprite garde)
+    __slots__ = ("name", "position", "feet", "feet_offset", "old_position", "previous_position", "attack_strength", "hp")
+
     def __init__(self, name, x, y):
         super().__init__(name) # On appelle la superclasse pour initialiser le sprite sans avoir à nommer la classe parente explicitement
+        self.name = name
 
-        self.image = self.get_image(0, 0)
-        self.image.set_alpha(255)
+        self.image = self.images['down'][0]
         self.rect = self.image.get_rect() # définir le rectangle qui est sa position
         self.position = [x, y]
 
         self.feet = pygame.Rect(0, 0, self.rect.width * 0.5, 8)
+        # décalage des pieds (en bas au milieu du sprite) par rapport à la position ; en flottants, pour qu'ajouté
+        # à une position entière (un point de spawn) il ne crée pas d'entier
+        self.feet_offset = (float(self.rect.width // 2 - self.feet.width // 2), float(self.rect.height - self.feet.height))
         self.old_position = self.position.copy()
+        self.previous_position = self.position.copy()  # position au tick précédent, pour placer le sprite entre deux ticks
 
     def save_location(self):
         """
@@ -36,53 +79,59 @@ class Entity(AnimateSprite):
 
         >>> entity.save_location()  # Ceci enregistrera la position actuelle de l'entité
         """
-        self.old_position = self.position.copy()
+        # copie dans la liste existante : appelé à chaque tick, sans créer de liste
+        self.old_position[0] = self.position[0]
+        self.old_position[1] = self.position[1]
 
 
-    def move_right(self):
+    def move_right(self, dt):
         """
         Déplace l'entité vers la droite.
 
+        :param dt: (float) La durée du tick en secondes.
         :return: None
 
-        >>> entity.move_right()  # Ceci déplacera l'entité vers la droite
+        >>> entity.move_right(1 / 60)  # Ceci déplacera l'entité vers la droite
         """
-        self.change_animation("right")
-        self.position[0] += self.speed # Se déplacer à droite
+        self.change_animation("right", dt)
+        self.position[0] += self.speed * dt # Se déplacer à droite
 
 
-    def move_left(self):
+    def move_left(self, dt):
         """
         Déplace l'entité vers la gauche.
 
+        :param dt: (float) La durée du tick en secondes.
         :return: None
 
-        >>> entity.move_left()  # Ceci déplacera l'entité vers la gauche
+        >>> entity.move_left(1 / 60)  # Ceci déplacera l'entité vers la gauche
         """
-        self.change_animation("left")
-        self.position[0] -= self.speed # Se déplacer à gauche
+        self.change_animation("left", dt)
+        self.position[0] -= self.speed * dt # Se déplacer à gauche
 
-    def move_up(self):
+    def move_up(self, dt):
         """
         Déplace l'entité vers le haut.
 
+        :param dt: (float) La durée du tick en secondes.
         :return: None
 
-        >>> entity.move_up()  # Ceci déplacera l'entité vers le haut
+        >>> entity.move_up(1 / 60)  # Ceci déplacera l'entité vers le haut
         """
-        self.change_animation("up")
-        self.position[1] -= self.speed # Se déplacer en haut
+        self.change_animation("up", dt)
+        self.position[1] -= self.speed * dt # Se déplacer en haut
 
-    def move_down(self):
+    def move_down(self, dt):
         """
         Déplace l'entité vers le bas.
 
+        :param dt: (float) La durée du tick en secondes.
         :return: None
 
-        >>> entity.move_down()  # Ceci déplacera l'entité vers le bas
+        >>> entity.move_down(1 / 60)  # Ceci déplacera l'entité vers le bas
         """
-        self.change_animation("down")
-        self.position[1] += self.speed # Se déplacer en bas
+        self.change_animation("down", dt)
+        self.position[1] += self.speed * dt # Se déplacer en bas
 
     def update(self):
         """
@@ -92,8 +141,71 @@ class Entity(AnimateSprite):
 
         >>> entity.update()  # Ceci mettra à jour la position de l'entité
         """
-        self.rect.topleft = self.position
-        self.feet.midbottom = self.rect.midbottom
+        position = self.position
+        self.rect.topleft = position
+        # comme feet.midbottom = rect.midbottom, sans construire de tuple : pygame arrondit la position de la même façon
+        self.feet.x = position[0] + self.feet_offset[0]
+        self.feet.y = position[1] + self.feet_offset[1]
+
+    def walk_towards(self, x, y, dt):
+        """
+        Fait un pas vers un point, sur un seul axe comme avec les flèches, les pieds de l'entité servant de repère.
+
+        Quand le point est en biais, l'entité se recentre d'abord sur l'axe le plus proche : en allant de centre
+        de tuile en centre de tuile, ses pieds restent ainsi dans les tuiles du chemin.
+
+        :param x: (float) La position x du point en pixels.
+        :param y: (float) La position y du point en pixels.
+        :param dt: (float) La durée du tick en secondes.
+        :return: None
+
+        >>> entity.walk_towards(120, 64, 1 / 60)  # Ceci fera faire un pas à l'entité vers le point (120, 64)
+        """
+        feet_x, feet_y = self.feet.center
+        dx, dy = x - feet_x, y - feet_y
+        if not dx and not dy:
+            return
+
+        step = self.speed * dt
+        if abs(dx) > step and abs(dy) > step:
+            horizontal = abs(dx) < abs(dy)  # en biais : se recentrer d'abord sur l'axe le plus proche
+        else:
+            horizontal = abs(dx) >= abs(dy)
+
+        if horizontal and dx > 0:
+            self.move_right(dt)
+        elif horizontal:
+            self.move_left(dt)
+        elif dy > 0:
+            self.move_down(dt)
+        else:
+            self.move_up(dt)
+
+    def save_previous_position(self):
+        """
+        Enregistre la position au début d'un tick (ou après une téléportation), point de départ de l'interpolation.
+
+        :return: None
+
+        >>> entity.save_previous_position()  # Ceci enregistrera la position de départ du tick
+        """
+        self.previous_position[0] = self.position[0]
+        self.previous_position[1] = self.position[1]
+
+    def interpolate(self, alpha):
+        """
+        Place le rectangle du sprite entre sa position au tick précédent et sa position actuelle, pour le dessin.
+
+        :param alpha: (float) La part du tick suivant déjà écoulée, entre 0 et 1 ; 1 remet le sprite à sa position actuelle.
+        :return: None
+
+        >>> entity.interpolate(0.5)  # Ceci placera le sprite à mi-chemin entre ses deux dernières positions
+        """
+        if alpha >= 1:
+            self.update()
+            return
+        x, y = self.previous_position
+        self.rect.topleft = (x + (self.position[0] - x) * alpha, y + (self.position[1] - y) * alpha)
 
     def move_back(self):
         """
@@ -103,9 +215,23 @@ class Entity(AnimateSprite):
 
         >>> entity.move_back()  # Ceci déplacera l'entité à sa position précédente
         """
-        self.position = self.old_position
-        self.rect.topleft = self.position
-        self.feet.midbottom = self.rect.midbottom
+        self.position[0] = self.old_position[0]
+        self.position[1] = self.old_position[1]
+        self.update()
+
+    def collides(self, walls):
+        """
+        Indique si les pieds de l'entité touchent un mur. Les cases des murs sont calculées à partir de la position
+        plutôt que du rectangle des pieds, dont la lecture créerait des entiers : aucun objet n'est créé.
+
+        :param walls: (SpatialHash) Les murs de la carte.
+        :return: (bool) True si les pieds touchent un mur.
+
+        >>> entity.collides(map.wall_index)  # Ceci indiquera si l'entité est dans un mur
+        """
+        position = self.position
+        offset = self.feet_offset
+        return walls.collides(self.feet, position[0] + offset[0], position[1] + offset[1])
 
 
 
@@ -121,8 +247,8 @@ class Player(Entity):
 
     def __init__(self):
         super().__init__("player", 0, 0)
-        self.attack_strength = 10
-        self.hp = 100
+        self.attack_strength = PLAYER_STATS["attack_strength"]
+        self.hp = PLAYER_STATS["hp"]
 
 class NPC(Entity):
     """
@@ -131,26 +257,56 @@ class NPC(Entity):
     :param name: (str) Le nom du NPC.
     :param nb_points: (int) Le nombre de points du NPC.
     :param dialog: (list) La liste des dialogues du NPC.
+    :param path: (str) Le début du nom des points de son chemin sur la carte ("<path>_path1"...), son nom par défaut.
     :return: None
     :CU: type(name) == str and type(nb_points) == int and type(dialog) == list
 
     >>> npc = NPC("mushroom", 4, ["Je te souhaite une excellente aventure", "Les cours de NSI sont les meilleurs", "Dédicace au meilleur graphiste : Karl", " Bye !"])  # Ceci créera un nouveau NPC avec le nom "mushroom", 4 points et une liste de dialogues
     """
 
-    def __init__(self, name, nb_points, dialog):
+    __slots__ = ("nb_points", "dialog", "path", "points", "directions", "current_point", "route", "killed", "lag")
+
+    def __init__(self, name, nb_points, dialog, path=None):
             super().__init__(name, 0, 0)
             self.nb_points = nb_points
             self.dialog = dialog
+            self.path = path or name  # plusieurs NPCs de même nom peuvent suivre chacun son chemin (voir dungeon.py)
             self.points = []   # points de notre chemin
+            self.directions = []  # direction vers le point suivant depuis chaque point (voir path_direction)
             self.name = name # nom de notre entité
-            self.speed = 1
+            self.speed = NPC_SPEED
             self.current_point = 0
-            self.attack_strength = 7
-            self.hp = 50
+            self.route = None  # étapes (x, y) calculées par le Pathfinder vers le point suivant du chemin
+            stats = NPC_STATS.get(name, DEFAULT_NPC_STATS)
+            self.attack_strength = stats["attack_strength"]
+            self.hp = stats["hp"]
+            self.killed = False
+            self.lag = 0.0  # secondes pas encore simulées (voir ActivityScheduler)
+
+    def kill(self):
+        """
+        Retire le NPC de tous ses groupes et le marque comme vaincu, pour qu'il ne revienne pas au rechargement de sa carte.
 
+        :return: None
 
+        >>> npc.kill()  # Ceci retirera définitivement le NPC de sa carte
+        """
+        self.killed = True
+        super().kill()
 
-    def move(self):
+    def move(self, dt, pathfinder=None):
+        """
+        Fait avancer le NPC vers le point suivant de son chemin.
+
+        Les points alignés sont reliés en ligne droite. Sinon, avec un Pathfinder, le NPC suit un chemin
+        calculé entre les tuiles accessibles, qui contourne les murs ; sans Pathfinder, il reste sur place.
+
+        :param dt: (float) La durée du tick en secondes.
+        :param pathfinder: (Pathfinder) La recherche de chemins de la carte du NPC.
+        :return: None
+
+        >>> npc.move(1 / 60)  # Ceci fera avancer le NPC d'un tick
+        """
         current_point = self.current_point
         target_point = self.current_point + 1
 
@@ -158,20 +314,56 @@ class NPC(Entity):
             target_point = 0
 
 
-        current_rect = self.points[current_point] #rectangle surlequel se trouve les joueurs
         target_rect = self.points[target_point]
-
-        if current_rect.y < target_rect.y  and abs(current_rect.x - target_rect.x) < 3: # pouvoir faire déplacement du pnj si rectangle est à peu près 3 pixels de différence
-            self.move_down()
-        elif current_rect.y > target_rect.y and abs(current_rect.x - target_rect.x) < 3: # pouvoir faire déplacement du pnj si rectangle est à peu près 3 pixels de différence
-            self.move_up()
-        elif current_rect.x > target_rect.x and abs(current_rect.y - target_rect.y) < 3: # pouvoir faire déplacement du pnj si rectangle est à peu près 3 pixels de différence
-            self.move_left()
-        elif current_rect.x < target_rect.x and abs(current_rect.y - target_rect.y) < 3: # pouvoir faire déplacement du pnj si rectangle est à peu près 3 pixels de différence
-            self.move_right()
+        direction = self.directions[current_point]  # calculée au chargement : lire les rectangles créerait des entiers
+
+        if direction == "down":
+            self.move_down(dt)
+        elif direction == "up":
+            self.move_up(dt)
+        elif direction == "left":
+            self.move_left(dt)
+        elif direction == "right":
+            self.move_right(dt)
+        elif pathfinder is not None and current_point != target_point:
+            if self.route is None:
+                self.route = pathfinder.route(self.feet.center, target_rect.center) or []
+            self.follow_route(dt)
 
         if self.rect.colliderect(target_rect):
             self.current_point = target_point # La position cible devient le nouveau point d'origine
+            self.route = None
+
+    def follow_route(self, dt):
+        """
+        Fait un pas vers l'étape suivante de la route calculée, en passant à la suivante quand elle est atteinte.
+
+        :param dt: (float) La durée du tick en secondes.
+        :return: None
+        """
+        step = self.speed * dt
+        while self.route:
+            x, y = self.route[0]
+            feet_x, feet_y = self.feet.center
+            if abs(x - feet_x) <= step and abs(y - feet_y) <= step:
+                self.route.pop(0)
+                continue
+            self.walk_towards(x, y, dt)
+            return
+
+    def chase(self, field, dt):
+        """
+        Fait un pas vers la cible d'un champ de directions (le joueur...), en contournant les murs.
+
+        :param field: (FlowField) Le champ de directions vers la cible.
+        :param dt: (float) La durée du tick en secondes.
+        :return: None
+
+        >>> npc.chase(map_manager.player_flow_field(), 1 / 60)  # Ceci fera avancer le NPC vers le joueur
+        """
+        point = field.next_point(*self.feet.center)
+        if point is not None:
+            self.walk_towards(point[0], point[1], dt)
 
 
 
@@ -184,24 +376,29 @@ class NPC(Entity):
         >>> npc.teleport_spawn()  # Ceci téléportera le NPC à son point de spawn
         """
         location = self.points[self.current_point] # self.current_point équivaut a 0, cest le point actuel
+        self.route = None
         self.position[0] = location.x
         self.position[1] = location.y
         self.save_location()
+        self.save_previous_position()
+        self.update()  # rectangle et pieds au point de spawn : le premier chemin en part, une carte découpée les y range
 
-    def load_points(self, tmx_data):
+    def load_points(self, objects):
         """
-        Charge les points du NPC à partir des données tmx.
+        Charge les points du NPC à partir des objets nommés de sa carte.
 
-        :param tmx_data: (pytmx.TiledMap) Les données tmx à partir desquelles charger les points.
+        :param objects: (dict) Les objets de la carte, par nom (Map.objects).
         :return: None
-        :CU: isinstance(tmx_data, pytmx.TiledMap)
+        :CU: type(objects) == dict
 
-        >>> npc.load_points(tmx_data)  # Ceci chargera les points du NPC à partir des données tmx
+        >>> npc.load_points(map.objects)  # Ceci chargera les points du NPC à partir des objets de sa carte
         """
         for numero in range(1, self.nb_points+1):
-            point = tmx_data.get_object_by_name(f"{self.name}_path{numero}")
+            point = objects[f"{self.path}_path{numero}"]
             rect = pygame.Rect(point.x, point.y, point.width, point.height)
             self.points.append(rect)
+        self.directions = [path_direction(point, self.points[(numero + 1) % self.nb_points])
+                           for numero, point in enumerate(self.points)]
 
 if __name__ == "__main__":
     import doctest
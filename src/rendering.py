@@ -0,0 +1,557 @@
+from collections import OrderedDict
+from itertools import chain
+
+import pygame
+import pyscroll
+
+from animation import frame_cache
+from map_compiler import CompiledMapData
+from streaming import StreamedMapData
+
+ZOOM = 3  # les cartes sont affichées trois fois plus grosses
+
+# Modes de rendu des cartes : le zoom n'est jamais appliqué par pyscroll à chaque image
+PRESCALED = "prescaled"  # tuiles et images des sprites agrandies une fois au chargement, carte dessinée sans zoom
+LOW_RES = "low_res"      # carte dessinée à la résolution logique (écran / ZOOM), agrandie d'un coup à l'écran
+RENDER_MODES = (PRESCALED, LOW_RES)
+DEFAULT_RENDER_MODE = PRESCALED  # le plus rapide : une copie de l'écran coûte moins qu'un agrandissement
+
+DEFAULT_LAYER = 4  # calque des sprites : les calques de tuiles en dessous ne changent jamais
+CHUNK_TILES = 16  # côté d'un bloc de calques fixes aplatis, en tuiles
+MAX_SCALED_CHUNKS = 9  # blocs agrandis gardés en mode PRESCALED : le tampon en touche 4 au plus
+MAX_LAZY_CHUNKS = 16  # blocs gardés d'une carte découpée, dessinés quand ils entrent dans la vue
+
+
+def prescale_images(images, factor):
+    """
+    Agrandit sur place les images des tuiles d'une carte, chacune une seule fois même si plusieurs gids la partagent.
+
+    L'agrandissement se fait au chargement plutôt que d'être lu dans un cache sur disque : pour ces tilesets,
+    agrandir une image coûte moins que relire sa version agrandie (trois fois plus grande dans chaque sens).
+
+    :param images: (list) Les images des tuiles, indexées par gid (None pour une case vide).
+    :param factor: (int) Le facteur d'agrandissement.
+    :return: None
+    :CU: factor >= 1
+
+    >>> images = [None, pygame.Surface((16, 16))]
+    >>> prescale_images(images, 3)
+    >>> images[0], images[1].get_size()
+    (None, (48, 48))
+    """
+    scaled = dict()  # id de l'image d'origine -> image agrandie
+    for gid, image in enumerate(images):
+        if image is not None:
+            if id(image) not in scaled:
+                scaled[id(image)] = (image, pygame.transform.scale_by(image, factor))  # l'origine reste en vie
+            images[gid] = scaled[id(image)][1]
+
+
+def get_tile_images(data, rect, layers=None):
+    """
+    Donne les tuiles d'un rectangle sur certains calques, dans l'ordre où pyscroll les dessine.
+
+    Les cartes compilées et découpées ne parcourent que les calques demandés ; celles de pytmx sont parcourues en entier,
+    puis filtrées.
+
+    :param data: (pyscroll.data.PyscrollDataAdapter) Les données de la carte.
+    :param rect: (tuple) Le rectangle de tuiles (x, y, largeur, hauteur).
+    :param layers: (list) Les indices des calques, tous les calques visibles par défaut.
+    :return: Des quadruplets (x, y, calque, image).
+
+    >>> list(get_tile_images(map_data, (0, 0, 2, 1), [4]))  # Ceci donnera les tuiles du calque 4 sur deux cases
+    """
+    if layers is None:
+        return data.get_tile_images_by_rect(rect)
+    if isinstance(data, (CompiledMapData, StreamedMapData, ScaledMapData)):
+        return data.get_tile_images_by_rect(rect, layers)
+    return (tile for tile in data.get_tile_images_by_rect(rect) if tile[2] in layers)
+
+
+class ScaledMapData(pyscroll.data.PyscrollDataAdapter):
+    """
+    Classe ScaledMapData qui présente au rendu de pyscroll une carte dont les images des tuiles ont été agrandies
+    (voir prescale_images) : les tuiles sont plus grandes, tout le reste vient de la carte d'origine.
+
+    :param data: (pyscroll.data.PyscrollDataAdapter) Les données de la carte, aux images déjà agrandies.
+    :param factor: (int) Le facteur d'agrandissement des images.
+    :return: None
+
+    >>> map_data = ScaledMapData(CompiledMapData(tmx_data), 3)  # Ceci donnera des tuiles de 48 pixels au rendu
+    """
+
+    def __init__(self, data, factor):
+        """
+        Initialise les données agrandies.
+
+        :param data: (pyscroll.data.PyscrollDataAdapter) Les données de la carte.
+        :param factor: (int) Le facteur d'agrandissement des images.
+        :return: None
+        """
+        super().__init__()
+        self.data = data
+        self.factor = factor
+        self.reload_animations()
+
+    def reload_data(self):
+        self.data.reload_data()
+        prescale_images(self.data.tmx.images, self.factor)
+
+    def get_animations(self):
+        return self.data.get_animations()
+
+    @property
+    def tile_size(self):
+        width, height = self.data.tile_size
+        return width * self.factor, height * self.factor
+
+    @property
+    def map_size(self):
+        return self.data.map_size
+
+    @property
+    def visible_tile_layers(self):
+        return self.data.visible_tile_layers
+
+    def _get_tile_image(self, x, y, l):
+        return self.data._get_tile_image(x, y, l)
+
+    def _get_tile_image_by_id(self, id):
+        return self.data._get_tile_image_by_id(id)
+
+    def get_tile_images_by_rect(self, rect, layers=None):
+        return get_tile_images(self.data, rect, layers)
+
+
+class StaticChunks:
+    """
+    Classe StaticChunks qui aplatit les calques fixes d'une carte (ceux sous le calque des sprites) en blocs
+    de CHUNK_TILES x CHUNK_TILES tuiles, au format de l'écran : en défilant, le rendu copie une surface par bloc
+    visible au lieu d'une image par tuile et par calque.
+
+    Les blocs sont construits au chargement de la carte, avec les images des tuiles d'origine. En mode PRESCALED,
+    ils sont agrandis quand ils entrent dans la vue, et les derniers utilisés sont gardés (MAX_SCALED_CHUNKS) :
+    la carte entière agrandie occuperait près de 100 Mo.
+
+    Pour une carte découpée (lazy), les blocs ne sont dessinés que quand ils entrent dans la vue, et seuls
+    les derniers utilisés sont gardés (MAX_LAZY_CHUNKS) : data doit alors garder ses images d'origine
+    (voir StreamedMapData.detached).
+
+    :param data: (pyscroll.data.PyscrollDataAdapter) Les données de la carte, images pas encore agrandies.
+    :param layers: (list) Les indices des calques à aplatir, du plus bas au plus haut.
+    :param chunk_tiles: (int) Le côté d'un bloc, en tuiles.
+    :param lazy: (bool) True pour dessiner les blocs à la demande.
+    :return: None
+    :CU: chunk_tiles > 0
+
+    >>> chunks = StaticChunks(CompiledMapData(tmx_data), [0, 1, 2, 3])  # Ceci aplatira les 4 premiers calques
+    """
+
+    def __init__(self, data, layers, chunk_tiles=CHUNK_TILES, lazy=False):
+        """
+        Construit les blocs de la carte, ou prépare leur construction à la demande.
+
+        :param data: (pyscroll.data.PyscrollDataAdapter) Les données de la carte.
+        :param layers: (list) Les indices des calques à aplatir.
+        :param chunk_tiles: (int) Le côté d'un bloc, en tuiles.
+        :param lazy: (bool) True pour dessiner les blocs à la demande.
+        :return: None
+        """
+        self.layers = list(layers)
+        self.chunk_tiles = chunk_tiles
+        self.tile_size = data.tile_size
+        self.map_size = data.map_size
+        width, height = self.map_size
+        self.columns = -(-width // chunk_tiles)
+        self.rows = -(-height // chunk_tiles)
+        self.lazy = lazy
+        if lazy:
+            self.data = data
+            self.chunks = OrderedDict()  # indice du bloc -> bloc, du moins au plus récemment utilisé
+        else:
+            self.chunks = [self._compose(data, column, row)
+                           for row in range(self.rows) for column in range(self.columns)]
+        self.scaled = OrderedDict()  # (facteur, indice du bloc) -> bloc agrandi, du moins au plus récemment utilisé
+
+    def _compose(self, data, column, row):
+        """
+        Dessine un bloc : les tuiles de ses calques fixes, sur le fond noir du rendu de pyscroll.
+
+        :param data: (pyscroll.data.PyscrollDataAdapter) Les données de la carte.
+        :param column: (int) La colonne du bloc.
+        :param row: (int) La ligne du bloc.
+        :return: (pygame.Surface) Le bloc, plus petit au bord droit et en bas de la carte.
+        """
+        tile_width, tile_height = self.tile_size
+        width, height = self.map_size
+        left, top = column * self.chunk_tiles, row * self.chunk_tiles
+        right, bottom = min(left + self.chunk_tiles, width), min(top + self.chunk_tiles, height)
+
+        size = ((right - left) * tile_width, (bottom - top) * tile_height)
+        screen = pygame.display.get_surface()
+        # au format de l'écran, sans transparence : la copie la plus rapide
+        surface = pygame.Surface(size) if screen is None else pygame.Surface(size, 0, screen)
+        surface.fill(pyscroll.orthographic.BufferedRenderer._rgb_clear_color)
+
+        blits = [(image, ((x - left) * tile_width, (y - top) * tile_height))
+                 for x, y, layer, image in get_tile_images(data, (left, top, right - left, bottom - top), self.layers)]
+        surface.blits(blits, doreturn=False)
+        return surface
+
+    def get_chunk(self, index, factor):
+        """
+        Récupère un bloc à l'échelle du rendu, agrandi au plus une fois tant qu'il reste parmi les derniers utilisés.
+
+        :param index: (int) L'indice du bloc (ligne * colonnes + colonne).
+        :param factor: (int) Le facteur d'agrandissement des tuiles du rendu.
+        :return: (pygame.Surface) Le bloc.
+        """
+        if factor == 1:
+            return self._base_chunk(index)
+        key = (factor, index)
+        scaled = self.scaled.get(key)
+        if scaled is None:
+            scaled = self.scaled[key] = pygame.transform.scale_by(self._base_chunk(index), factor)
+            if len(self.scaled) > MAX_SCALED_CHUNKS:
+                self.scaled.popitem(last=False)
+        else:
+            self.scaled.move_to_end(key)
+        return scaled
+
+    def _base_chunk(self, index):
+        """
+        Récupère un bloc à l'échelle des tuiles d'origine, dessiné à la première demande pour une carte découpée.
+
+        :param index: (int) L'indice du bloc (ligne * colonnes + colonne).
+        :return: (pygame.Surface) Le bloc.
+        """
+        if not self.lazy:
+            return self.chunks[index]
+        chunk = self.chunks.get(index)
+        if chunk is None:
+            row, column = divmod(index, self.columns)
+            chunk = self.chunks[index] = self._compose(self.data, column, row)
+            if len(self.chunks) > MAX_LAZY_CHUNKS:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(index)
+        return chunk
+
+    def blit(self, surface, rect, view, tile_size):
+        """
+        Copie sur le tampon du rendu la partie des blocs qui couvre un rectangle de tuiles.
+
+        :param surface: (pygame.Surface) Le tampon du rendu.
+        :param rect: (tuple) Le rectangle de tuiles à couvrir (x, y, largeur, hauteur).
+        :param view: (pygame.Rect) Les tuiles du tampon (sa tuile en haut à gauche est dessinée en (0, 0)).
+        :param tile_size: (tuple) La taille des tuiles du rendu.
+        :return: None
+        """
+        tile_width, tile_height = tile_size
+        factor = tile_width // self.tile_size[0]
+        width, height = self.map_size
+        size = self.chunk_tiles
+        x, y, w, h = rect
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + w, width), min(y + h, height)
+
+        blits = []
+        for row in range(top // size, -(-bottom // size)):
+            for column in range(left // size, -(-right // size)):
+                # partie du bloc dans le rectangle, en tuiles
+                x1, y1 = max(left, column * size), max(top, row * size)
+                x2, y2 = min(right, (column + 1) * size), min(bottom, (row + 1) * size)
+                area = ((x1 - column * size) * tile_width, (y1 - row * size) * tile_height,
+                        (x2 - x1) * tile_width, (y2 - y1) * tile_height)
+                destination = ((x1 - view.left) * tile_width, (y1 - view.top) * tile_height)
+                blits.append((self.get_chunk(row * self.columns + column, factor), destination, area))
+        surface.blits(blits, doreturn=False)
+
+    def surfaces(self):
+        """
+        Donne les surfaces gardées, pour estimer la mémoire occupée par la carte.
+
+        :return: (list) Les blocs et les blocs agrandis.
+        """
+        chunks = list(self.chunks.values()) if self.lazy else self.chunks
+        return chunks + list(self.scaled.values())
+
+
+class ChunkedRenderer(pyscroll.orthographic.BufferedRenderer):
+    """
+    Classe ChunkedRenderer, rendu de pyscroll qui remplit son tampon avec les blocs des calques fixes
+    (voir StaticChunks), puis tuile par tuile avec les seuls calques au niveau des sprites et au-dessus.
+
+    Le reste (défilement, tuiles redessinées par-dessus les sprites) est celui de pyscroll.
+
+    :param data: (pyscroll.data.PyscrollDataAdapter) Les données de la carte.
+    :param size: (tuple) La taille du rendu.
+    :param chunks: (StaticChunks) Les blocs des calques fixes de la carte.
+    :return: None
+
+    >>> map_layer = ChunkedRenderer(map_data, (800, 600), chunks)  # Ceci créera le rendu de la carte
+    """
+
+    def __init__(self, data, size, chunks, **kwargs):
+        """
+        Initialise le rendu (pyscroll remplit le tampon dès sa création).
+
+        :param data: (pyscroll.data.PyscrollDataAdapter) Les données de la carte.
+        :param size: (tuple) La taille du rendu.
+        :param chunks: (StaticChunks) Les blocs des calques fixes.
+        :return: None
+        """
+        self.chunks = chunks
+        self.tile_layers = [layer for layer in data.visible_tile_layers if layer not in chunks.layers]
+        super().__init__(data, size, **kwargs)
+
+    def _covered(self, rect):
+        """
+        Dit si des tuiles sont toutes sur la carte : les blocs les couvrent alors sans avoir à effacer le tampon.
+
+        :param rect: (tuple) Le rectangle de tuiles (x, y, largeur, hauteur).
+        :return: (bool) True si le rectangle est dans la carte.
+        """
+        width, height = self.data.map_size
+        x, y, w, h = rect
+        return x >= 0 and y >= 0 and x + w <= width and y + h <= height
+
+    def redraw_tiles(self, surface):
+        if not self._covered(self._tile_view):
+            self._clear_surface(surface)
+        self.chunks.blit(surface, self._tile_view, self._tile_view, self.data.tile_size)
+        self._tile_queue = get_tile_images(self.data, self._tile_view, self.tile_layers)
+        self._flush_tile_queue(surface)
+
+    def _queue_edge_tiles(self, dx, dy):
+        view = self._tile_view
+        tile_size = self.data.tile_size
+        queues = []
+
+        def append(rect):
+            if not self._covered(rect):
+                self._clear_surface(self._buffer, ((rect[0] - view.left) * tile_size[0],
+                                                   (rect[1] - view.top) * tile_size[1],
+                                                   rect[2] * tile_size[0], rect[3] * tile_size[1]))
+            self.chunks.blit(self._buffer, rect, view, tile_size)
+            queues.append(get_tile_images(self.data, rect, self.tile_layers))
+
+        # mêmes bords que pyscroll
+        if dx > 0:
+            append((view.right - 1, view.top, dx, view.height))
+        elif dx < 0:
+            append((view.left, view.top, -dx, view.height))
+        if dy > 0:
+            append((view.left, view.bottom - 1, view.width, dy))
+        elif dy < 0:
+            append((view.left, view.top, view.width, -dy))
+        self._tile_queue = chain.from_iterable(queues)
+
+
+class ScaledGroup(pyscroll.PyscrollGroup):
+    """
+    Classe ScaledGroup qui dessine une carte aux tuiles agrandies (mode PRESCALED) et ses sprites, placés en pixels
+    de la carte comme avec le zoom de pyscroll, mais dessinés avec leurs images agrandies une fois pour toutes.
+
+    La caméra se centre en pixels de la carte ; world_view est la partie de la carte vue par la caméra,
+    en pixels de la carte, modifiée sur place.
+
+    :param map_layer: (pyscroll.BufferedRenderer) Le rendu de la carte, sans zoom, à la taille de l'écran.
+    :param zoom: (int) Le facteur d'agrandissement des tuiles.
+    :return: None
+
+    >>> group = ScaledGroup(map_layer, ZOOM, default_layer=4)  # Ceci créera le groupe d'une carte agrandie
+    """
+
+    def __init__(self, map_layer, zoom=ZOOM, *args, **kwargs):
+        """
+        Initialise le groupe, la caméra dans le coin de la carte.
+
+        :param map_layer: (pyscroll.BufferedRenderer) Le rendu de la carte.
+        :param zoom: (int) Le facteur d'agrandissement des tuiles.
+        :return: None
+        """
+        super().__init__(map_layer, *args, **kwargs)
+        self.zoom = zoom
+        self.world_view = pygame.Rect(0, 0, 0, 0)
+        self._update_world_view()
+
+    def _update_world_view(self):
+        """
+        Recalcule world_view à partir de la vue du rendu (en pixels agrandis).
+
+        :return: None
+        """
+        view = self._map_layer.view_rect
+        zoom = self.zoom
+        # arrondi vers l'extérieur : un sprite à moitié visible fait partie de la vue
+        self.world_view.update(view.x // zoom, view.y // zoom, -(-view.right // zoom) - view.x // zoom,
+                               -(-view.bottom // zoom) - view.y // zoom)
+
+    def center(self, value):
+        """
+        Centre la caméra sur un pixel de la carte.
+
+        :param value: (tuple) Les coordonnées x, y en pixels de la carte.
+        :return: None
+        """
+        self._map_layer.center((value[0] * self.zoom, value[1] * self.zoom))
+        self._update_world_view()
+
+    @property
+    def view(self):
+        """
+        Donne la partie de la carte vue par la caméra, en pixels de la carte.
+
+        :return: (pygame.Rect) Une copie de world_view.
+        """
+        return self.world_view.copy()
+
+    def translate_rect(self, rect):
+        """
+        Donne la place à l'écran d'un rectangle de la carte.
+
+        :param rect: (pygame.Rect) Le rectangle, en pixels de la carte.
+        :return: (pygame.Rect) Sa place à l'écran.
+        """
+        ox, oy = self._map_layer.get_center_offset()
+        zoom = self.zoom
+        return pygame.Rect(rect.x * zoom + ox, rect.y * zoom + oy, rect.width * zoom, rect.height * zoom)
+
+    def draw(self, surface):
+        """
+        Dessine la carte et les sprites visibles sur une surface, sans rien agrandir.
+
+        :param surface: (pygame.Surface) La surface sur laquelle dessiner, de la taille du rendu.
+        :return: (pygame.Rect) La zone dessinée.
+        """
+        ox, oy = self._map_layer.get_center_offset()
+        zoom = self.zoom
+        view = self.world_view
+        get_scaled = frame_cache.get_scaled  # une image pas encore agrandie l'est ici, une seule fois
+        get_layer = self.get_layer_of_sprite
+        spritedict = self.spritedict
+
+        surfaces = []
+        for sprite in self.sprites():
+            rect = sprite.rect
+            if rect.colliderect(view):
+                screen_rect = pygame.Rect(rect.x * zoom + ox, rect.y * zoom + oy, rect.width * zoom,
+                                          rect.height * zoom)
+                surfaces.append((get_scaled(sprite.image, zoom), screen_rect, get_layer(sprite)))
+                spritedict[sprite] = screen_rect
+
+        self.lostsprites = []
+        return self._map_layer.draw(surface, surface.get_rect(), surfaces)
+
+
+class LowResGroup(pyscroll.PyscrollGroup):
+    """
+    Classe LowResGroup qui dessine une carte et ses sprites sans zoom sur une surface de la résolution logique
+    (mode LOW_RES), puis l'agrandit d'un facteur entier sur l'écran, en un seul appel.
+
+    L'image agrandie est centrée sur l'écran : si sa taille n'est pas un multiple du facteur, il reste une bande
+    de quelques pixels sur les bords.
+
+    :param map_layer: (pyscroll.BufferedRenderer) Le rendu de la carte, sans zoom, à la résolution logique.
+    :param screen_size: (tuple) La taille de l'écran.
+    :param zoom: (int) Le facteur d'agrandissement.
+    :return: None
+
+    >>> group = LowResGroup(map_layer, (800, 600), ZOOM, default_layer=4)  # Ceci dessinera la carte en 266x200
+    """
+
+    def __init__(self, map_layer, screen_size, zoom=ZOOM, *args, **kwargs):
+        """
+        Initialise le groupe et sa surface de résolution logique.
+
+        :param map_layer: (pyscroll.BufferedRenderer) Le rendu de la carte.
+        :param screen_size: (tuple) La taille de l'écran.
+        :param zoom: (int) Le facteur d'agrandissement.
+        :return: None
+        """
+        super().__init__(map_layer, *args, **kwargs)
+        self.zoom = zoom
+        width, height = map_layer.view_rect.size
+        self.canvas = pygame.Surface((width, height))
+        if pygame.display.get_surface() is not None:
+            self.canvas = self.canvas.convert()  # format de l'écran : l'agrandissement n'a rien à convertir
+        self.target = pygame.Rect(0, 0, width * zoom, height * zoom)
+        self.target.center = (screen_size[0] // 2, screen_size[1] // 2)
+        self.target_parent = None  # surface de la dernière image, et la partie où l'agrandir
+        self.target_surface = None
+
+    @property
+    def world_view(self):
+        """
+        Donne la partie de la carte vue par la caméra (celle du rendu, sans copie).
+
+        :return: (pygame.Rect) La vue, en pixels de la carte.
+        """
+        return self._map_layer.view_rect
+
+    def translate_rect(self, rect):
+        """
+        Donne la place à l'écran d'un rectangle de la carte.
+
+        :param rect: (pygame.Rect) Le rectangle, en pixels de la carte.
+        :return: (pygame.Rect) Sa place à l'écran.
+        """
+        ox, oy = self._map_layer.get_center_offset()
+        zoom = self.zoom
+        return pygame.Rect((rect.x + ox) * zoom + self.target.x, (rect.y + oy) * zoom + self.target.y,
+                           rect.width * zoom, rect.height * zoom)
+
+    def draw(self, surface):
+        """
+        Dessine la carte et les sprites visibles à la résolution logique, puis les agrandit sur une surface.
+
+        :param surface: (pygame.Surface) La surface sur laquelle dessiner, de la taille de l'écran.
+        :return: (pygame.Rect) La zone dessinée.
+        """
+        super().draw(self.canvas)
+        if surface is not self.target_parent:
+            self.target_parent = surface
+            self.target_surface = surface.subsurface(self.target)
+        pygame.transform.scale(self.canvas, self.target.size, self.target_surface)
+        return self.target.copy()
+
+
+def build_group(map_data, screen_size, mode=DEFAULT_RENDER_MODE, zoom=ZOOM, default_layer=DEFAULT_LAYER, **kwargs):
+    """
+    Construit le rendu et le groupe d'une carte pour un mode de rendu.
+
+    Les calques de tuiles sous default_layer sont aplatis en blocs (voir StaticChunks), à la demande pour une carte
+    découpée. En mode PRESCALED, les images des tuiles de la carte sont ensuite agrandies sur place (voir prescale_images).
+
+    :param map_data: (pyscroll.data.PyscrollDataAdapter) Les données de la carte.
+    :param screen_size: (tuple) La taille de l'écran.
+    :param mode: (str) PRESCALED ou LOW_RES.
+    :param zoom: (int) Le facteur d'agrandissement.
+    :param default_layer: (int) Le calque des sprites.
+    :param kwargs: Les autres options du groupe.
+    :return: (pyscroll.PyscrollGroup) Le groupe, son rendu dans group._map_layer.
+    :CU: mode in RENDER_MODES
+
+    >>> group = build_group(CompiledMapData(tmx_data), (800, 600), PRESCALED, default_layer=4)  # Ceci agrandira les tuiles
+    """
+    if mode not in RENDER_MODES:
+        raise ValueError(f"mode de rendu inconnu : {mode}")
+    layers = [layer for layer in map_data.visible_tile_layers if layer < default_layer]
+    if isinstance(map_data, StreamedMapData):
+        chunks = StaticChunks(map_data.detached(), layers, lazy=True)
+    else:
+        chunks = StaticChunks(map_data, layers)
+    if mode == PRESCALED:
+        prescale_images(map_data.tmx.images, zoom)
+        frame_cache.prescale(zoom)  # images des sprites déjà chargées
+        map_layer = ChunkedRenderer(ScaledMapData(map_data, zoom), screen_size, chunks)
+        return ScaledGroup(map_layer, zoom, default_layer=default_layer, **kwargs)
+    logical_size = (screen_size[0] // zoom, screen_size[1] // zoom)
+    map_layer = ChunkedRenderer(map_data, logical_size, chunks)
+    return LowResGroup(map_layer, screen_size, zoom, default_layer=default_layer, **kwargs)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,307 @@
+import os
+import struct
+import threading
+import time
+import zlib
+
+from snapshot import GameSnapshot, NPCSnapshot, PlayerSnapshot
+
+# Définir le répertoire de base du projet
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SAVE_PATH = os.path.join(BASE_DIR, 'saves', 'partie.sav')
+
+AUTOSAVE_INTERVAL = 30  # secondes de jeu entre deux sauvegardes automatiques
+
+# Format de la sauvegarde (petit-boutiste) : en-tête, puis les données compressées avec zlib :
+#   carte actuelle, joueur, nombre de cartes, puis pour chaque carte son nom, son nombre de NPCs et leurs états
+MAGIC = b"DDSAVE"
+VERSION = 1
+HEADER = struct.Struct("<6sHII")   # magic, version, crc32 des données compressées, taille des données décompressées
+PLAYER = struct.Struct("<ddi")     # x, y, points de vie
+COUNT = struct.Struct("<H")        # nombre de cartes ou de NPCs
+NPC = struct.Struct("<BHidd")      # drapeaux, point du chemin, points de vie, x, y
+NPC_KILLED = 1
+NPC_PLACED = 2  # la position est connue (sinon le NPC repart du point de son chemin)
+
+
+class SaveError(ValueError):
+    """
+    Erreur levée quand un fichier de sauvegarde ne peut pas être lu : mauvais format, version inconnue ou fichier abîmé.
+
+    >>> raise SaveError("sauvegarde invalide")
+    Traceback (most recent call last):
+    ...
+    SaveError: sauvegarde invalide
+    """
+
+
+def _pack_string(text):
+    """
+    Code une chaîne : sa longueur sur un octet puis ses octets UTF-8.
+
+    :param text: (str) La chaîne.
+    :return: (bytes) La chaîne codée.
+    :CU: len(text.encode("utf-8")) < 256
+    """
+    data = text.encode("utf-8")
+    return bytes((len(data),)) + data
+
+
+def _unpack_string(buffer, offset):
+    """
+    Lit une chaîne codée avec _pack_string.
+
+    :param buffer: (bytes) Les données.
+    :param offset: (int) La position de la chaîne.
+    :return: (tuple) La chaîne et la position qui suit.
+    """
+    size = buffer[offset]
+    end = offset + 1 + size
+    if end > len(buffer):
+        raise SaveError("sauvegarde tronquée")
+    return bytes(buffer[offset + 1:end]).decode("utf-8"), end
+
+
+def encode(snapshot):
+    """
+    Code l'état d'une partie dans le format de sauvegarde.
+
+    :param snapshot: (GameSnapshot) L'état de la partie.
+    :return: (bytes) La sauvegarde.
+
+    >>> snapshot = GameSnapshot("world", PlayerSnapshot((160.0, 608.0), 100), {"world": (NPCSnapshot((10, 20), 50, False, 1),)})
+    >>> decode(encode(snapshot)) == snapshot
+    True
+    """
+    parts = [_pack_string(snapshot.current_map),
+             PLAYER.pack(*snapshot.player.position, snapshot.player.hp),
+             COUNT.pack(len(snapshot.npcs))]
+    for name, npcs in snapshot.npcs.items():
+        parts.append(_pack_string(name))
+        parts.append(COUNT.pack(len(npcs)))
+        for npc in npcs:
+            flags = (NPC_KILLED if npc.killed else 0) | (NPC_PLACED if npc.position is not None else 0)
+            x, y = npc.position if npc.position is not None else (0, 0)
+            parts.append(NPC.pack(flags, npc.current_point, npc.hp, x, y))
+
+    payload = b"".join(parts)
+    data = zlib.compress(payload, 9)
+    return HEADER.pack(MAGIC, VERSION, zlib.crc32(data), len(payload)) + data
+
+
+def decode(data):
+    """
+    Lit une sauvegarde codée avec encode.
+
+    :param data: (bytes) La sauvegarde.
+    :return: (GameSnapshot) L'état de la partie.
+    :raise SaveError: si les données ne sont pas une sauvegarde valide de cette version.
+
+    >>> decode(b"pas une sauvegarde")
+    Traceback (most recent call last):
+    ...
+    SaveError: ce fichier n'est pas une sauvegarde
+    """
+    if len(data) < HEADER.size:
+        raise SaveError("ce fichier n'est pas une sauvegarde")
+    magic, version, checksum, size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SaveError("ce fichier n'est pas une sauvegarde")
+    if version != VERSION:
+        raise SaveError(f"version de sauvegarde inconnue : {version}")
+    compressed = data[HEADER.size:]
+    if zlib.crc32(compressed) != checksum:
+        raise SaveError("sauvegarde abîmée")
+
+    try:
+        payload = zlib.decompress(compressed)
+        if len(payload) != size:
+            raise SaveError("sauvegarde abîmée")
+
+        current_map, offset = _unpack_string(payload, 0)
+        x, y, hp = PLAYER.unpack_from(payload, offset)
+        offset += PLAYER.size
+        player = PlayerSnapshot((x, y), hp)
+
+        npcs = dict()
+        (map_count,) = COUNT.unpack_from(payload, offset)
+        offset += COUNT.size
+        for _ in range(map_count):
+            name, offset = _unpack_string(payload, offset)
+            (npc_count,) = COUNT.unpack_from(payload, offset)
+            offset += COUNT.size
+            states = []
+            for _ in range(npc_count):
+                flags, current_point, hp, x, y = NPC.unpack_from(payload, offset)
+                offset += NPC.size
+                position = (x, y) if flags & NPC_PLACED else None
+                states.append(NPCSnapshot(position, hp, bool(flags & NPC_KILLED), current_point))
+            npcs[name] = tuple(states)
+    except (zlib.error, struct.error, UnicodeDecodeError) as error:
+        raise SaveError(f"sauvegarde abîmée : {error}") from error
+
+    return GameSnapshot(current_map, player, npcs)
+
+
+def save(snapshot, path=DEFAULT_SAVE_PATH):
+    """
+    Écrit l'état d'une partie dans un fichier, sans jamais laisser de fichier à moitié écrit.
+
+    :param snapshot: (GameSnapshot) L'état de la partie.
+    :param path: (str) Le chemin du fichier de sauvegarde.
+    :return: (int) La taille de la sauvegarde en octets.
+
+    >>> save(map_manager.snapshot())  # Ceci sauvegardera la partie dans saves/partie.sav
+    """
+    data = encode(snapshot)
+
+    # Écrire dans un fichier temporaire puis le renommer : l'ancienne sauvegarde reste intacte jusqu'au dernier moment
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+    return len(data)
+
+
+def load(path=DEFAULT_SAVE_PATH):
+    """
+    Lit un fichier de sauvegarde.
+
+    :param path: (str) Le chemin du fichier de sauvegarde.
+    :return: (GameSnapshot) L'état de la partie.
+    :raise SaveError: si le fichier n'est pas une sauvegarde valide de cette version.
+    :raise OSError: si le fichier ne peut pas être lu.
+
+    >>> map_manager.restore(load())  # Ceci reprendra la partie sauvegardée
+    """
+    with open(path, "rb") as file:
+        return decode(file.read())
+
+
+class AutoSaver:
+    """
+    Classe AutoSaver qui sauvegarde la partie régulièrement sans ralentir le jeu.
+
+    Le thread principal ne fait que garder l'état de la partie (MapManager.snapshot). Un thread de sauvegarde
+    code, compresse et écrit le fichier. Si une nouvelle sauvegarde est demandée avant la fin de la précédente,
+    seul le dernier état est écrit.
+
+    :param path: (str) Le chemin du fichier de sauvegarde.
+    :param interval: (float) Le temps de jeu en secondes entre deux sauvegardes automatiques.
+    :return: None
+
+    >>> autosaver = AutoSaver(DEFAULT_SAVE_PATH)
+    >>> autosaver.update(1 / 60, map_manager)  # Ceci sauvegardera la partie toutes les 30 secondes de jeu
+    """
+
+    def __init__(self, path=DEFAULT_SAVE_PATH, interval=AUTOSAVE_INTERVAL):
+        """
+        Initialise la sauvegarde automatique ; le thread de sauvegarde démarre à la première sauvegarde.
+
+        :param path: (str) Le chemin du fichier de sauvegarde.
+        :param interval: (float) Le temps de jeu en secondes entre deux sauvegardes automatiques.
+        :return: None
+        """
+        self.path = path
+        self.interval = interval
+        self.elapsed = 0.0  # temps de jeu depuis la dernière sauvegarde
+        self.saves = 0  # nombre de sauvegardes écrites
+        self.last_save_seconds = 0.0  # durée de la dernière écriture, dans le thread de sauvegarde
+        self._pending = None  # dernier état en attente d'écriture
+        self._condition = threading.Condition()
+        self._worker = None
+        self._writing = False
+        self._closed = False
+
+    def update(self, dt, map_manager):
+        """
+        Compte le temps de jeu et demande une sauvegarde quand l'intervalle est écoulé.
+
+        :param dt: (float) La durée du tick en secondes.
+        :param map_manager: (MapManager) Le gestionnaire de cartes dont l'état est sauvegardé.
+        :return: None
+        """
+        self.elapsed += dt
+        if self.elapsed >= self.interval:
+            self.elapsed = 0.0
+            self.request(map_manager.snapshot())
+
+    def request(self, snapshot):
+        """
+        Demande l'écriture d'un état de la partie par le thread de sauvegarde, sans attendre.
+
+        :param snapshot: (GameSnapshot) L'état de la partie.
+        :return: None
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._pending = snapshot
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._save_worker, daemon=True)
+                self._worker.start()
+            self._condition.notify()
+
+    def wait(self):
+        """
+        Attend que les sauvegardes demandées soient écrites.
+
+        :return: None
+        """
+        with self._condition:
+            while self._pending is not None or self._writing:
+                self._condition.wait()
+
+    def close(self, snapshot=None):
+        """
+        Écrit un dernier état (en quittant le jeu), attend la fin des écritures et arrête le thread de sauvegarde.
+
+        :param snapshot: (GameSnapshot) Le dernier état à sauvegarder, None pour ne rien ajouter.
+        :return: None
+        """
+        if snapshot is not None:
+            self.request(snapshot)
+        self.wait()
+        with self._condition:
+            self._closed = True
+            worker = self._worker
+            self._condition.notify()
+        if worker is not None:
+            worker.join()
+
+    def _save_worker(self):
+        """
+        Écrit les états demandés l'un après l'autre, jusqu'à la fermeture.
+
+        :return: None
+        """
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    self._worker = None
+                    return
+                snapshot = self._pending
+                self._pending = None
+                self._writing = True
+
+            start = time.perf_counter()
+            try:
+                save(snapshot, self.path)
+                self.saves += 1
+            except OSError as error:  # la partie continue, la prochaine sauvegarde réessaiera
+                print(f"Avertissement : sauvegarde impossible : {error}")
+            self.last_save_seconds = time.perf_counter() - start
+
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
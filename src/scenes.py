@@ -0,0 +1,238 @@
+import os
+
+import pygame
+
+from combat import Combat
+
+# Définir le répertoire de base du projet
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GAME_OVER_DELAY = 3  # secondes d'écran de fin avant de recommencer la partie
+
+# Le message de fin de partie, dessiné à la première mort puis réutilisé (voir game_over_text)
+_game_over_text = []
+
+
+class Scene:
+    """
+    Classe Scene, mère des états du jeu (exploration, dialogue, combat, fin de partie).
+
+    La boucle principale du jeu appelle, à chaque image, handle_event pour chaque événement,
+    update une fois par tick de simulation, puis render une fois. Une scène n'a jamais sa propre boucle :
+    elle passe à la suivante avec game.change_scene().
+
+    :param game: (Game) Le jeu auquel appartient la scène.
+    :return: None
+
+    >>> scene = ExplorationScene(game)  # Ceci créera la scène d'exploration du jeu
+    """
+
+    def __init__(self, game):
+        """
+        Initialise la scène.
+
+        :param game: (Game) Le jeu auquel appartient la scène.
+        :return: None
+        """
+        self.game = game
+
+    def handle_event(self, event):
+        """
+        Traite un événement pygame (touche appuyée...).
+
+        :param event: (pygame.event.Event) L'événement.
+        :return: None
+        """
+
+    def update(self):
+        """
+        Fait avancer la scène d'un tick de simulation (game.dt secondes).
+
+        :return: None
+        """
+
+    def render(self, alpha):
+        """
+        Dessine la scène et l'envoie à l'écran.
+
+        :param alpha: (float) La part du tick suivant déjà écoulée, pour placer les sprites entre deux ticks.
+        :return: None
+        """
+        self.game.draw(alpha)
+
+
+class ExplorationScene(Scene):
+    """
+    Classe ExplorationScene : le joueur se déplace sur la carte ; ESPACE à côté d'un NPC lance un dialogue.
+
+    :param game: (Game) Le jeu auquel appartient la scène.
+    :return: None
+    """
+
+    def handle_event(self, event):
+        """
+        Lance le dialogue avec le NPC que le joueur touche quand ESPACE est appuyé.
+
+        :param event: (pygame.event.Event) L'événement.
+        :return: None
+        """
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            npc = self.game.map_manager.npc_in_contact()
+            if npc is not None:
+                self.game.change_scene(DialogScene(self.game, npc))
+
+    def update(self):
+        """
+        Fait avancer le monde d'un tick : entrées du joueur, déplacements et collisions.
+
+        :return: None
+        """
+        self.game.tick()
+
+
+class DialogScene(Scene):
+    """
+    Classe DialogScene : le NPC parle, le monde continue de bouger derrière la boîte de dialogue,
+    mais le joueur ne se déplace plus. À la fin du dialogue, le combat commence.
+
+    :param game: (Game) Le jeu auquel appartient la scène.
+    :param npc: (NPC) Le NPC qui parle.
+    :return: None
+    """
+
+    def __init__(self, game, npc):
+        """
+        Ouvre la boîte de dialogue avec les textes du NPC.
+
+        :param game: (Game) Le jeu auquel appartient la scène.
+        :param npc: (NPC) Le NPC qui parle.
+        :return: None
+        """
+        super().__init__(game)
+        self.npc = npc
+        game.dialog_box.execute([npc.dialog], [npc])
+
+    def handle_event(self, event):
+        """
+        Passe au texte suivant quand ESPACE est appuyé.
+
+        :param event: (pygame.event.Event) L'événement.
+        :return: None
+        """
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            self.game.dialog_box.next_text()
+
+    def update(self):
+        """
+        Écrit le dialogue lettre par lettre et fait bouger le monde, sans les entrées du joueur.
+
+        :return: None
+        """
+        game = self.game
+        game.map_manager.save_previous_positions()
+        game.map_manager.update(game.dt)
+
+        game.dialog_box.update(game.dt)
+
+        if not game.dialog_box.reading:
+            # UNE FOIS les dialogues terminés, lancer le combat
+            game.change_scene(CombatScene(game, self.npc))
+
+
+class CombatScene(Scene):
+    """
+    Classe CombatScene : le joueur et le NPC s'attaquent chacun leur tour, un tour par tick.
+
+    :param game: (Game) Le jeu auquel appartient la scène.
+    :param npc: (NPC) Le NPC combattu.
+    :return: None
+    """
+
+    def __init__(self, game, npc):
+        """
+        Commence le combat.
+
+        :param game: (Game) Le jeu auquel appartient la scène.
+        :param npc: (NPC) Le NPC combattu.
+        :return: None
+        """
+        super().__init__(game)
+        self.combat = Combat(game.player, npc, game.screen, game)
+
+    def update(self):
+        """
+        Joue un tour ; à la fin du combat, retourne à l'exploration ou passe à l'écran de fin de partie.
+
+        :return: None
+        """
+        if not self.combat.is_over():
+            self.combat.play_turn()
+            return
+
+        if self.combat.finish():
+            self.game.change_scene(ExplorationScene(self.game))
+        else:
+            self.game.change_scene(GameOverScene(self.game))
+
+
+class GameOverScene(Scene):
+    """
+    Classe GameOverScene : écran noir « Vous êtes mort » pendant quelques secondes, puis la partie recommence.
+
+    :param game: (Game) Le jeu auquel appartient la scène.
+    :return: None
+    """
+
+    def __init__(self, game):
+        """
+        Prépare l'écran de fin de partie.
+
+        :param game: (Game) Le jeu auquel appartient la scène.
+        :return: None
+        """
+        super().__init__(game)
+        self.time = 0.0
+        self.text = game_over_text()
+
+    def update(self):
+        """
+        Compte le temps passé sur l'écran de fin, puis réinitialise la partie.
+
+        :return: None
+        """
+        self.time += self.game.dt
+        if self.time >= GAME_OVER_DELAY:
+            self.game.reset_game()  # la partie recommence avec la scène d'exploration
+
+    def render(self, alpha):
+        """
+        Dessine l'écran noir et le message au centre.
+
+        :param alpha: (float) Non utilisé : rien ne bouge sur cet écran.
+        :return: None
+        """
+        screen = self.game.screen
+        screen.fill((0, 0, 0))
+        screen.blit(self.text, self.text.get_rect(center=(screen.get_width() / 2, screen.get_height() / 2)))
+        self.game.present()
+
+
+
+def game_over_text():
+    """
+    Donne le message « Vous êtes mort » : la police n'est lue et le texte dessiné qu'à la première mort.
+
+    :return: (pygame.Surface) Le message, partagé par tous les écrans de fin.
+
+    >>> text = game_over_text()  # Ceci donnera le message de fin de partie
+    """
+    if not _game_over_text:
+        font_path = os.path.join(BASE_DIR, 'dialogs', 'dialog_font.ttf')
+        font = pygame.font.Font(font_path, 36)
+        _game_over_text.append(font.render("Vous êtes mort", True, (255, 255, 255)))
+    return _game_over_text[0]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,145 @@
+import json
+import random
+
+import pygame
+
+# nom utilisé dans les scripts -> touche pygame
+KEYS = {
+    "UP": pygame.K_UP,
+    "DOWN": pygame.K_DOWN,
+    "LEFT": pygame.K_LEFT,
+    "RIGHT": pygame.K_RIGHT,
+}
+
+
+class PressedKeys:
+    """
+    Classe PressedKeys qui imite le résultat de pygame.key.get_pressed() pour un ensemble de touches.
+
+    :param keys: (set) Les touches pygame enfoncées.
+    :return: None
+
+    >>> pressed = PressedKeys({pygame.K_UP})
+    >>> pressed[pygame.K_UP], pressed[pygame.K_DOWN]
+    (True, False)
+    """
+
+    def __init__(self, keys):
+        """
+        Initialise l'état des touches.
+
+        :param keys: (set) Les touches pygame enfoncées.
+        :return: None
+        """
+        self.keys = frozenset(keys)
+
+    def __getitem__(self, key):
+        return key in self.keys
+
+
+class ScriptedInput:
+    """
+    Classe ScriptedInput qui remplace le clavier par un script : une suite d'étapes
+    (nombre de ticks, touches enfoncées), rejouée tick par tick.
+
+    Elle offre la même méthode get_pressed() que pygame.key, pour être utilisée par Game.handle_input.
+
+    :param steps: (list) Les étapes du script : [(ticks, ["UP", ...]), ...].
+    :param loop: (bool) True pour recommencer le script une fois terminé.
+    :return: None
+    :CU: all(ticks > 0 for ticks, keys in steps)
+
+    >>> script = ScriptedInput([(2, ["UP"]), (1, [])])
+    >>> states = []
+    >>> for _ in range(4):
+    ...     states.append(script.get_pressed()[pygame.K_UP])
+    ...     script.tick()
+    >>> states
+    [True, True, False, True]
+    """
+
+    def __init__(self, steps, loop=True):
+        """
+        Initialise le script au début de sa première étape.
+
+        :param steps: (list) Les étapes du script : [(ticks, ["UP", ...]), ...].
+        :param loop: (bool) True pour recommencer le script une fois terminé.
+        :return: None
+        """
+        self.steps = [(ticks, PressedKeys(KEYS[key] for key in keys)) for ticks, keys in steps]
+        self.loop = loop
+        self.released = PressedKeys(())
+        self.step_index = 0
+        self.step_tick = 0
+        self.pressed = self.steps[0][1] if self.steps else self.released
+
+    @classmethod
+    def random_walk(cls, seed, steps=1000, min_ticks=10, max_ticks=120):
+        """
+        Crée un script de déplacements aléatoires, toujours le même pour une même graine.
+
+        :param seed: (int) La graine du générateur aléatoire.
+        :param steps: (int) Le nombre d'étapes du script.
+        :param min_ticks: (int) La durée minimale d'une étape, en ticks.
+        :param max_ticks: (int) La durée maximale d'une étape, en ticks.
+        :return: (ScriptedInput) Le script créé.
+
+        >>> script = ScriptedInput.random_walk(42)  # Ceci créera une promenade aléatoire reproductible
+        """
+        generator = random.Random(seed)
+        choices = [[], ["UP"], ["DOWN"], ["LEFT"], ["RIGHT"]]
+        return cls([(generator.randint(min_ticks, max_ticks), generator.choice(choices)) for _ in range(steps)])
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Lit un script au format JSON : [[ticks, ["UP", ...]], ...].
+
+        :param path: (str) Le chemin du fichier.
+        :return: (ScriptedInput) Le script lu.
+        :raise ValueError: si le fichier n'est pas du JSON ou nomme une touche absente de KEYS.
+
+        >>> script = ScriptedInput.from_file("parcours.json")  # Ceci lira le script "parcours.json"
+        """
+        with open(path, encoding="utf-8") as file:
+            steps = [(ticks, keys) for ticks, keys in json.load(file)]
+        for ticks, keys in steps:
+            for key in keys:
+                if key not in KEYS:
+                    raise ValueError(f"touche inconnue dans {path} : {key!r} (touches possibles : {', '.join(KEYS)})")
+        return cls(steps)
+
+    def get_pressed(self):
+        """
+        Donne les touches enfoncées pendant le tick actuel.
+
+        :return: (PressedKeys) Les touches enfoncées.
+        """
+        return self.pressed
+
+    def tick(self):
+        """
+        Passe au tick suivant du script.
+
+        :return: None
+        """
+        if not self.steps:
+            return
+
+        self.step_tick += 1
+        if self.step_tick >= self.steps[self.step_index][0]:
+            self.step_tick = 0
+            self.step_index += 1
+            if self.step_index >= len(self.steps):
+                if not self.loop:
+                    self.step_index = len(self.steps) - 1
+                    self.pressed = self.released
+                    self.steps = []
+                    return
+                self.step_index = 0
+            self.pressed = self.steps[self.step_index][1]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PlayerSnapshot:
+    """
+    Classe PlayerSnapshot qui garde l'état du joueur à un instant de la partie.
+
+    :param position: (tuple) La position (x, y) du joueur.
+    :param hp: (int) Les points de vie du joueur.
+    :return: None
+
+    >>> PlayerSnapshot((120.0, 64.0), 100).hp
+    100
+    """
+    position: tuple
+    hp: int
+
+
+@dataclass(frozen=True)
+class NPCSnapshot:
+    """
+    Classe NPCSnapshot qui garde l'état d'un NPC à un instant de la partie.
+
+    :param position: (tuple) La position (x, y) du NPC, None si son chemin n'était pas encore chargé
+                     (il sera alors placé au point current_point de son chemin).
+    :param hp: (int) Les points de vie du NPC.
+    :param killed: (bool) True si le NPC a été vaincu.
+    :param current_point: (int) L'indice du dernier point atteint sur son chemin.
+    :return: None
+
+    >>> NPCSnapshot(None, 50, False, 0).killed
+    False
+    """
+    position: tuple
+    hp: int
+    killed: bool
+    current_point: int
+
+
+@dataclass(frozen=True)
+class GameSnapshot:
+    """
+    Classe GameSnapshot qui garde l'état d'une partie : carte actuelle, joueur et NPCs de chaque carte.
+
+    Seul l'état de la partie est gardé : les cartes chargées, leurs rendus, les polices et les images
+    sont réutilisés tels quels quand l'état est restauré.
+
+    :param current_map: (str) Le nom de la carte actuelle.
+    :param player: (PlayerSnapshot) L'état du joueur.
+    :param npcs: (dict) Le nom de chaque carte -> les états de ses NPCs, dans l'ordre de leur enregistrement.
+    :return: None
+
+    >>> snapshot = map_manager.snapshot()  # Ceci gardera l'état de la partie
+    >>> map_manager.restore(snapshot)  # Ceci remettra la partie dans cet état
+    """
+    current_map: str
+    player: PlayerSnapshot
+    npcs: dict
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
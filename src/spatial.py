@@ -0,0 +1,135 @@
+import pygame
+
+
+class SpatialHash:
+    """
+    Classe SpatialHash qui range des rectangles statiques dans une grille de cases,
+    pour ne tester que les rectangles proches lors d'une recherche de collision.
+
+    :param cell_size: (int) La taille d'une case de la grille en pixels (une tuile par défaut).
+    :return: None
+    :CU: cell_size > 0
+
+    >>> walls = SpatialHash(16)
+    >>> walls.insert(pygame.Rect(32, 32, 16, 16), "mur")
+    >>> walls.collides(pygame.Rect(40, 40, 4, 4)), walls.collides(pygame.Rect(0, 0, 4, 4))
+    (True, False)
+    >>> walls.query(pygame.Rect(40, 40, 4, 4))
+    ['mur']
+    """
+
+    def __init__(self, cell_size=16):
+        """
+        Initialise une grille vide.
+
+        :param cell_size: (int) La taille d'une case de la grille en pixels.
+        :return: None
+        """
+        self.cell_size = cell_size
+        self.cells = dict()    # (colonne, ligne) -> liste des rectangles qui touchent la case
+        self.values = dict()   # (colonne, ligne) -> valeurs associées, dans le même ordre
+        self.count = 0
+
+    @classmethod
+    def from_rects(cls, rects, cell_size=16):
+        """
+        Construit une grille contenant des rectangles (la valeur associée est le rectangle lui-même).
+
+        :param rects: (list) Les rectangles à ranger.
+        :param cell_size: (int) La taille d'une case de la grille en pixels.
+        :return: (SpatialHash) La grille construite.
+
+        >>> walls = SpatialHash.from_rects(map.walls, 16)  # Ceci rangera les murs d'une carte
+        """
+        grid = cls(cell_size)
+        for rect in rects:
+            grid.insert(rect, rect)
+        return grid
+
+    def _cell_range(self, rect):
+        """
+        Donne les colonnes et les lignes des cases touchées par un rectangle.
+
+        :param rect: (pygame.Rect) Le rectangle.
+        :return: (tuple) Les colonnes (range) et les lignes (range).
+        """
+        size = self.cell_size
+        return (range(rect.left // size, (rect.right - 1) // size + 1),
+                range(rect.top // size, (rect.bottom - 1) // size + 1))
+
+    def insert(self, rect, value=None):
+        """
+        Range un rectangle dans toutes les cases qu'il touche.
+
+        :param rect: (pygame.Rect) Le rectangle à ranger.
+        :param value: La valeur renvoyée par query quand ce rectangle est touché.
+        :return: None
+        """
+        rect = pygame.Rect(rect)
+        columns, rows = self._cell_range(rect)
+        for row in rows:
+            for column in columns:
+                self.cells.setdefault((column, row), []).append(rect)
+                self.values.setdefault((column, row), []).append(value)
+        self.count += 1
+
+    def collides(self, rect, x=None, y=None):
+        """
+        Indique si un rectangle touche au moins un des rectangles rangés.
+
+        Avec la position (x, y) du rectangle avant que pygame ne l'arrondisse, les cases sont calculées sans lire
+        le rectangle : le test ne crée alors aucun objet, quelle que soit la taille de la carte.
+
+        :param rect: (pygame.Rect) Le rectangle à tester (par exemple les pieds d'un sprite).
+        :param x: (float) La position x non arrondie du rectangle, positive ; rect.x par défaut.
+        :param y: (float) La position y non arrondie du rectangle, positive ; rect.y par défaut.
+        :return: (bool) True s'il y a une collision.
+
+        >>> SpatialHash.from_rects([pygame.Rect(32, 32, 16, 16)]).collides(pygame.Rect(30, 30, 4, 4), 29.6, 29.5)
+        True
+        """
+        if x is None:
+            x, y = rect.x, rect.y
+        size = self.cell_size
+        cells = self.cells
+        # pygame arrondit au pixel le plus proche : x + 0.5 arrondi vers le bas donne la même case.
+        # Les cases restent des flottants, que Python réutilise : un entier au-delà de 256 serait créé à chaque
+        # calcul. (3.0, 4.0) trouve la case (3, 4) du dictionnaire, les deux clés étant égales et de même hash
+        left = (x + 0.5) // size
+        right = (x + 0.5 + rect.width - 1) // size
+        row = (y + 0.5) // size
+        bottom = (y + 0.5 + rect.height - 1) // size
+        while row <= bottom:  # boucles while : range et for créeraient des objets
+            column = left
+            while column <= right:
+                bucket = cells.get((column, row))
+                if bucket and rect.collidelist(bucket) > -1:
+                    return True
+                column += 1
+            row += 1
+        return False
+
+    def query(self, rect):
+        """
+        Récupère les valeurs des rectangles rangés qui touchent un rectangle, sans doublon.
+
+        :param rect: (pygame.Rect) Le rectangle à tester.
+        :return: (list) Les valeurs des rectangles touchés.
+        """
+        found = []
+        columns, rows = self._cell_range(rect)
+        for row in rows:
+            for column in columns:
+                bucket = self.cells.get((column, row))
+                if not bucket:
+                    continue
+                values = self.values[(column, row)]
+                for index in rect.collidelistall(bucket):
+                    if values[index] not in found:
+                        found.append(values[index])
+        return found
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """
+    Classe StartupReport qui mesure la durée de chaque phase du démarrage du jeu.
+
+    Les mesures ne sont enregistrées que si le rapport est activé (option --startup-report).
+
+    :return: None
+
+    >>> report = StartupReport()
+    >>> report.enabled = True
+    >>> with report.phase("imports"):
+    ...     pass
+    >>> [name for name, depth, duration in report.phases]
+    ['imports']
+    """
+
+    def __init__(self):
+        """
+        Initialise un rapport de démarrage vide et désactivé.
+
+        :return: None
+        """
+        self.enabled = False
+        self.phases = []  # liste de (nom, profondeur, durée en secondes)
+        self.output_path = None
+        self.finished = False
+        self._depth = 0
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Mesure la durée du bloc de code qu'il entoure.
+
+        :param name: (str) Le nom de la phase mesurée.
+        :return: None
+        :CU: type(name) == str
+
+        >>> with startup_report.phase("pygame.init"):  # Ceci mesurera la durée de pygame.init()
+        ...     pygame.init()
+        """
+        # seules les phases du thread principal font partie du démarrage
+        if not self.enabled or self.finished or threading.current_thread() is not threading.main_thread():
+            yield
+            return
+
+        index = len(self.phases)
+        self.phases.append((name, self._depth, 0.0))  # réserver la place pour garder l'ordre d'appel
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.phases[index] = (name, self._depth, time.perf_counter() - start)
+
+    def finish(self):
+        """
+        Termine le rapport : l'affiche et l'ajoute au fichier JSON demandé s'il y en a un.
+
+        :return: None
+
+        >>> startup_report.finish()  # Ceci affichera le rapport de démarrage
+        """
+        if not self.enabled or self.finished:
+            return
+        self.finished = True
+        total = time.perf_counter() - self._start
+
+        print("===== Rapport de démarrage =====")
+        for name, depth, duration in self.phases:
+            print(f"{'  ' * depth}{name:<{40 - 2 * depth}} {duration * 1000:9.1f} ms")
+        print(f"{'total':<40} {total * 1000:9.1f} ms")
+
+        if self.output_path:
+            record = {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "total_ms": round(total * 1000, 3),
+                "phases": [{"name": name, "depth": depth, "ms": round(duration * 1000, 3)}
+                           for name, depth, duration in self.phases],
+            }
+            with open(self.output_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+
+
+# Rapport partagé par tous les modules du jeu
+startup_report = StartupReport()
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,589 @@
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+import numpy as np
+import pygame
+import pyscroll
+
+from collision_grid import CollisionGrid
+from pathfinding import Pathfinder
+from spatial import SpatialHash
+
+STREAM_CHUNK_TILES = 32  # côté d'un bloc de carte chargé d'un coup, en tuiles
+STREAM_RADIUS = 2  # blocs simulés autour du bloc du joueur : 5 x 5 blocs, bien plus que la vue et ses marges
+STREAM_LOOKAHEAD = 1  # blocs préchargés au-delà, dans la direction où va le joueur
+MAX_RESIDENT_BYTES = 8 * 1024 * 1024  # mémoire des blocs gardés : au-delà, les moins récemment utilisés sont libérés
+STREAM_MIN_TILES = 256 * 256  # les cartes plus grandes sont découpées en blocs (voir MapManager)
+
+
+@dataclass
+class StreamChunk:
+    """
+    Classe StreamChunk qui représente un bloc chargé d'une carte découpée : ses tuiles et ses murs.
+
+    :param key: (tuple) La colonne et la ligne du bloc.
+    :param left: (int) La colonne de sa première tuile.
+    :param top: (int) La ligne de sa première tuile.
+    :param tiles: (dict) Les gids de ses tuiles, par calque : tableaux (lignes, colonnes).
+    :param walls: (list) Les rectangles des murs qui touchent le bloc (un mur à cheval est dans chaque bloc).
+    :param blocked: (numpy.ndarray) Les tuiles du bloc touchées par un mur (lignes, colonnes).
+    :return: None
+    """
+    key: tuple
+    left: int
+    top: int
+    tiles: dict
+    walls: list
+    blocked: np.ndarray
+
+    @property
+    def nbytes(self):
+        """
+        Estime la mémoire occupée par le bloc.
+
+        :return: (int) La mémoire estimée, en octets.
+        """
+        return sum(tiles.nbytes for tiles in self.tiles.values()) + self.blocked.nbytes + 64 * len(self.walls)
+
+
+@dataclass
+class StreamWindow:
+    """
+    Classe StreamWindow qui regroupe les données de collision des blocs simulés autour du joueur.
+
+    :param center: (tuple) Le bloc du joueur quand la fenêtre a été demandée.
+    :param keys: (list) Les blocs couverts.
+    :param rect: (pygame.Rect) La partie de la carte couverte, en pixels.
+    :param walls: (list) Les murs qui touchent ces blocs, chacun une seule fois.
+    :param wall_index: (SpatialHash) Ces murs rangés par case.
+    :param collision_grid: (CollisionGrid) Les tuiles bloquées de ces blocs (grille dont l'origine est le premier bloc).
+    :param pathfinder: (Pathfinder) La recherche de chemins sur ces blocs.
+    :param chunks: (list) Les blocs utilisés, à garder en mémoire.
+    :return: None
+    """
+    center: tuple
+    keys: list
+    rect: pygame.Rect
+    walls: list
+    wall_index: SpatialHash
+    collision_grid: CollisionGrid
+    pathfinder: Pathfinder
+    chunks: list
+
+
+class MapChunkSource:
+    """
+    Classe MapChunkSource qui découpe en blocs une carte lue en entier : carte compilée (projetée en mémoire,
+    seules les pages des blocs lus sont chargées par le système) ou pytmx.TiledMap.
+
+    Les murs sont rangés une fois par bloc au chargement ; les tuiles ne sont copiées qu'à la lecture d'un bloc.
+    load peut être appelée en même temps depuis plusieurs threads : la source n'est jamais modifiée.
+
+    :param tmx_data: (CompiledMap ou pytmx.TiledMap) La carte.
+    :param chunk_tiles: (int) Le côté d'un bloc, en tuiles.
+    :return: None
+    :CU: chunk_tiles > 0
+
+    >>> source = MapChunkSource(tmx_data)  # Ceci préparera la carte pour être lue bloc par bloc
+    >>> source.load((0, 0)).tiles[0].shape
+    (32, 32)
+    """
+
+    def __init__(self, tmx_data, chunk_tiles=STREAM_CHUNK_TILES):
+        """
+        Prépare la lecture des tuiles et range les murs par bloc.
+
+        :param tmx_data: (CompiledMap ou pytmx.TiledMap) La carte.
+        :param chunk_tiles: (int) Le côté d'un bloc, en tuiles.
+        :return: None
+        """
+        self.tmx = tmx_data
+        self.chunk_tiles = chunk_tiles
+        self.width, self.height = tmx_data.width, tmx_data.height
+        self.tilewidth, self.tileheight = tmx_data.tilewidth, tmx_data.tileheight
+        self.columns = -(-self.width // chunk_tiles)
+        self.rows = -(-self.height // chunk_tiles)
+        self.visible_tile_layers = list(tmx_data.visible_tile_layers)
+
+        # calque -> tableau (lignes, colonnes) des gids, sans copie pour une carte compilée
+        self.layers = dict()
+        for layer in self.visible_tile_layers:
+            data = tmx_data.layers[layer].data
+            if isinstance(data, memoryview):
+                self.layers[layer] = np.frombuffer(data, dtype=np.uint32).reshape(self.height, self.width)
+            else:
+                self.layers[layer] = np.asarray(data, dtype=np.uint32).reshape(self.height, self.width)
+
+        self.walls = dict()  # (colonne, ligne) du bloc -> murs qui le touchent
+        chunk_width, chunk_height = chunk_tiles * self.tilewidth, chunk_tiles * self.tileheight
+        for object in tmx_data.objects:
+            if object.type != "collision":
+                continue
+            wall = pygame.Rect(object.x, object.y, object.width, object.height)
+            if wall.width <= 0 or wall.height <= 0:
+                continue
+            for row in range(wall.top // chunk_height, (wall.bottom - 1) // chunk_height + 1):
+                for column in range(wall.left // chunk_width, (wall.right - 1) // chunk_width + 1):
+                    self.walls.setdefault((column, row), []).append(wall)
+
+    def load(self, key):
+        """
+        Lit un bloc de la carte.
+
+        :param key: (tuple) La colonne et la ligne du bloc.
+        :return: (StreamChunk) Le bloc, plus petit au bord droit et en bas de la carte.
+        """
+        column, row = key
+        left, top = column * self.chunk_tiles, row * self.chunk_tiles
+        right, bottom = min(left + self.chunk_tiles, self.width), min(top + self.chunk_tiles, self.height)
+        tiles = {layer: np.array(data[top:bottom, left:right]) for layer, data in self.layers.items()}
+        walls = self.walls.get(key, [])
+        blocked = CollisionGrid.from_rects(walls, right - left, bottom - top, self.tilewidth, self.tileheight,
+                                           (left, top)).blocked
+        return StreamChunk(key, left, top, tiles, walls, blocked)
+
+
+class ChunkStreamer:
+    """
+    Classe ChunkStreamer qui garde en mémoire les blocs d'une carte découpée autour du joueur.
+
+    Les blocs à moins de radius blocs de celui du joueur forment la fenêtre simulée (StreamWindow) : ses murs,
+    sa grille de collision et sa recherche de chemins remplacent ceux de la carte entière. Quand le joueur change
+    de bloc, la fenêtre suivante est construite par un thread, avec les blocs qui manquent, et ceux qui sont
+    devant le joueur sont préchargés ; la fenêtre actuelle sert jusqu'à ce que la suivante soit prête.
+    Les blocs hors de la fenêtre restent en cache tant que leur mémoire ne dépasse pas max_bytes.
+
+    Appelé à chaque tick, update ne crée aucun objet tant que le joueur reste dans son bloc.
+
+    :param source: (MapChunkSource) La carte découpée.
+    :param radius: (int) Le nombre de blocs simulés autour du bloc du joueur.
+    :param lookahead: (int) Le nombre de blocs préchargés au-delà, dans la direction du joueur.
+    :param max_bytes: (int) La mémoire maximale des blocs gardés en cache.
+    :return: None
+    :CU: radius >= 1
+
+    >>> stream = ChunkStreamer(MapChunkSource(tmx_data))
+    >>> stream.ensure(160, 608)  # Ceci chargera les blocs autour de ce point et construira leur fenêtre
+    >>> stream.update(player.rect)  # Ceci suivra le joueur, True quand une nouvelle fenêtre est prête
+    """
+
+    def __init__(self, source, radius=STREAM_RADIUS, lookahead=STREAM_LOOKAHEAD, max_bytes=MAX_RESIDENT_BYTES):
+        """
+        Initialise un découpage sans bloc chargé.
+
+        :param source: (MapChunkSource) La carte découpée.
+        :param radius: (int) Le nombre de blocs simulés autour du bloc du joueur.
+        :param lookahead: (int) Le nombre de blocs préchargés au-delà.
+        :param max_bytes: (int) La mémoire maximale des blocs gardés.
+        :return: None
+        """
+        self.source = source
+        self.radius = radius
+        self.lookahead = lookahead
+        self.max_bytes = max_bytes
+        self.chunk_width = source.chunk_tiles * source.tilewidth
+        self.chunk_height = source.chunk_tiles * source.tileheight
+
+        self.resident = OrderedDict()  # (colonne, ligne) -> StreamChunk, du moins au plus récemment utilisé
+        self.nbytes = 0
+        self.window = None  # StreamWindow simulée
+        self.center = None  # bloc du joueur
+        self.bounds = pygame.Rect(0, 0, 0, 0)  # ce bloc en pixels : update ne fait rien tant que le joueur y reste
+        self.parked = dict()  # NPC hors de la fenêtre -> temps de jeu quand il en est sorti (voir MapManager)
+        self.loads = 0  # blocs lus
+        self.stalls = 0  # blocs lus par le jeu lui-même, faute d'avoir été préchargés à temps
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._pending = deque()  # tâches du thread : ("window", bloc central, blocs connus) ou ("chunk", bloc, None)
+        self._requested = set()  # blocs et fenêtres demandés au thread, pas encore reçus
+        self._finished = deque()  # résultats du thread, lus par le jeu (deque : ajout et retrait sûrs entre threads)
+        self._worker = None
+
+    def chunk_key(self, x, y):
+        """
+        Donne le bloc qui contient un point.
+
+        :param x: (float) La position x en pixels.
+        :param y: (float) La position y en pixels.
+        :return: (tuple) La colonne et la ligne du bloc, ramenées dans la carte.
+        """
+        column = min(max(int(x) // self.chunk_width, 0), self.source.columns - 1)
+        row = min(max(int(y) // self.chunk_height, 0), self.source.rows - 1)
+        return column, row
+
+    def window_keys(self, center):
+        """
+        Donne les blocs de la fenêtre centrée sur un bloc.
+
+        :param center: (tuple) Le bloc central.
+        :return: (list) Les blocs à moins de radius blocs, dans la carte, ligne par ligne.
+        """
+        column, row = center
+        columns = range(max(column - self.radius, 0), min(column + self.radius + 1, self.source.columns))
+        rows = range(max(row - self.radius, 0), min(row + self.radius + 1, self.source.rows))
+        return [(x, y) for y in rows for x in columns]
+
+    def get(self, key):
+        """
+        Récupère un bloc, en le lisant tout de suite s'il n'est pas en mémoire (voir stalls).
+
+        :param key: (tuple) La colonne et la ligne du bloc.
+        :return: (StreamChunk) Le bloc.
+        """
+        chunk = self.resident.get(key)
+        if chunk is None:
+            self.stalls += 1
+            chunk = self.source.load(key)
+            self.loads += 1
+            self._install(chunk)
+        return chunk
+
+    def ensure(self, x, y):
+        """
+        Rend simulée tout de suite la fenêtre autour d'un point (téléportation, chargement de la carte),
+        sans attendre le thread.
+
+        :param x: (float) La position x en pixels.
+        :param y: (float) La position y en pixels.
+        :return: (bool) True si une nouvelle fenêtre a été construite.
+        """
+        key = self.chunk_key(x, y)
+        self._enter(key)
+        if self.window is not None and self.window.center == key:
+            return False
+        self._activate(self._build_window(key, self._known(key)))
+        return True
+
+    def update(self, rect):
+        """
+        Suit le joueur : reçoit les blocs et les fenêtres préparés par le thread, et en demande de nouveaux
+        quand le joueur change de bloc.
+
+        :param rect: (pygame.Rect) Le rectangle du joueur.
+        :return: (bool) True si une nouvelle fenêtre est devenue simulée.
+        """
+        changed = False
+        if self._finished:
+            changed = self._collect()
+        if self.bounds.contains(rect):
+            return changed
+
+        key = self.chunk_key(*rect.center)
+        if key == self.center:
+            return changed  # à cheval sur deux blocs, toujours dans le même
+        previous = self.center
+        self._enter(key)
+        if self.window is None or not self.window.rect.contains(rect):
+            # sorti de la fenêtre (déplacement très rapide) : pas le temps d'attendre le thread
+            known = self._known(key)
+            self.stalls += len(self.window_keys(key)) - len(known)
+            self._activate(self._build_window(key, known))
+            return True
+
+        self._request("window", key, self._known(key))
+        if previous is not None:
+            self._prefetch_ahead(key, key[0] - previous[0], key[1] - previous[1])
+        return changed
+
+    def _enter(self, key):
+        """
+        Note le bloc du joueur.
+
+        :param key: (tuple) La colonne et la ligne du bloc.
+        :return: None
+        """
+        self.center = key
+        self.bounds.update(key[0] * self.chunk_width, key[1] * self.chunk_height, self.chunk_width, self.chunk_height)
+
+    def _known(self, center):
+        """
+        Donne les blocs déjà en mémoire de la fenêtre centrée sur un bloc, marqués comme récemment utilisés.
+
+        :param center: (tuple) Le bloc central.
+        :return: (dict) (colonne, ligne) -> StreamChunk.
+        """
+        known = dict()
+        for key in self.window_keys(center):
+            chunk = self.resident.get(key)
+            if chunk is not None:
+                self.resident.move_to_end(key)
+                known[key] = chunk
+        return known
+
+    def _prefetch_ahead(self, center, dx, dy):
+        """
+        Demande au thread les blocs juste après la fenêtre, dans la direction où va le joueur.
+
+        :param center: (tuple) Le nouveau bloc du joueur.
+        :param dx: (int) Le déplacement en colonnes de blocs depuis le bloc précédent.
+        :param dy: (int) Le déplacement en lignes de blocs.
+        :return: None
+        """
+        column, row = center
+        reach = self.radius + self.lookahead
+        keys = []
+        if dx:
+            step = 1 if dx > 0 else -1
+            keys += [(column + step * reach, y) for y in range(row - self.radius, row + self.radius + 1)]
+        if dy:
+            step = 1 if dy > 0 else -1
+            keys += [(x, row + step * reach) for x in range(column - self.radius, column + self.radius + 1)]
+        for key in keys:
+            if 0 <= key[0] < self.source.columns and 0 <= key[1] < self.source.rows and key not in self.resident:
+                self._request("chunk", key)
+
+    def _request(self, kind, value, known=None):
+        """
+        Confie une tâche au thread, en le démarrant s'il est arrêté.
+
+        :param kind: (str) "window" ou "chunk".
+        :param value: (tuple) Le bloc central de la fenêtre, ou le bloc à lire.
+        :param known: (dict) Les blocs de la fenêtre déjà en mémoire.
+        :return: None
+        """
+        with self._lock:
+            if (kind, value) in self._requested:
+                return
+            self._requested.add((kind, value))
+            self._pending.append((kind, value, known))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._stream_worker, daemon=True)
+                self._worker.start()
+
+    def wait(self):
+        """
+        Attend que le thread ait fini ses tâches, puis en reçoit les résultats.
+
+        :return: (bool) True si une nouvelle fenêtre est devenue simulée.
+        """
+        worker = self._worker
+        if worker is not None:
+            worker.join()
+        return self._collect()
+
+    def _stream_worker(self):
+        """
+        Fait les tâches en attente une par une, puis s'arrête quand il n'y en a plus.
+
+        :return: None
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._worker = None
+                    return
+                kind, value, known = self._pending.popleft()
+
+            try:
+                result = self._build_window(value, known) if kind == "window" else self.source.load(value)
+            except Exception as error:  # le bloc sera lu (et l'erreur levée) par le jeu, à la demande
+                print(f"Avertissement : lecture du bloc {value} impossible : {error}")
+                result = None
+            self._finished.append((kind, value, result))
+
+    def _collect(self):
+        """
+        Reçoit les résultats du thread : les blocs lus sont gardés, la fenêtre du bloc actuel devient simulée.
+
+        :return: (bool) True si une nouvelle fenêtre est devenue simulée.
+        """
+        changed = False
+        while self._finished:
+            kind, value, result = self._finished.popleft()
+            with self._lock:
+                self._requested.discard((kind, value))
+            if result is None:
+                continue
+            if kind == "chunk":
+                self.loads += 1
+                self._install(result)
+            elif value == self.center:
+                self._activate(result)
+                changed = True
+            # une fenêtre périmée (le joueur a encore changé de bloc) est oubliée
+        self._evict()
+        return changed
+
+    def _build_window(self, center, known):
+        """
+        Construit la fenêtre centrée sur un bloc, en lisant les blocs qui manquent (depuis le thread ou le jeu).
+
+        :param center: (tuple) Le bloc central.
+        :param known: (dict) Les blocs déjà en mémoire.
+        :return: (StreamWindow) La fenêtre.
+        """
+        source = self.source
+        keys = self.window_keys(center)
+        chunks = [known[key] if key in known else source.load(key) for key in keys]
+
+        left, top = chunks[0].left, chunks[0].top
+        last = chunks[-1]
+        right, bottom = last.left + last.blocked.shape[1], last.top + last.blocked.shape[0]
+        blocked = np.zeros((bottom - top, right - left), dtype=bool)
+        walls = []
+        seen = set()  # un mur à cheval sur deux blocs n'est gardé qu'une fois
+        for chunk in chunks:
+            rows, columns = chunk.blocked.shape
+            blocked[chunk.top - top:chunk.top - top + rows, chunk.left - left:chunk.left - left + columns] = chunk.blocked
+            for wall in chunk.walls:
+                if id(wall) not in seen:
+                    seen.add(id(wall))
+                    walls.append(wall)
+
+        wall_index = SpatialHash.from_rects(walls, source.tilewidth)
+        collision_grid = CollisionGrid(blocked, source.tilewidth, source.tileheight, (left, top), walls)
+        rect = pygame.Rect(left * source.tilewidth, top * source.tileheight,
+                           (right - left) * source.tilewidth, (bottom - top) * source.tileheight)
+        return StreamWindow(center, keys, rect, walls, wall_index, collision_grid,
+                            Pathfinder(collision_grid, wall_index), chunks)
+
+    def _install(self, chunk):
+        """
+        Garde un bloc lu en mémoire.
+
+        :param chunk: (StreamChunk) Le bloc.
+        :return: None
+        """
+        if chunk.key in self.resident:
+            self.resident.move_to_end(chunk.key)
+            return
+        self.resident[chunk.key] = chunk
+        self.nbytes += chunk.nbytes
+
+    def _activate(self, window):
+        """
+        Rend une fenêtre simulée : ses blocs sont gardés et marqués comme les plus récemment utilisés.
+
+        :param window: (StreamWindow) La fenêtre.
+        :return: None
+        """
+        self.loads += len([chunk for chunk in window.chunks if chunk.key not in self.resident])
+        for chunk in window.chunks:
+            self._install(chunk)
+        self.window = window
+        self._evict()
+
+    def _evict(self):
+        """
+        Libère les blocs les moins récemment utilisés tant que la mémoire dépasse max_bytes,
+        sauf ceux de la fenêtre simulée et de la fenêtre autour du joueur.
+
+        :return: None
+        """
+        if self.nbytes <= self.max_bytes:
+            return
+        keep = set(self.window.keys) if self.window is not None else set()
+        if self.center is not None:
+            keep.update(self.window_keys(self.center))
+        for key in [key for key in self.resident if key not in keep]:
+            if self.nbytes <= self.max_bytes:
+                return
+            self.nbytes -= self.resident.pop(key).nbytes
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Donne l'état du découpage, pour les mesures.
+
+        :return: (dict) Les blocs en mémoire, leur mémoire, les blocs lus, lus par le jeu et libérés.
+        """
+        return {"resident": len(self.resident), "bytes": self.nbytes, "loads": self.loads,
+                "stalls": self.stalls, "evictions": self.evictions}
+
+
+class StreamedMapData(pyscroll.data.PyscrollDataAdapter):
+    """
+    Classe StreamedMapData qui fournit au rendu de pyscroll les tuiles d'une carte découpée, lues dans ses blocs.
+
+    Une tuile d'un bloc pas encore en mémoire fait lire le bloc tout de suite (voir ChunkStreamer.get) :
+    le rendu ne dessine jamais de trou.
+
+    :param stream: (ChunkStreamer) Le découpage de la carte.
+    :param images: (list) Les images des tuiles par gid, celles de la carte par défaut.
+    :return: None
+
+    >>> map_data = StreamedMapData(stream)  # Ceci préparera la carte découpée pour pyscroll
+    """
+
+    def __init__(self, stream, images=None):
+        """
+        Initialise l'adaptateur (les cartes découpées n'ont pas de tuiles animées).
+
+        :param stream: (ChunkStreamer) Le découpage de la carte.
+        :param images: (list) Les images des tuiles par gid.
+        :return: None
+        """
+        super().__init__()
+        self.stream = stream
+        self.tmx = stream.source.tmx  # images agrandies sur place en mode PRESCALED (voir rendering.build_group)
+        self.images = self.tmx.images if images is None else images
+        self.reload_animations()
+
+    def detached(self):
+        """
+        Donne un adaptateur qui garde les images actuelles des tuiles, même si celles de la carte sont agrandies ensuite.
+
+        :return: (StreamedMapData) L'adaptateur.
+        """
+        return StreamedMapData(self.stream, list(self.images))
+
+    def reload_data(self):
+        pass
+
+    def get_animations(self):
+        return iter(())
+
+    @property
+    def tile_size(self):
+        return self.stream.source.tilewidth, self.stream.source.tileheight
+
+    @property
+    def map_size(self):
+        return self.stream.source.width, self.stream.source.height
+
+    @property
+    def visible_tile_layers(self):
+        return self.stream.source.visible_tile_layers
+
+    def _get_tile_image(self, x, y, l):
+        source = self.stream.source
+        if not (0 <= x < source.width and 0 <= y < source.height):
+            return None
+        chunk = self.stream.get((x // source.chunk_tiles, y // source.chunk_tiles))
+        return self.images[chunk.tiles[l][y - chunk.top, x - chunk.left]]
+
+    def _get_tile_image_by_id(self, id):
+        return self.images[id]
+
+    def get_tile_images_by_rect(self, rect, layers=None):
+        # même ordre que CompiledMapData (calque, ligne, colonne) : les tuiles qui débordent se recouvrent pareil
+        source = self.stream.source
+        size = source.chunk_tiles
+        x1, y1, x2, y2 = pyscroll.common.rect_to_bb(rect)
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, source.width - 1), min(y2, source.height - 1)
+        if x1 > x2 or y1 > y2:
+            return
+        images = self.images
+        get = self.stream.get
+        columns = range(x1 // size, x2 // size + 1)
+
+        for l in source.visible_tile_layers if layers is None else layers:
+            for y in range(y1, y2 + 1):
+                row = y // size
+                for column in columns:
+                    chunk = get((column, row))
+                    start, end = max(x1, chunk.left), min(x2, chunk.left + size - 1)
+                    gids = chunk.tiles[l][y - chunk.top, start - chunk.left:end - chunk.left + 1].tolist()
+                    for x, gid in enumerate(gids, start):
+                        if gid:
+                            tile = images[gid]
+                            if tile:
+                                yield x, y, l, tile
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
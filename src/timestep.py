@@ -0,0 +1,67 @@
+# Nombre de ticks de simulation par seconde par défaut
+DEFAULT_TICK_RATE = 60
+
+
+class FixedTimestep:
+    """
+    Classe FixedTimestep qui découpe le temps réel en ticks de simulation de durée fixe.
+
+    Le temps écoulé entre deux images est ajouté à un accumulateur ; chaque tick complet est retiré
+    et simulé. Le reste, une fraction de tick, sert à placer les sprites entre les deux derniers états
+    de la simulation au moment du dessin (alpha).
+
+    :param tick_rate: (int) Le nombre de ticks par seconde.
+    :param max_ticks: (int) Le nombre maximal de ticks simulés pour une image : au-delà, le retard est abandonné
+                      pour qu'une image très lente ne bloque pas le jeu (le monde ralentit au lieu de s'emballer).
+    :return: None
+    :CU: tick_rate > 0 and max_ticks > 0
+
+    >>> timestep = FixedTimestep(tick_rate=4)
+    >>> timestep.advance(0.625), timestep.alpha
+    (2, 0.5)
+    >>> timestep.advance(2.0)
+    5
+    """
+
+    def __init__(self, tick_rate=DEFAULT_TICK_RATE, max_ticks=5):
+        """
+        Initialise un accumulateur vide.
+
+        :param tick_rate: (int) Le nombre de ticks par seconde.
+        :param max_ticks: (int) Le nombre maximal de ticks simulés pour une image.
+        :return: None
+        """
+        self.tick_rate = tick_rate
+        self.dt = 1 / tick_rate  # durée d'un tick en secondes
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        """
+        Ajoute le temps écoulé depuis l'image précédente et donne le nombre de ticks à simuler.
+
+        :param elapsed: (float) Le temps écoulé en secondes.
+        :return: (int) Le nombre de ticks à simuler avant de dessiner l'image.
+        """
+        self.accumulator += elapsed
+        ticks = int(self.accumulator // self.dt)
+        if ticks > self.max_ticks:
+            ticks = self.max_ticks
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.dt
+        return ticks
+
+    @property
+    def alpha(self):
+        """
+        Donne la fraction du tick suivant déjà écoulée, entre 0 et 1.
+
+        :return: (float) La part du tick écoulée.
+        """
+        return min(self.accumulator / self.dt, 1.0)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+
+import pygame
+
+from spatial import SpatialHash
+
+NO_CHANGE = ((), ())  # renvoyé par TriggerIndex.update quand rien ne change : aucune liste créée
+
+
+@dataclass
+class TriggerZone:
+    """
+    Classe TriggerZone qui représente une zone de la carte déclenchant un événement quand le joueur y entre ou en sort.
+
+    :param name: (str) Le nom de la zone (le nom de l'objet de la carte).
+    :param rect: (pygame.Rect) Le rectangle de la zone, construit une seule fois.
+    :param data: L'objet associé à la zone (par exemple le Portal à emprunter).
+    :return: None
+
+    >>> zone = TriggerZone(name="enter_dungeon", rect=pygame.Rect(413, 62, 20, 13), data=portal)  # Ceci créera la zone d'un portail
+    """
+    name: str
+    rect: pygame.Rect
+    data: object = None
+
+
+class TriggerIndex:
+    """
+    Classe TriggerIndex qui range les zones de déclenchement d'une carte dans une grille
+    et signale les entrées et les sorties d'un rectangle (les pieds du joueur).
+
+    Une zone n'est signalée qu'une fois à l'entrée, même si le joueur reste dessus plusieurs images.
+
+    :param zones: (list) Les zones de déclenchement de la carte.
+    :param cell_size: (int) La taille d'une case de la grille en pixels.
+    :return: None
+
+    >>> index = TriggerIndex([TriggerZone("portail", pygame.Rect(0, 0, 16, 16))])
+    >>> [zone.name for zone in index.update(pygame.Rect(4, 4, 4, 4))[0]]
+    ['portail']
+    >>> index.update(pygame.Rect(5, 4, 4, 4))
+    ((), ())
+    >>> [zone.name for zone in index.update(pygame.Rect(40, 40, 4, 4))[1]]
+    ['portail']
+    """
+
+    def __init__(self, zones, cell_size=16):
+        """
+        Range les zones dans la grille.
+
+        :param zones: (list) Les zones de déclenchement de la carte.
+        :param cell_size: (int) La taille d'une case de la grille en pixels.
+        :return: None
+        """
+        self.zones = list(zones)
+        self.grid = SpatialHash(cell_size)
+        for zone in self.zones:
+            self.grid.insert(zone.rect, zone)
+        self.inside = []  # zones dans lesquelles se trouve le rectangle suivi
+
+    def update(self, rect, x=None, y=None):
+        """
+        Compare les zones touchées par le rectangle avec celles de l'appel précédent.
+
+        :param rect: (pygame.Rect) Le rectangle suivi (les pieds du joueur).
+        :param x: (float) La position x non arrondie du rectangle, rect.x par défaut (voir SpatialHash.collides).
+        :param y: (float) La position y non arrondie du rectangle, rect.y par défaut.
+        :return: (tuple) Les zones dans lesquelles il vient d'entrer, et celles dont il vient de sortir.
+
+        >>> entered, left = index.update(player.feet)  # Ceci renverra les zones où le joueur vient d'entrer ou de sortir
+        """
+        # Hors de toute zone, le cas de presque chaque tick : seules les cases sous le rectangle sont lues, sans rien créer
+        if not self.inside and not self.grid.collides(rect, x, y):
+            return NO_CHANGE
+        return self._compare(rect)
+
+    def _compare(self, rect):
+        """
+        Compare les zones touchées avec celles de l'appel précédent (voir update). Séparé d'update : ses listes
+        en compréhension obligent Python à créer des cellules à chaque appel de la fonction qui les contient.
+
+        :param rect: (pygame.Rect) Le rectangle suivi.
+        :return: (tuple) Les zones dans lesquelles il vient d'entrer, et celles dont il vient de sortir.
+        """
+        current = self.grid.query(rect)
+        if current == self.inside:
+            return NO_CHANGE
+
+        entered = [zone for zone in current if zone not in self.inside]
+        left = [zone for zone in self.inside if zone not in current]
+        self.inside = current
+        return entered, left
+
+    def reset(self, rect):
+        """
+        Considère que le rectangle est déjà dans les zones qu'il touche, sans signaler d'entrée
+        (par exemple quand le joueur arrive sur la carte par un portail).
+
+        :param rect: (pygame.Rect) Le rectangle suivi (les pieds du joueur).
+        :return: None
+        """
+        self.inside = self.grid.query(rect) if self.zones else []
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()